@@ -0,0 +1,442 @@
+"""Load test of the bot
+
+The bot (python -m nbadviser, long polling) is run against local
+stand-ins for Telegram Bot API and stats API, both served by one tornado
+server:
+
+- Bot API feeds updates with /top YYYY-MM-DD of simulated users to
+  getUpdates and accepts sendMessage and editMessageText
+- stats API serves ScoreboardV2 responses made of recorded ones
+  (see benchmarks/recorded.py) with configurable latency
+
+Every user sends /top for a random games date, waits for the message
+with recommendations, then waits think_time seconds and sends the next
+one. Latency of a request is the time from the update becoming available
+in getUpdates to the message with recommendations. A request is an error
+if the bot replies with an error message or does not reply in timeout.
+
+Usage:
+    python -m benchmarks.load --users 50 --duration 60 --output load.json
+    python -m benchmarks.load --compare load.json --threshold 1.25
+
+Results are written as JSON. With --compare, exit code is 1 if throughput
+got lower, p95 latency got higher more than threshold times or error rate
+got higher than in previous results.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+from typing import Dict, List, Optional
+
+import tornado.httpserver
+import tornado.ioloop
+import tornado.netutil
+import tornado.web
+
+from benchmarks.recorded import make_payloads
+from nbadviser import config
+
+FIRST_DATE = date(2022, 2, 1)
+# Games counts of games dates (typical regular season week)
+GAMES_COUNTS = [7, 11, 4, 9, 13, 6, 10]
+TOKEN = '123456:load-test'
+# Texts of the final reply to /top
+RECOMMENDATIONS_MARKER = config.LINK_FULL_GAMES
+ERROR_MARKER = 'К сожалению'
+# Longest wait of getUpdates request, so the bot stops quickly
+MAX_POLL_TIMEOUT = 1  # seconds
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class _User:
+    """Simulated user, chat is changed after a timed out request so that
+    late replies are not taken for replies to the next one"""
+
+    def __init__(self, chat_id: int):
+        self.chat_id = chat_id
+        self.sent_at: Optional[float] = None
+        self.request_number = 0
+
+
+class LoadState:
+    """Users, pending updates and results, used only in the server thread"""
+
+    def __init__(self, games_dates: List[str], think_time: float,
+                 timeout: float):
+        self.games_dates = games_dates
+        self.think_time = think_time
+        self.timeout = timeout
+        self.ready = threading.Event()  # First getUpdates is received
+        self.running = False
+        self.measure_from = float('inf')
+
+        self.updates: List[dict] = []
+        # Created in the server thread (bound to its event loop)
+        self.updates_available: Optional[asyncio.Event] = None
+        self.api_requests: Dict[str, int] = {}
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.timeouts = 0
+
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._chat_ids = itertools.count(1000)
+        self._users: Dict[int, _User] = {}
+
+    def start_users(self, users: int) -> None:
+        self.running = True
+        for _ in range(users):
+            user = _User(next(self._chat_ids))
+            self._users[user.chat_id] = user
+            self.send_request(user)
+
+    def send_request(self, user: _User) -> None:
+        if not self.running:
+            return
+        update_id = next(self._update_ids)
+        text = f'/top {random.choice(self.games_dates)}'
+        message = self.make_message(user.chat_id, text)
+        message.update(
+            {'from': {'id': user.chat_id, 'is_bot': False,
+                      'first_name': f'User{user.chat_id}'},
+             'entities': [{'type': 'bot_command', 'offset': 0,
+                           'length': len('/top')}]}
+        )
+        self.updates.append({'update_id': update_id, 'message': message})
+        self.updates_available.set()
+        user.sent_at = time.monotonic()
+        user.request_number += 1
+        tornado.ioloop.IOLoop.current().call_later(
+            self.timeout, self._check_timeout, user, user.request_number
+        )
+
+    def make_message(self, chat_id: int, text: str,
+                     message_id: Optional[int] = None) -> dict:
+        return {'message_id': message_id or next(self._message_ids),
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'text': text}
+
+    def on_message(self, chat_id: int, text: str) -> None:
+        """Message sent or edited by the bot"""
+        user = self._users.get(chat_id)
+        if user is None or user.sent_at is None:
+            return
+        error = ERROR_MARKER in text
+        if not error and RECOMMENDATIONS_MARKER not in text:
+            return  # Not the final reply
+
+        if user.sent_at >= self.measure_from:
+            if error:
+                self.errors += 1
+            else:
+                self.latencies.append(time.monotonic() - user.sent_at)
+        user.sent_at = None
+        tornado.ioloop.IOLoop.current().call_later(
+            self.think_time, self.send_request, user
+        )
+
+    def _check_timeout(self, user: _User, request_number: int) -> None:
+        if user.sent_at is None or user.request_number != request_number:
+            return
+        if user.sent_at >= self.measure_from:
+            self.timeouts += 1
+        # Next requests of the user are sent from a new chat
+        del self._users[user.chat_id]
+        user.chat_id = next(self._chat_ids)
+        user.sent_at = None
+        self._users[user.chat_id] = user
+        self.send_request(user)
+
+    def take_updates(self, offset: int) -> List[dict]:
+        """Updates not confirmed by offset (as getUpdates does)"""
+        self.updates = [update for update in self.updates
+                        if update['update_id'] >= offset]
+        if not self.updates:
+            self.updates_available.clear()
+        return list(self.updates)
+
+
+class _BotApiHandler(tornado.web.RequestHandler):
+    """Methods of Bot API used by the bot"""
+
+    def initialize(self, state: LoadState) -> None:
+        self.state = state
+
+    async def post(self, method: str) -> None:
+        state = self.state
+        state.api_requests[method] = state.api_requests.get(method, 0) + 1
+        params = json.loads(self.request.body) if self.request.body else {}
+
+        if method == 'getMe':
+            result = {'id': 1, 'is_bot': True, 'first_name': 'NBAdviser',
+                      'username': 'nbadviser_bot'}
+        elif method == 'getUpdates':
+            state.ready.set()
+            result = await self._get_updates(params)
+        elif method in ('sendMessage', 'editMessageText'):
+            chat_id, text = int(params['chat_id']), params.get('text', '')
+            state.on_message(chat_id, text)
+            result = state.make_message(chat_id, text,
+                                        params.get('message_id'))
+        else:
+            result = True
+        self.write({'ok': True, 'result': result})
+
+    async def _get_updates(self, params: dict) -> List[dict]:
+        offset = int(params.get('offset') or 0)
+        timeout = min(float(params.get('timeout') or 0), MAX_POLL_TIMEOUT)
+        updates = self.state.take_updates(offset)
+        if updates or not timeout:
+            return updates
+        try:
+            await asyncio.wait_for(self.state.updates_available.wait(),
+                                   timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.state.take_updates(offset)
+
+
+class _StatsHandler(tornado.web.RequestHandler):
+    """ScoreboardV2 endpoint of stats API"""
+
+    def initialize(self, responses: Dict[str, str], latency: float) -> None:
+        self.responses = responses
+        self.latency = latency
+
+    async def get(self) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        text = self.responses.get(self.get_argument('GameDate', ''))
+        if text is None:
+            self.send_error(404)
+            return
+        self.set_header('Content-Type', 'application/json')
+        self.write(text)
+
+
+class StubServer:
+    """Bot API (/bot<token>/<method>) and stats API (/stats/scoreboardv2)
+    stand-ins served by tornado in a separate thread"""
+
+    def __init__(self, state: LoadState, payloads: Dict[str, dict],
+                 stats_latency: float):
+        self.state = state
+        self.port: Optional[int] = None
+        self._responses = {games_date: json.dumps(payload)
+                           for games_date, payload in payloads.items()}
+        self._stats_latency = stats_latency
+        self._loop: Optional[tornado.ioloop.IOLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._started = threading.Event()
+
+    @property
+    def bot_api_url(self) -> str:
+        return f'http://127.0.0.1:{self.port}/bot'
+
+    @property
+    def stats_url(self) -> str:
+        return f'http://127.0.0.1:{self.port}/stats'
+
+    def start(self) -> None:
+        sockets = tornado.netutil.bind_sockets(0, address='127.0.0.1')
+        self.port = sockets[0].getsockname()[1]
+        self._thread = threading.Thread(target=self._serve, args=(sockets,),
+                                        daemon=True, name='load-stubs')
+        self._thread.start()
+        self._started.wait()
+
+    def call(self, func, *args) -> None:
+        """Call func in the server thread"""
+        self._loop.add_callback(func, *args)
+
+    def stop(self) -> None:
+        self._loop.add_callback(self._loop.stop)
+        self._thread.join()
+
+    def _serve(self, sockets: list) -> None:
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        self._loop = tornado.ioloop.IOLoop.current()
+        # Event is bound to the loop of this thread
+        self.state.updates_available = asyncio.Event()
+        application = tornado.web.Application([
+            (rf'/bot{TOKEN}/(\w+)', _BotApiHandler, dict(state=self.state)),
+            (r'/stats/scoreboardv2', _StatsHandler,
+             dict(responses=self._responses, latency=self._stats_latency)),
+        ], log_function=lambda handler: None)
+        http_server = tornado.httpserver.HTTPServer(application)
+        http_server.add_sockets(sockets)
+        self._started.set()
+        self._loop.start()
+        http_server.stop()
+        self._loop.close(all_fds=True)
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1,
+                             int(len(sorted_values) * q))]
+
+
+def run_load(users: int, duration: float, warmup: float, think_time: float,
+             stats_latency: float, days: int, timeout: float = 30,
+             runtime: str = 'threads', startup_timeout: float = 60,
+             bot_log: str = os.devnull,
+             env: Optional[Dict[str, str]] = None) -> dict:
+    """Run the bot under load of users for warmup + duration seconds,
+    requests sent during warmup are not measured
+    :param env: environment variables of the bot process (e.g. to change
+     its limits), log files of the bot are written to a temporary
+     directory unless NBADVISER_LOG_DIR is given"""
+    payloads = make_payloads(FIRST_DATE, days=days,
+                             games_counts=GAMES_COUNTS)
+    state = LoadState(games_dates=list(payloads), think_time=think_time,
+                      timeout=timeout)
+    server = StubServer(state, payloads, stats_latency=stats_latency)
+    server.start()
+
+    log_dir = tempfile.TemporaryDirectory(prefix='nbadviser-load-')
+    bot_env = {key: value for key, value in os.environ.items()
+               if not key.startswith('NBADVISER_')}
+    bot_env.update(NBADVISER_TOKEN=TOKEN,
+                   NBADVISER_BOT_API_BASE_URL=server.bot_api_url,
+                   NBADVISER_STATS_BASE_URL=server.stats_url,
+                   NBADVISER_BOT_RUNTIME=runtime,
+                   NBADVISER_LOG_DIR=log_dir.name)
+    bot_env.update(env or {})
+    with log_dir, open(bot_log, 'w', encoding='utf8') as log:
+        bot = subprocess.Popen([sys.executable, '-m', 'nbadviser'],
+                               cwd=PROJECT_DIR, env=bot_env,
+                               stdout=log, stderr=subprocess.STDOUT)
+        try:
+            if not state.ready.wait(startup_timeout):
+                raise RuntimeError(f'Бот не запустился за '
+                                   f'{startup_timeout} с')
+            state.measure_from = time.monotonic() + warmup
+            server.call(state.start_users, users)
+            time.sleep(warmup + duration)
+            server.call(setattr, state, 'running', False)
+        finally:
+            bot.terminate()
+            try:
+                bot.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                bot.kill()
+                bot.wait()
+            server.stop()
+
+    latencies = sorted(state.latencies)
+    completed = len(latencies)
+    requests = completed + state.errors + state.timeouts
+    return {
+        'meta': {
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'users': users,
+            'duration': duration,
+            'warmup': warmup,
+            'think_time': think_time,
+            'stats_latency': stats_latency,
+            'days': days,
+            'runtime': runtime,
+        },
+        'results': {
+            'requests': requests,
+            'completed': completed,
+            'errors': state.errors,
+            'timeouts': state.timeouts,
+            'error_rate': (state.errors + state.timeouts) / requests
+            if requests else 0,
+            'throughput_rps': completed / duration,
+            'p50_ms': percentile(latencies, 0.5) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'max_ms': latencies[-1] * 1000 if latencies else 0,
+            'bot_api_requests': state.api_requests,
+        },
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """Descriptions of results that got worse than in baseline: throughput
+    and p95 latency more than threshold times, error rate at all"""
+    current, previous = results['results'], baseline['results']
+    regressions = []
+    if current['throughput_rps'] * threshold < previous['throughput_rps']:
+        regressions.append(f'throughput: {previous["throughput_rps"]:.2f} '
+                           f'-> {current["throughput_rps"]:.2f} rps')
+    if current['p95_ms'] > previous['p95_ms'] * threshold:
+        regressions.append(f'p95: {previous["p95_ms"]:.1f} ms -> '
+                           f'{current["p95_ms"]:.1f} ms')
+    if current['error_rate'] > previous['error_rate']:
+        regressions.append(f'error rate: {previous["error_rate"]:.2%} -> '
+                           f'{current["error_rate"]:.2%}')
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.load')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=60,
+                        help='Seconds of measured load')
+    parser.add_argument('--warmup', type=float, default=10,
+                        help='Seconds of load before measuring')
+    parser.add_argument('--think-time', type=float, default=1,
+                        help='Seconds between reply and the next request '
+                             'of a user')
+    parser.add_argument('--stats-latency', type=float, default=0.2,
+                        help='Seconds of stats API response')
+    parser.add_argument('--days', type=int, default=30,
+                        help='Games dates requested by users')
+    parser.add_argument('--timeout', type=float, default=30,
+                        help='Seconds to wait for reply')
+    parser.add_argument('--runtime', choices=('threads', 'asyncio'),
+                        default='threads')
+    parser.add_argument('--env', action='append', default=[],
+                        metavar='NAME=VALUE',
+                        help='Environment variable of the bot, e.g. '
+                             'NBADVISER_OUTBOX_GLOBAL_RATE=1000')
+    parser.add_argument('--bot-log', default=os.devnull,
+                        help='File for output of the bot')
+    parser.add_argument('--output', help='JSON file with results '
+                                         '(stdout if not set)')
+    parser.add_argument('--compare', help='JSON file with previous results')
+    parser.add_argument('--threshold', type=float, default=1.25)
+    args = parser.parse_args(argv)
+
+    env = dict(item.partition('=')[::2] for item in args.env)
+    results = run_load(users=args.users, duration=args.duration,
+                       warmup=args.warmup, think_time=args.think_time,
+                       stats_latency=args.stats_latency, days=args.days,
+                       timeout=args.timeout, runtime=args.runtime,
+                       bot_log=args.bot_log, env=env)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf8') as file:
+            file.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, encoding='utf8') as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        for regression in regressions:
+            print(f'Regression: {regression}', file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""Responses of ScoreboardV2 endpoint saved in tests/fixtures (in format
+of the endpoint, with synthetic games) and a local stand-in for HTTP
+requests (of nba_api and transport of scoreboard provider) serving them
+
+Games of recorded game days (tests/fixtures) are combined into synthetic
+game days of any size from 1 to 15 games: every game is given its own
+pair of teams, so game days are valid (each team plays once a day).
+"""
+import contextlib
+import copy
+import json
+import os
+from datetime import date, timedelta
+from typing import Dict, Iterator, List
+
+from nba_api.library import http as nba_http
+from nba_api.stats.static import teams as static_teams
+
+from nbadviser.adviser.providers import scoreboard_provider
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                            'tests', 'fixtures')
+MAX_GAMES = 15  # 30 teams, each team plays once a day
+
+# Data sets rows of which are not bound to a game
+_NOT_GAME_DATA_SETS = ('EastConfStandingsByDay', 'WestConfStandingsByDay')
+
+
+def load_payloads() -> List[dict]:
+    """Recorded ScoreboardV2 responses"""
+    payloads = []
+    for filename in sorted(os.listdir(FIXTURES_DIR)):
+        if filename.startswith('scoreboardv2_'):
+            with open(os.path.join(FIXTURES_DIR, filename),
+                      encoding='utf8') as file:
+                payloads.append(json.load(file))
+    return payloads
+
+
+def make_payload(recorded: List[dict], games_date: date,
+                 games_count: int) -> dict:
+    """ScoreboardV2 response for games date with games_count games taken
+    from recorded responses"""
+    if not 0 <= games_count <= MAX_GAMES:
+        raise ValueError(f'games_count must be from 0 to {MAX_GAMES}')
+
+    # (recorded response, game header row)
+    games = []
+    for payload in recorded:
+        header = _result_set(payload, 'GameHeader')
+        games.extend((payload, row) for row in header['rowSet'])
+    if games_count > len(games):
+        raise ValueError(f'Only {len(games)} games are recorded')
+
+    payload = copy.deepcopy(recorded[0])
+    for result_set in payload['resultSets']:
+        if result_set['name'] not in _NOT_GAME_DATA_SETS:
+            result_set['rowSet'] = []
+    payload['parameters']['GameDate'] = games_date.strftime('%m/%d/%Y')
+
+    teams = static_teams.get_teams()
+    for number, (source, header_row) in enumerate(games[:games_count]):
+        header = dict(zip(_result_set(source, 'GameHeader')['headers'],
+                          header_row))
+        game_id = header['GAME_ID']
+        game_teams = {header['HOME_TEAM_ID']: teams[2 * number],
+                      header['VISITOR_TEAM_ID']: teams[2 * number + 1]}
+        for source_set in source['resultSets']:
+            if source_set['name'] in _NOT_GAME_DATA_SETS:
+                continue
+            headers = source_set['headers']
+            target_set = _result_set(payload, source_set['name'])
+            for row in source_set['rowSet']:
+                if row[headers.index('GAME_ID')] != game_id:
+                    continue
+                row = dict(zip(headers, row))
+                _replace_teams(row, game_teams, games_date,
+                               sequence=number + 1)
+                target_set['rowSet'].append([row[key] for key in headers])
+    return payload
+
+
+def make_payloads(first_date: date, days: int,
+                  games_counts: List[int]) -> Dict[str, dict]:
+    """Responses for consecutive games dates by games date string,
+    games count of every date is taken from games_counts cyclically"""
+    recorded = load_payloads()
+    payloads = {}
+    for day in range(days):
+        games_date = first_date + timedelta(days=day)
+        payloads[str(games_date)] = make_payload(
+            recorded, games_date, games_counts[day % len(games_counts)]
+        )
+    return payloads
+
+
+class RecordedResponse:
+    """Response of requests library used by nba_api"""
+
+    def __init__(self, url: str, status_code: int, text: str):
+        self.url = url
+        self.status_code = status_code
+        self.text = text
+
+
+class RecordedStatsServer:
+    """Stand-in for requests library in nba_api and requests session of
+    transport: serves responses by GameDate parameter (YYYY-MM-DD)
+    and counts requests"""
+
+    def __init__(self, payloads: Dict[str, dict]):
+        self._responses = {games_date: json.dumps(payload)
+                           for games_date, payload in payloads.items()}
+        self.requests = 0
+
+    def get(self, url: str, params, **kwargs) -> RecordedResponse:
+        self.requests += 1
+        games_date = dict(params).get('GameDate')
+        text = self._responses.get(games_date)
+        if text is None:
+            return RecordedResponse(url=url, status_code=404, text='')
+        return RecordedResponse(url=f'{url}?GameDate={games_date}',
+                                status_code=200, text=text)
+
+
+@contextlib.contextmanager
+def replay(payloads: Dict[str, dict]) -> Iterator[RecordedStatsServer]:
+    """Serve requests of nba_api endpoints from payloads.
+    Rate of requests is not limited, as there is no real service"""
+    server = RecordedStatsServer(payloads)
+    original_requests = nba_http.requests
+    nba_http.requests = server
+    transport = scoreboard_provider.transport
+    if transport is not None:
+        original_session, transport.session = transport.session, server
+    limiter, scoreboard_provider.limiter = scoreboard_provider.limiter, None
+    try:
+        yield server
+    finally:
+        nba_http.requests = original_requests
+        if transport is not None:
+            transport.session = original_session
+        scoreboard_provider.limiter = limiter
+
+
+def _result_set(payload: dict, name: str) -> dict:
+    for result_set in payload['resultSets']:
+        if result_set['name'] == name:
+            return result_set
+    raise KeyError(name)
+
+
+def _replace_teams(row: dict, teams: Dict[int, dict], games_date: date,
+                   sequence: int) -> None:
+    """Set teams (by recorded team id), date and sequence of the game
+    in a row of any data set"""
+    if 'GAME_DATE_EST' in row:
+        row['GAME_DATE_EST'] = f'{games_date}T00:00:00'
+    if 'GAME_SEQUENCE' in row:
+        row['GAME_SEQUENCE'] = sequence
+
+    for key in ('HOME_TEAM_ID', 'VISITOR_TEAM_ID'):
+        if row.get(key) in teams:
+            row[key] = teams[row[key]]['id']
+
+    team = teams.get(row.get('TEAM_ID'))
+    if team is None:
+        return
+    row['TEAM_ID'] = team['id']
+    for key, value in (('TEAM_ABBREVIATION', team['abbreviation']),
+                       ('TEAM_CITY_NAME', team['city']),
+                       ('TEAM_CITY', team['city']),
+                       ('TEAM_NAME', team['nickname']),
+                       ('TEAM_NICKNAME', team['nickname'])):
+        if key in row:
+            row[key] = value
@@ -0,0 +1,244 @@
+"""Offline benchmarks of adviser
+
+Recorded ScoreboardV2 responses are served by a local stand-in for HTTP
+requests (see benchmarks/recorded.py), so nba_api parsing, providers,
+strategies and rendering are measured without network.
+
+Usage:
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --compare bench.json --threshold 1.25
+
+Results are written as JSON. With --compare, medians are compared with
+previous results and exit code is 1 if any of them got slower more than
+threshold times.
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.recorded import make_payloads, replay, MAX_GAMES
+from nbadviser.adviser import providers as providers_module
+from nbadviser.adviser import strategies as strategies_module
+from nbadviser.adviser.adviser import Adviser
+from nbadviser.adviser.providers import ScoreboardData
+from nbadviser.adviser.strategies import strategies
+from nbadviser.adviser.utils import Game, Recommendations
+
+FIRST_DATE = date(2022, 2, 1)
+RANGE_DAYS = (7, 31)
+# Games counts of days of multi-day ranges (typical regular season week)
+RANGE_GAMES_COUNTS = [7, 11, 4, 9, 13, 6, 10]
+
+
+def measure(func: Callable, repeat: int,
+            setup: Optional[Callable] = None) -> Dict[str, float]:
+    """Run func repeat times and get statistics of durations
+    in milliseconds. setup is called before every run and not measured,
+    its result is passed to func"""
+    durations = []
+    for _ in range(repeat):
+        if setup is None:
+            start_time = time.perf_counter()
+            func()
+        else:
+            argument = setup()
+            start_time = time.perf_counter()
+            func(argument)
+        durations.append((time.perf_counter() - start_time) * 1000)
+
+    durations.sort()
+    return {
+        'runs': repeat,
+        'min_ms': durations[0],
+        'median_ms': statistics.median(durations),
+        'p95_ms': durations[min(len(durations) - 1,
+                                int(len(durations) * 0.95))],
+        'mean_ms': statistics.mean(durations),
+    }
+
+
+def clear_caches() -> None:
+    """Forget all fetched scoreboards and rendered messages"""
+    providers_module.scoreboard_provider.cache.clear()
+    with Recommendations._rendered_lock:
+        Recommendations._rendered.clear()
+
+
+def bench_games_date(games_count: int, repeat: int,
+                     max_workers: int) -> List[dict]:
+    """Benchmarks of one games date with games_count games"""
+    games_date = str(FIRST_DATE)
+    payloads = make_payloads(FIRST_DATE, days=1, games_counts=[games_count])
+    adviser = Adviser(registered_strategies=strategies,
+                      max_workers=max_workers)
+    results = []
+
+    def add(name: str, stats: Dict[str, float]) -> None:
+        results.append(dict(name=name, games=games_count, days=1, **stats))
+
+    with replay(payloads):
+        add('get_recommendations.cold', measure(
+            lambda _: adviser.get_recommendations(games_date=games_date),
+            repeat, setup=clear_caches
+        ))
+        clear_caches()
+        adviser.get_recommendations(games_date=games_date)
+        add('get_recommendations.warm', measure(
+            lambda: adviser.get_recommendations(games_date=games_date),
+            repeat
+        ))
+
+        data_sets = providers_module.scoreboard_provider.get(
+            games_date
+        ).data_sets
+
+    # Fresh scoreboard for every run: columnar table is built once
+    # per scoreboard and would be measured only in the first run
+    def new_scoreboard():
+        return ScoreboardData(data_sets)
+
+    any_strategy = next(iter(strategies.values()))
+    add('preprocess_data', measure(
+        lambda scoreboard: any_strategy.preprocess_data(Game, scoreboard),
+        repeat, setup=new_scoreboard
+    ))
+    for name, strategy in strategies.items():
+        add(f'execute.{name}', measure(
+            lambda scoreboard: strategy.execute(raw_data=scoreboard,
+                                                games_date=games_date),
+            repeat, setup=new_scoreboard
+        ))
+
+    scoreboard = new_scoreboard()
+    contents = [strategy.execute(raw_data=scoreboard, games_date=games_date)
+                for strategy in strategies.values()]
+
+    def new_recommendations():
+        clear_caches()
+        return Recommendations(list(contents),
+                               parameters=dict(games_date=games_date),
+                               raw_data={games_date: scoreboard})
+
+    add('to_html.cold', measure(
+        lambda recommendations: recommendations.to_html(), repeat,
+        setup=new_recommendations
+    ))
+    recommendations = new_recommendations()
+    recommendations.to_html()
+    add('to_html.memoized', measure(recommendations.to_html, repeat))
+    return results
+
+
+def bench_range(days: int, repeat: int, max_workers: int,
+                max_concurrency: int) -> dict:
+    """Benchmark of recommendations for consecutive games dates"""
+    payloads = make_payloads(FIRST_DATE, days=days,
+                             games_counts=RANGE_GAMES_COUNTS)
+    adviser = Adviser(registered_strategies=strategies,
+                      max_workers=max_workers)
+
+    def run(_):
+        for _, advise in adviser.iter_recommendations(
+                payloads, max_concurrency=max_concurrency):
+            advise[0].to_html()
+
+    with replay(payloads):
+        stats = measure(run, repeat, setup=clear_caches)
+    games = sum(len(payload['resultSets'][0]['rowSet'])
+                for payload in payloads.values())
+    return dict(name='iter_recommendations.cold', games=games, days=days,
+                **stats)
+
+
+def run_benchmarks(games_counts: List[int], repeat: int, max_workers: int,
+                   max_concurrency: int) -> dict:
+    """Run all benchmarks, local index of games is not used"""
+    game_index = strategies_module.game_index
+    strategies_module.game_index = None
+    try:
+        results = []
+        for games_count in games_counts:
+            results.extend(bench_games_date(games_count, repeat,
+                                            max_workers))
+        for days in RANGE_DAYS:
+            results.append(bench_range(days, max(1, repeat // 10),
+                                       max_workers, max_concurrency))
+    finally:
+        strategies_module.game_index = game_index
+        clear_caches()
+
+    return {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'repeat': repeat,
+            'max_workers': max_workers,
+            'max_concurrency': max_concurrency,
+        },
+        'results': results,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """Descriptions of benchmarks with median slower than in baseline
+    more than threshold times"""
+    baseline_medians = {(item['name'], item['games'], item['days']):
+                        item['median_ms'] for item in baseline['results']}
+    regressions = []
+    for item in results['results']:
+        key = (item['name'], item['games'], item['days'])
+        baseline_median = baseline_medians.get(key)
+        if baseline_median and \
+                item['median_ms'] > baseline_median * threshold:
+            regressions.append(
+                f'{item["name"]} (games={item["games"]}, '
+                f'days={item["days"]}): {baseline_median:.3f} ms -> '
+                f'{item["median_ms"]:.3f} ms'
+            )
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run')
+    parser.add_argument('--games', type=int, nargs='+',
+                        default=list(range(1, MAX_GAMES + 1)),
+                        help='Games counts of a games date')
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--max-workers', type=int, default=0,
+                        help='Threads of Adviser (0 - sequential)')
+    parser.add_argument('--max-concurrency', type=int, default=4,
+                        help='Games dates of a range processed in parallel')
+    parser.add_argument('--output', help='JSON file with results '
+                                         '(stdout if not set)')
+    parser.add_argument('--compare', help='JSON file with previous results')
+    parser.add_argument('--threshold', type=float, default=1.25)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.games, args.repeat, args.max_workers,
+                             args.max_concurrency)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf8') as file:
+            file.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, encoding='utf8') as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        for regression in regressions:
+            print(f'Regression: {regression}', file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
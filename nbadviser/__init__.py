@@ -1,4 +1,17 @@
+"""NBAdviser - recommender telegram bot of NBA games
 
-from nbadviser.adviser.strategies import strategies
-from nbadviser.adviser.adviser import adviser
-from nbadviser.bot import bot
+Registered strategies (strategies attribute) are imported on first
+access, so importing a module of the package does not import everything
+else. Adviser instance and bot entry point are imported from their
+modules: nbadviser.adviser.adviser.adviser, nbadviser.bot.bot.run
+"""
+import importlib
+
+
+def __getattr__(name):
+    if name != 'strategies':
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    strategies = importlib.import_module('nbadviser.adviser.strategies')
+    # Next accesses do not go through __getattr__
+    globals()[name] = strategies.strategies
+    return strategies.strategies
@@ -1,13 +1,140 @@
-"""Main script entry point"""
+"""Main script entry point
+
+Without a command the bot is started, other commands:
+- backfill - fill local index of games with games dates of a season
+- workers - run the bot in several worker processes
+
+Modules needed only by the bot are imported when it is started.
+"""
+import time
+
+# Startup is timed from the start of the entry point, before imports
+START_TIME = time.perf_counter()
+
+import argparse
+import os
+import sys
 
-from nbadviser import bot
 from nbadviser import config
+from nbadviser.adviser.backfill import backfill
+from nbadviser.adviser.index import GameIndex
+from nbadviser.adviser.limiter import PriorityRateLimiter
+from nbadviser.adviser.utils import get_season_range, iter_games_dates
 from nbadviser.config import logger
+from nbadviser.metrics import metrics, start_http_server, StartupTimer
+from nbadviser.supervisor import Supervisor, run_worker
+
+
+def main(argv=None):
+    startup = StartupTimer(metrics, start_time=START_TIME)
+    parser = argparse.ArgumentParser(prog='nbadviser')
+    commands = parser.add_subparsers(dest='command')
+
+    backfill_parser = commands.add_parser(
+        'backfill', help='Заполнить индекс игр сезона'
+    )
+    backfill_parser.add_argument(
+        '--season', help='Сезон в формате YYYY-YY (по умолчанию текущий)'
+    )
+    backfill_parser.add_argument(
+        '--concurrency', type=int, default=config.BACKFILL_CONCURRENCY,
+        help='Количество одновременных запросов'
+    )
+    backfill_parser.add_argument(
+        '--rate', type=float, default=config.BACKFILL_RATE,
+        help='Максимум запросов в секунду (0 - без ограничения)'
+    )
+    backfill_parser.add_argument(
+        '--index-dir', default=config.GAME_INDEX_DIR,
+        help='Директория индекса (NBADVISER_INDEX_DIR)'
+    )
+
+    workers_parser = commands.add_parser(
+        'workers', help='Запустить бота в нескольких процессах (webhook)'
+    )
+    workers_parser.add_argument(
+        '--workers', type=int, default=max(config.WORKERS, 2),
+        help='Количество рабочих процессов (NBADVISER_WORKERS)'
+    )
+
+    args = parser.parse_args(argv)
+    # One-off commands (backfill) log to stderr only
+    if args.command == 'backfill':
+        run_backfill(parser, args)
+    elif args.command == 'workers':
+        config.configure_logging()
+        run_workers(parser, args)
+    else:
+        config.configure_logging()
+        run_bot(startup)
+
 
+def run_bot(startup: StartupTimer, worker_index=None):
+    """Start bot, startup time is reported when it is ready to handle
+    updates (stages: import, config, ready)
+    :param worker_index: index of worker process (see run_workers)"""
+    from nbadviser.adviser.prewarm import prewarmer
+    from nbadviser.adviser.providers import scoreboard_provider
+    from nbadviser.bot import bot
+    startup.mark('import')
 
-def main():
     logger.info('Старт NBAdviser')
-    bot.run(token=config.TOKEN)
+    primary = not worker_index
+    if worker_index is not None:
+        # Scoreboards fetched by any worker are taken from shared store
+        scoreboard_provider.shared_max_age = config.SCOREBOARD_CACHE_TTL
+    scoreboard_provider.warm_up()
+    if config.METRICS_PORT:
+        start_http_server(metrics, host=config.METRICS_HOST,
+                          port=config.METRICS_PORT + (worker_index or 0))
+    if config.PREWARM_ENABLED and primary:
+        prewarmer.start()
+    startup.mark('config')
+
+    def on_ready():
+        startup.mark('ready')
+        startup.report()
+
+    bot.run(token=config.TOKEN, on_ready=on_ready, worker_index=worker_index)
+
+
+def run_workers(parser: argparse.ArgumentParser, args: argparse.Namespace):
+    """Run the bot in worker processes: every one receives updates by
+    webhook on the same port, scoreboards are fetched once for all
+    of them and shared through store (NBADVISER_STORE_DIR)"""
+    if not config.SCOREBOARD_STORE_DIR:
+        parser.error('для рабочих процессов нужно общее хранилище '
+                     '(NBADVISER_STORE_DIR)')
+    if args.workers < 1:
+        parser.error('количество процессов должно быть больше нуля')
+
+    # Rate limits of config are split between workers
+    os.environ['NBADVISER_WORKERS'] = str(args.workers)
+    if not Supervisor(target=run_worker, workers=args.workers).run():
+        sys.exit(1)
+
+
+def run_backfill(parser: argparse.ArgumentParser, args: argparse.Namespace):
+    from nbadviser.adviser.providers import scoreboard_provider
+
+    if not args.index_dir:
+        parser.error('не задана директория индекса (--index-dir)')
+    season_range = get_season_range(args.season)
+    if season_range is None:
+        parser.error(f'неверный формат сезона: {args.season}')
+
+    # Requests are limited by limiter of provider only and wait for it
+    # as long as needed
+    scoreboard_provider.limiter = \
+        PriorityRateLimiter(rate=args.rate, burst=1) if args.rate > 0 else None
+    scoreboard_provider.limiter_max_wait = None
+
+    logger.info(f'Backfill сезона {args.season or "(текущий)"} '
+                f'в {args.index_dir}')
+    backfill(iter_games_dates(*season_range),
+             provider=scoreboard_provider,
+             index=GameIndex(directory=args.index_dir),
+             concurrency=args.concurrency)
 
 
 if __name__ == '__main__':
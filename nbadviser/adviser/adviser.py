@@ -1,26 +1,119 @@
 """File containing class for managing strategies
 """
+import asyncio
+import datetime
+import functools
+import itertools
+import threading
+import time
 import traceback
-from typing import Dict, List, Tuple, Optional, Any, Union
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from typing import Dict, List, Tuple, Optional, Any, Union, Iterable, \
+    Iterator, Callable
 
-from nbadviser import strategies
-from nbadviser.adviser.strategies import StrategyBaseABC, LiveGamesStrategy
-from nbadviser.adviser.utils import Error, Recommendations, Recommendation
+from cachetools import LRUCache
+
+from nbadviser import config
+from nbadviser.adviser.strategies import StrategyBaseABC, LiveGamesStrategy, \
+    ScoreboardDataMixin, strategies
+from nbadviser.adviser.utils import Error, Recommendations, Recommendation, \
+    PeriodRecommendation, get_date_etc_str, iter_games_dates
+from nbadviser.config import logger
+from nbadviser.metrics import metrics
 
 Errors = List[Error]
 Advise = Tuple[Recommendations, Errors]
 
 
+class _SharedRawData:
+    """Raw data fetched during one call of get_recommendations by games date.
+    Thread-safe: strategies executed concurrently wait for the first fetch
+    of the same games date instead of fetching it again"""
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None):
+        self.data = dict(data or {})  # Already fetched by games date
+        self._errors = dict()
+        self._lock = threading.Lock()
+
+    def get(self, strategy: StrategyBaseABC, parameters: dict) -> Any:
+        """Get scoreboard for the strategy, fetching it only if it was not
+        fetched (or failed to be fetched) yet for the same games date.
+        Returns None for strategies that do not use scoreboard data
+        or answer from the local index of games"""
+        if not isinstance(strategy, ScoreboardDataMixin):
+            return
+
+        params = strategy.apply_parameters(**parameters)
+        if strategy.answers_from_index(params):
+            return
+        games_date_str = params['games_date_str']
+        with self._lock:
+            if games_date_str in self._errors:
+                raise self._errors[games_date_str]
+
+            if games_date_str not in self.data:
+                try:
+                    self.data[games_date_str] = strategy.get_raw_data(**params)
+                except Exception as err:
+                    self._errors[games_date_str] = err
+                    raise
+
+            return self.data[games_date_str]
+
+
 class Adviser:
     """Class for managing strategies
 
-    Additional parameters that can be set using method - set_parameters:
+    Additional parameters are passed as keyword arguments to
+    get_recommendations and get_live_games_or_none per call:
     - games_date (string in a format YYYY-MM-DD)
+    Default values of parameters for all calls can be set using
+    method - set_parameters. Parameters of a call are never stored in
+    Adviser instance, so it can be safely used from many threads
+
+    If max_workers is greater than zero, strategies are executed
+    concurrently in a thread pool, each one limited by strategy_timeout
+    seconds (counting from the start of its execution, so waiting for
+    a free thread of the pool under load is not a timeout)
+
+    Recommendations can be computed in advance with method precompute
+    (e.g. by a background job), then calls for the same games date are
+    served without executing strategies
+
+    If stale_after is set, the last recommendations computed without
+    errors are kept by games date (stale-while-revalidate): they can be
+    served right away with their age (get_last_recommendations, not older
+    than stale_max_age) while recommendations older than stale_after
+    seconds are computed again in background (revalidate).
+    Recommendations made of finished games dates only are never stale
     """
 
-    def __init__(self, registered_strategies: Dict[str, StrategyBaseABC]):
+    def __init__(self, registered_strategies: Dict[str, StrategyBaseABC],
+                 max_workers: int = 0,
+                 strategy_timeout: Optional[float] = None,
+                 stale_after: Optional[float] = None,
+                 stale_max_age: Optional[float] = None,
+                 stale_maxsize: int = 64):
         self._strategies = registered_strategies
         self._parameters = dict()
+        self._strategy_timeout = strategy_timeout
+        # games date -> (advise, monotonic time when it expires)
+        self._precomputed: Dict[str, Tuple[Advise, float]] = dict()
+        self._executor = None
+        if max_workers > 0:
+            self._executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix='strategy'
+            )
+
+        self._stale_after = stale_after
+        self._stale_max_age = stale_max_age
+        # games date -> (advise, time of its data or None if it is final)
+        self._last = LRUCache(maxsize=stale_maxsize)
+        # games date -> callbacks waiting for revalidation in progress
+        self._revalidating: Dict[str, List[Callable[[Advise], None]]] = {}
+        self._last_lock = threading.Lock()
+        self._revalidate_executor = None
 
     def get_recommendations(self, **kwargs) -> Advise:
         """Execute all strategies
@@ -29,35 +122,458 @@ class Adviser:
         Done this way so that we could handle later this error but also execute
         rest of the strategies.
         Error handling happens on client side
+
+        Scoreboard is fetched only once per game date and shared between
+        all strategies using it. Fetched data is kept in
+        Recommendations.raw_data to be reused by following calls
+        (e.g. get_live_games_or_none)
+
+        Recommendations keep order of registered strategies regardless of
+        execution mode
+
+        Keyword arguments are parameters of this call, they override
+        default parameters
         """
-        recommendations = Recommendations(parameters=self._parameters)
+        return self._get_recommendations(self._get_call_parameters(**kwargs))
+
+    def _get_recommendations(self, parameters: dict,
+                             concurrent: bool = True) -> Advise:
+        """Precomputed or computed recommendations for parameters
+        :param concurrent: execute strategies in the thread pool (if any),
+         otherwise one after another in the calling thread"""
+        precomputed = self._get_precomputed(parameters)
+        if precomputed is not None:
+            return precomputed
+        advise = self._compute_recommendations(parameters, concurrent)
+        self._keep_last(parameters, advise)
+        return advise
+
+    def precompute(self, max_age: float, raw_data: Any = None,
+                   **kwargs) -> Advise:
+        """Execute all strategies and keep result to serve calls with
+        the same games date during max_age seconds.
+        Result is kept only if all strategies succeeded
+        :param raw_data: data already fetched for the games date (e.g. by
+         provider of background job), strategies use it instead of
+         fetching"""
+        parameters = self._get_call_parameters(**kwargs)
+        fetched = None
+        if raw_data is not None:
+            fetched = {self._get_games_date_str(parameters): raw_data}
+        recommendations, errors = self._compute_recommendations(
+            parameters, fetched=fetched
+        )
+        self._keep_last(parameters, (recommendations, errors))
+        if not errors:
+            now = time.monotonic()
+            precomputed = {key: value for key, value
+                           in self._precomputed.items() if value[1] > now}
+            games_date_str = self._get_games_date_str(parameters)
+            precomputed[games_date_str] = ((recommendations, errors),
+                                           now + max_age)
+            self._precomputed = precomputed
+        return recommendations, errors
+
+    def _get_precomputed(self, parameters: dict) -> Optional[Advise]:
+        """Get not expired precomputed advise for parameters of a call.
+        Precomputed advises are used only for calls with games date
+        parameter only"""
+        if set(parameters) - {'games_date'}:
+            return
+        precomputed = self._precomputed.get(
+            self._get_games_date_str(parameters)
+        )
+        if precomputed is None:
+            return
+        advise, expiration_time = precomputed
+        if time.monotonic() > expiration_time:
+            return
+        return advise
+
+    def get_last_recommendations(
+            self, **kwargs) -> Optional[Tuple[Advise, float]]:
+        """Get the last recommendations computed without errors for
+        the same games date, if they are not older than stale_max_age
+        :returns advise and its age in seconds (counting from the time
+         scoreboard was fetched, zero if data is not going to change)"""
+        if self._stale_after is None:
+            return
+        parameters = self._get_call_parameters(**kwargs)
+        if set(parameters) - {'games_date'}:
+            return
+        with self._last_lock:
+            last = self._last.get(self._get_games_date_str(parameters))
+        if last is None:
+            return
+        advise, data_time = last
+        if data_time is None:
+            return advise, 0.0
+        age = max(0.0, time.time() - data_time)
+        if self._stale_max_age is not None and age > self._stale_max_age:
+            return
+        return advise, age
+
+    def revalidate(self, on_refresh: Optional[Callable[[Advise], None]] = None,
+                   **kwargs) -> bool:
+        """Compute recommendations again in background if the last ones
+        are older than stale_after. Only one computation is made for
+        concurrent calls with the same games date.
+        :param on_refresh: called with new advise if it has no errors
+        :returns False if recommendations are fresh enough"""
+        last = self.get_last_recommendations(**kwargs)
+        if last is not None and last[1] < self._stale_after:
+            return False
+
+        parameters = self._get_call_parameters(**kwargs)
+        games_date_str = self._get_games_date_str(parameters)
+        with self._last_lock:
+            callbacks = self._revalidating.get(games_date_str)
+            if callbacks is None:
+                callbacks = self._revalidating[games_date_str] = []
+                if self._revalidate_executor is None:
+                    self._revalidate_executor = ThreadPoolExecutor(
+                        max_workers=1, thread_name_prefix='revalidate'
+                    )
+                self._revalidate_executor.submit(
+                    self._revalidate, games_date_str, parameters
+                )
+            if on_refresh is not None:
+                callbacks.append(on_refresh)
+        return True
+
+    def _revalidate(self, games_date_str: str, parameters: dict) -> None:
+        """Compute recommendations and pass them to waiting callbacks"""
+        try:
+            advise = self._compute_recommendations(parameters)
+        except Exception as err:
+            advise = None
+            logger.warning(f'Не удалось обновить рекомендации '
+                           f'{games_date_str}: {err}')
+        else:
+            self._keep_last(parameters, advise)
+        finally:
+            with self._last_lock:
+                callbacks = self._revalidating.pop(games_date_str, [])
+
+        if advise is None or advise[1]:
+            return
+        for callback in callbacks:
+            try:
+                callback(advise)
+            except Exception as err:
+                logger.warning(f'Ошибка обработки обновленных рекомендаций '
+                               f'{games_date_str}: {err}')
+
+    def _keep_last(self, parameters: dict, advise: Advise) -> None:
+        """Keep advise computed without errors as the last one for
+        games date (only for calls with games date parameter only)"""
+        recommendations, errors = advise
+        if self._stale_after is None or errors \
+                or set(parameters) - {'games_date'}:
+            return
+        games_date_str = self._get_games_date_str(parameters)
+        if self._is_final(games_date_str, recommendations.raw_data):
+            data_time = None
+        else:
+            # Age of recommendations is age of the oldest scoreboard used
+            fetch_times = [
+                scoreboard.fetched_at for scoreboard
+                in recommendations.raw_data.values()
+                if getattr(scoreboard, 'fetched_at', None) is not None
+            ]
+            data_time = min(fetch_times) if fetch_times else time.time()
+        with self._last_lock:
+            self._last[games_date_str] = (advise, data_time)
+
+    @staticmethod
+    def _is_final(games_date_str: str, raw_data: Dict[str, Any]) -> bool:
+        """Check that recommendations are not going to change: all
+        scoreboards used are finished (without scoreboards - answered from
+        local index of past games)"""
+        from nbadviser.adviser.providers import ScoreboardProvider
+
+        if not raw_data:
+            return games_date_str < get_date_etc_str()
+        return all(ScoreboardProvider.is_finished(date_str, scoreboard)
+                   for date_str, scoreboard in raw_data.items())
+
+    @staticmethod
+    def _get_games_date_str(parameters: dict) -> str:
+        return StrategyBaseABC.apply_parameters(**parameters)['games_date_str']
+
+    def _compute_recommendations(self, parameters: dict,
+                                 concurrent: bool = True,
+                                 fetched: Optional[Dict[str, Any]] = None
+                                 ) -> Advise:
+        """Execute all strategies with parameters of a call
+        :param fetched: raw data already fetched by games date"""
+        shared_raw_data = _SharedRawData(fetched)
+        recommendations = Recommendations(parameters=parameters,
+                                          raw_data=shared_raw_data.data)
         errors = []
+
+        if self._executor is None or not concurrent:
+            for strategy in self._strategies.values():
+                try:
+                    recommendation = self._execute_strategy(
+                        strategy, shared_raw_data, parameters
+                    )
+                    recommendations.append(recommendation)
+                except Exception as err:
+                    errors.append(self._make_error(
+                        strategy, err, traceback.format_exc()
+                    ))
+            return recommendations, errors
+
+        submitted = []
         for strategy in self._strategies.values():
+            call, started = self._track_start(strategy, shared_raw_data,
+                                              parameters)
+            submitted.append((strategy, self._executor.submit(call),
+                              started))
+
+        for strategy, future, started in submitted:
             try:
-                recommendation = strategy.execute(**self._parameters)
+                timeout = None
+                if self._strategy_timeout is not None:
+                    timeout = self._remaining_time(started.result())
+                recommendation = future.result(timeout=timeout)
                 recommendations.append(recommendation)
+            except TimeoutError:
+                future.cancel()
+                err = TimeoutError(f'Strategy did not finish in '
+                                   f'{self._strategy_timeout} seconds')
+                errors.append(self._make_error(strategy, err, ''))
             except Exception as err:
-                errors.append(Error(exception=err,
-                                    traceback=traceback.format_exc(),
-                                    label=strategy.__class__.__name__))
+                errors.append(self._make_error(strategy, err,
+                                               traceback.format_exc()))
 
         return recommendations, errors
 
-    def get_live_games_or_none(self, **kwargs) -> Union[Recommendation, None]:
+    async def get_recommendations_async(self, **kwargs) -> Advise:
+        """Execute all strategies without blocking the event loop
+
+        Same as get_recommendations, but strategies are run in the thread
+        pool of Adviser (or default executor of the event loop if
+        max_workers is zero) and awaited concurrently
+        """
+        parameters = self._get_call_parameters(**kwargs)
+        precomputed = self._get_precomputed(parameters)
+        if precomputed is not None:
+            return precomputed
+
+        shared_raw_data = _SharedRawData()
+        recommendations = Recommendations(parameters=parameters,
+                                          raw_data=shared_raw_data.data)
+        errors = []
+
+        loop = asyncio.get_running_loop()
+
+        async def run(strategy: StrategyBaseABC) -> Recommendation:
+            call, started = self._track_start(strategy, shared_raw_data,
+                                              parameters)
+            task = loop.run_in_executor(self._executor, call)
+            if self._strategy_timeout is None:
+                return await task
+            start_time = await asyncio.wrap_future(started)
+            return await asyncio.wait_for(
+                task, timeout=self._remaining_time(start_time)
+            )
+
+        results = await asyncio.gather(
+            *(run(strategy) for strategy in self._strategies.values()),
+            return_exceptions=True
+        )
+
+        for strategy, result in zip(self._strategies.values(), results):
+            if isinstance(result, asyncio.TimeoutError):
+                err = TimeoutError(f'Strategy did not finish in '
+                                   f'{self._strategy_timeout} seconds')
+                errors.append(self._make_error(strategy, err, ''))
+            elif isinstance(result, Exception):
+                tb = ''.join(traceback.format_exception(
+                    type(result), result, result.__traceback__
+                ))
+                errors.append(self._make_error(strategy, result, tb))
+            else:
+                recommendations.append(result)
+
+        self._keep_last(parameters, (recommendations, errors))
+        return recommendations, errors
+
+    def iter_recommendations(self, games_dates: Iterable[str],
+                             max_concurrency: int,
+                             **kwargs) -> Iterator[Tuple[str, Advise]]:
+        """Get recommendations for many games dates
+
+        Dates are processed in parallel by max_concurrency threads
+        (each one the same way as get_recommendations, but strategies are
+        executed in the thread of the date, so that long periods do not
+        take the thread pool from other requests), results are yielded
+        as soon as they are ready in order of games dates.
+        Not started dates are cancelled if generator is closed early
+        """
+        def get_recommendations(games_date: str) -> Advise:
+            parameters = self._get_call_parameters(games_date=games_date,
+                                                   **kwargs)
+            return self._get_recommendations(parameters, concurrent=False)
+
+        games_dates = iter(games_dates)
+        executor = ThreadPoolExecutor(max_workers=max_concurrency,
+                                      thread_name_prefix='games-date')
+        pending = deque()
+        try:
+            for games_date in itertools.islice(games_dates, max_concurrency):
+                pending.append((games_date, executor.submit(
+                    get_recommendations, games_date
+                )))
+
+            while pending:
+                games_date, future = pending.popleft()
+                advise = future.result()
+                for next_games_date in itertools.islice(games_dates, 1):
+                    pending.append((next_games_date, executor.submit(
+                        get_recommendations, next_games_date
+                    )))
+                yield games_date, advise
+        finally:
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def get_best_of_period(
+            self, first_date: datetime.date, last_date: datetime.date,
+            top_games: int, max_concurrency: int,
+            on_progress: Optional[Callable[[int, int], None]] = None
+    ) -> Advise:
+        """Best games of the period by every strategy
+
+        Strategies answer periods indexed entirely from the local index of
+        games (best_from_index). Otherwise recommendations are made for
+        every games date of the period (see iter_recommendations) and
+        strategies rank the recommended games (rank_games)
+        :param on_progress: called with numbers of processed and all games
+         dates of the period
+        """
+        games_dates = list(iter_games_dates(first_date, last_date))
+        best: Dict[str, Optional[List[Tuple[str, Any]]]] = dict()
+        errors = []
+        for name, strategy in self._strategies.items():
+            try:
+                best[name] = strategy.best_from_index(games_dates, top_games)
+            except Exception as err:
+                errors.append(self._make_error(strategy, err,
+                                               traceback.format_exc()))
+                best[name] = None
+
+        not_indexed = [name for name, games in best.items() if games is None]
+        if not_indexed:
+            titles = {self._strategies[name].title: name
+                      for name in not_indexed}
+            found = {name: [] for name in not_indexed}
+            results = self.iter_recommendations(games_dates, max_concurrency)
+            for number, (games_date, (recommendations, date_errors)) in \
+                    enumerate(results, start=1):
+                errors.extend(date_errors)
+                for recommendation in recommendations:
+                    name = titles.get(recommendation.title)
+                    if name is not None and recommendation.games:
+                        found[name].extend((games_date, game)
+                                           for game in recommendation.games)
+                if on_progress is not None:
+                    on_progress(number, len(games_dates))
+            for name in not_indexed:
+                best[name] = self._strategies[name].rank_games(found[name],
+                                                               top_games)
+
+        recommendations = Recommendations(
+            parameters=dict(period=(str(first_date), str(last_date)))
+        )
+        for name, strategy in self._strategies.items():
+            recommendations.append(PeriodRecommendation(
+                title=strategy.title,
+                games=[game for _, game in best[name]],
+                games_dates=[games_date for games_date, _ in best[name]]
+            ))
+        return recommendations, errors
+
+    def _track_start(self, strategy: StrategyBaseABC,
+                     shared_raw_data: _SharedRawData,
+                     parameters: dict) -> Tuple[Callable[[], Recommendation],
+                                                Future]:
+        """Call executing strategy in a pool and future of the time
+        (monotonic) its execution starts"""
+        started = Future()
+
+        def call() -> Recommendation:
+            started.set_result(time.monotonic())
+            return self._execute_strategy(strategy, shared_raw_data,
+                                          parameters)
+
+        return call, started
+
+    def _remaining_time(self, start_time: float) -> float:
+        """Seconds left until timeout of strategy started at start_time"""
+        return max(0.0, start_time + self._strategy_timeout
+                   - time.monotonic())
+
+    @staticmethod
+    def _execute_strategy(strategy: StrategyBaseABC,
+                          shared_raw_data: _SharedRawData,
+                          parameters: dict) -> Recommendation:
+        """Execute strategy with shared raw data"""
+        raw_data = shared_raw_data.get(strategy, parameters)
+        with metrics.span('strategy_seconds',
+                          strategy=strategy.__class__.__name__):
+            return strategy.execute(raw_data=raw_data, **parameters)
+
+    @staticmethod
+    def _make_error(strategy: StrategyBaseABC, exception: Exception,
+                    tb: str) -> Error:
+        """Error of strategy execution, counted by label in metrics"""
+        label = strategy.__class__.__name__
+        metrics.inc('errors_total', label=label)
+        return Error(exception=exception, traceback=tb, label=label)
+
+    def _get_call_parameters(self, **kwargs) -> dict:
+        """Copy of default parameters updated with parameters of a call"""
+        parameters = dict(self._parameters)
+        parameters.update(kwargs)
+        return parameters
+
+    def get_live_games_or_none(self, raw_data: Optional[Dict[str, Any]] = None,
+                               **kwargs) -> Union[Recommendation, None]:
         """Get live games or None
-        Exceptions are not forwarded to client"""
+        Exceptions are not forwarded to client
+
+        :param raw_data: scoreboards already fetched by games date
+         (Recommendations.raw_data), reused if there is one for
+         the current game day"""
         try:
+            parameters = self._get_call_parameters(**kwargs)
             strategy = LiveGamesStrategy()
-            recommendation = strategy.execute(**self._parameters)
+            scoreboard = (raw_data or {}).get(get_date_etc_str())
+            recommendation = strategy.execute(raw_data=scoreboard,
+                                              **parameters)
             if not recommendation.games:
                 return
             return recommendation
         except Exception as err:
             return
 
+    async def get_live_games_or_none_async(
+            self, raw_data: Optional[Dict[str, Any]] = None,
+            **kwargs) -> Union[Recommendation, None]:
+        """Same as get_live_games_or_none, but without blocking
+        the event loop"""
+        loop = asyncio.get_running_loop()
+        call = functools.partial(self.get_live_games_or_none,
+                                 raw_data=raw_data, **kwargs)
+        return await loop.run_in_executor(self._executor, call)
+
     def set_parameters(self, **kwargs):
-        """Set or update if already exists additional parameters that will
-        be forwarded to Recommendations instance and
+        """Set or update if already exists default values of additional
+        parameters that will be forwarded to Recommendations instance and
         every strategy when executing it"""
         if kwargs:
             for key, value in kwargs.items():
@@ -69,4 +585,9 @@ class Adviser:
         return self._parameters.pop(key, None)
 
 
-adviser = Adviser(registered_strategies=strategies)
+adviser = Adviser(registered_strategies=strategies,
+                  max_workers=config.STRATEGIES_MAX_WORKERS,
+                  strategy_timeout=config.STRATEGY_TIMEOUT,
+                  stale_after=config.RECOMMENDATIONS_STALE_AFTER,
+                  stale_max_age=config.RECOMMENDATIONS_STALE_MAX_AGE,
+                  stale_maxsize=config.RECOMMENDATIONS_STALE_MAXSIZE)
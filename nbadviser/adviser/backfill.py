@@ -0,0 +1,63 @@
+"""Filling local index of games with historical games dates
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, TYPE_CHECKING
+
+from nbadviser.adviser.index import GameIndex
+from nbadviser.adviser.limiter import Priority
+from nbadviser.config import logger
+
+if TYPE_CHECKING:
+    from nbadviser.adviser.providers import ScoreboardProvider
+
+
+def backfill(games_dates: Iterable[str], provider: 'ScoreboardProvider',
+             index: GameIndex, concurrency: int) -> Dict[str, int]:
+    """Add finished games dates to index
+
+    Already indexed games dates are skipped, so interrupted backfill can be
+    resumed by running it again. Games dates that are not finished yet or
+    failed to be fetched are left for the next run.
+    Scoreboards are requested by concurrency threads with historical
+    priority, rate of requests is limited by limiter of provider
+
+    :returns counters of indexed, skipped (already indexed), not finished
+     and failed games dates
+    """
+    counters = dict(indexed=0, skipped=0, not_finished=0, failed=0)
+    pending = []
+    for games_date_str in games_dates:
+        if index.has_games_date(games_date_str):
+            counters['skipped'] += 1
+        else:
+            pending.append(games_date_str)
+    logger.info(f'Backfill: уже в индексе {counters["skipped"]}, '
+                f'к загрузке {len(pending)} игровых дней')
+
+    def index_games_date(games_date_str: str) -> bool:
+        scoreboard = provider.get(games_date_str,
+                                  priority=Priority.HISTORICAL)
+        if not provider.is_finished(games_date_str, scoreboard):
+            return False
+        index.add_games_date(games_date_str, scoreboard.table)
+        return True
+
+    with ThreadPoolExecutor(max_workers=concurrency,
+                            thread_name_prefix='backfill') as executor:
+        futures = {executor.submit(index_games_date, games_date_str):
+                   games_date_str for games_date_str in pending}
+        for done, future in enumerate(as_completed(futures), start=1):
+            games_date_str = futures[future]
+            try:
+                indexed = future.result()
+            except Exception as err:
+                counters['failed'] += 1
+                logger.warning(f'Backfill: не удалось загрузить '
+                               f'{games_date_str}: {err}')
+                continue
+            counters['indexed' if indexed else 'not_finished'] += 1
+            if done % 10 == 0 or done == len(pending):
+                logger.info(f'Backfill: обработано {done} из {len(pending)}')
+
+    logger.info(f'Backfill завершен: {counters}')
+    return counters
@@ -0,0 +1,113 @@
+"""Caching of raw data received from data providers
+"""
+import threading
+from typing import Any, Callable, Hashable, Optional
+
+from cachetools import LRUCache, TTLCache
+
+from nbadviser.metrics import metrics
+
+
+class _EvictionCountingMixin:
+    """Mixin for cachetools caches that calls on_evict when an item is
+    removed to free space for a new one"""
+
+    def __init__(self, *args, on_evict: Callable[[], None], **kwargs):
+        super().__init__(*args, **kwargs)
+        self._on_evict = on_evict
+
+    def popitem(self):
+        key, value = super().popitem()
+        self._on_evict()
+        return key, value
+
+
+class _LRUCache(_EvictionCountingMixin, LRUCache):
+    pass
+
+
+class _TTLCache(_EvictionCountingMixin, TTLCache):
+    pass
+
+
+class DataCache:
+    """Thread-safe size-bounded cache of raw data
+
+    Consists of two parts:
+    - recent: items with short time to live (e.g. scoreboard of the current
+      game day, that is changing while games are played)
+    - pinned: items that never change (e.g. scoreboard of a day when
+      all games are finished). They are kept until evicted by LRU policy
+
+    Hits, misses and evictions are counted, see stats(). If metric is set,
+    they are counted in metrics as well (label result=hit|miss|eviction)
+    """
+
+    def __init__(self, maxsize: int, ttl: float, pinned_maxsize: int,
+                 metric: Optional[str] = None):
+        self._recent = _TTLCache(maxsize=maxsize, ttl=ttl,
+                                 on_evict=self._count_eviction)
+        self._pinned = _LRUCache(maxsize=pinned_maxsize,
+                                 on_evict=self._count_eviction)
+        self._lock = threading.RLock()
+        self._metric = metric
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get item by key or None if there is no such item (or expired)"""
+        with self._lock:
+            value = self._pinned.get(key)
+            if value is None:
+                value = self._recent.get(key)
+
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        self._count('miss' if value is None else 'hit')
+        return value
+
+    def set(self, key: Hashable, value: Any, pinned: bool = False) -> None:
+        """Add or replace item
+        :param pinned: True if item is not going to change anymore"""
+        with self._lock:
+            if pinned:
+                self._recent.pop(key, None)
+                self._pinned[key] = value
+            else:
+                self._pinned.pop(key, None)
+                self._recent[key] = value
+
+    def clear(self) -> None:
+        """Remove all items (counters are not reset)"""
+        with self._lock:
+            self._recent = _TTLCache(maxsize=self._recent.maxsize,
+                                     ttl=self._recent.ttl,
+                                     on_evict=self._count_eviction)
+            self._pinned = _LRUCache(maxsize=self._pinned.maxsize,
+                                     on_evict=self._count_eviction)
+
+    def stats(self) -> dict:
+        """Current counters and sizes of cache"""
+        with self._lock:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions,
+                    'recent_size': len(self._recent),
+                    'pinned_size': len(self._pinned)}
+
+    def _count_eviction(self) -> None:
+        self.evictions += 1
+        self._count('eviction')
+
+    def _count(self, result: str) -> None:
+        if self._metric is not None:
+            metrics.inc(self._metric, result=result)
+
+    def __repr__(self):
+        stats = ', '.join(f'{key}={value}' for key, value
+                          in self.stats().items())
+        return f'<DataCache>{stats}'
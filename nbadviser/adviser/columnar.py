@@ -0,0 +1,167 @@
+"""Columnar representation of ScoreboardV2 data sets
+
+Rows of data sets are not turned into dicts: index of headers is built once
+per data set, columns are numpy arrays, so filters of games (by status,
+score gap, points) are vectorized operations.
+"""
+from typing import Dict, Iterable, Type, Any, List, Optional, Tuple
+
+import numpy as np
+
+from nbadviser.adviser.utils import AnyGame, Game, Team, Teams
+
+
+class Columns:
+    """Data set ({'headers': [...], 'data': [[...], ...]}) with access
+    to columns by header. Columns are built lazily and kept"""
+
+    def __init__(self, data_set: dict):
+        self.index = {header: position for position, header
+                      in enumerate(data_set['headers'])}
+        self.rows = data_set['data']
+        self._columns: Dict[str, np.ndarray] = dict()
+        self._numeric_columns: Dict[str, np.ndarray] = dict()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, header: str) -> np.ndarray:
+        """Column as array of python objects"""
+        column = self._columns.get(header)
+        if column is None:
+            position = self.index[header]
+            column = np.empty(len(self.rows), dtype=object)
+            column[:] = [row[position] for row in self.rows]
+            self._columns[header] = column
+        return column
+
+    def numeric(self, header: str) -> np.ndarray:
+        """Column as array of floats, missing values are NaN"""
+        column = self._numeric_columns.get(header)
+        if column is None:
+            position = self.index[header]
+            column = np.array([np.nan if row[position] is None
+                               else row[position] for row in self.rows],
+                              dtype=float)
+            self._numeric_columns[header] = column
+        return column
+
+    def value(self, row: int, header: str) -> Any:
+        """Original value of one cell"""
+        return self.rows[row][self.index[header]]
+
+
+class GameDayTable:
+    """All games of a day: game header joined with line score of home and
+    visitor teams. One row per game in order of game header.
+
+    Game objects are created only for chosen rows (see make_games).
+    Teams of a game are created once and shared by all game objects of
+    the row, instances of shareable game classes are created once as well,
+    so strategies and requests use the same read-only objects"""
+
+    def __init__(self, scoreboard):
+        header = Columns(scoreboard.game_header.get_dict())
+        line_score = Columns(scoreboard.line_score.get_dict())
+        self.team_leaders = Columns(scoreboard.team_leaders.get_dict())
+        self._header = header
+
+        self.game_ids = header['GAME_ID']
+        self.status_ids = header.numeric('GAME_STATUS_ID')
+        self.home_team_ids = header['HOME_TEAM_ID']
+        self.visitor_team_ids = header['VISITOR_TEAM_ID']
+        self.row_by_game_id = {game_id: row for row, game_id
+                               in enumerate(self.game_ids)}
+        # team_id -> (row, is home team)
+        self.team_index = dict()
+        for row, (home_id, visitor_id) in enumerate(
+                zip(self.home_team_ids, self.visitor_team_ids)):
+            self.team_index[home_id] = (row, True)
+            self.team_index[visitor_id] = (row, False)
+
+        games_count = len(header)
+        self.home_names = np.full(games_count, 'Undefined', dtype=object)
+        self.visitor_names = np.full(games_count, 'Undefined', dtype=object)
+        self.home_scores = np.full(games_count, np.nan)
+        self.visitor_scores = np.full(games_count, np.nan)
+
+        # Join line score (one row per team) with games
+        team_names = line_score['TEAM_CITY_NAME'] + ' ' + \
+            line_score['TEAM_NAME']
+        scores = line_score.numeric('PTS')
+        for score_row, team_id in enumerate(line_score['TEAM_ID']):
+            row, is_home = self.team_index.get(team_id, (None, None))
+            if row is None:
+                continue
+            if is_home:
+                self.home_names[row] = team_names[score_row]
+                self.home_scores[row] = scores[score_row]
+            else:
+                self.visitor_names[row] = team_names[score_row]
+                self.visitor_scores[row] = scores[score_row]
+
+        self._teams: List[Optional[Teams]] = [None] * games_count
+        self._shared_games: Dict[Tuple[type, int], Game] = dict()
+
+    def __len__(self):
+        return len(self.game_ids)
+
+    def score_gaps(self) -> np.ndarray:
+        """Absolute score gap of every game (NaN if score is unknown)"""
+        return np.abs(self.home_scores - self.visitor_scores)
+
+    def status_mask(self, status_id: int) -> np.ndarray:
+        return self.status_ids == status_id
+
+    def get_team(self, team_id: int) -> Optional[Team]:
+        """Access team playing this day by the team_id"""
+        row, is_home = self.team_index.get(team_id, (None, None))
+        if row is None:
+            return
+        teams = self.get_teams(row)
+        return teams.home if is_home else teams.visitor
+
+    def get_teams(self, row: int) -> Teams:
+        """Teams of the game, created once per row"""
+        teams = self._teams[row]
+        if teams is None:
+            home_team = Team(team_id=self.home_team_ids[row],
+                             name=self.home_names[row],
+                             score=self._score(self.home_scores[row]))
+            visitor_team = Team(team_id=self.visitor_team_ids[row],
+                                name=self.visitor_names[row],
+                                score=self._score(self.visitor_scores[row]))
+            teams = self._teams[row] = Teams(home=home_team,
+                                             visitor=visitor_team)
+        return teams
+
+    def make_games(self, game_object: Type[AnyGame],
+                   rows: Iterable[int]) -> Dict[str, AnyGame]:
+        """Create game instances for chosen rows
+        (or reuse already created ones if game class is shareable)"""
+        games = {}
+        for row in rows:
+            if game_object.shareable:
+                game = self._shared_games.get((game_object, row))
+                if game is None:
+                    game = self._shared_games.setdefault(
+                        (game_object, row), self._make_game(game_object, row)
+                    )
+            else:
+                game = self._make_game(game_object, row)
+            games[game.game_id] = game
+        return games
+
+    def _make_game(self, game_object: Type[AnyGame], row: int) -> AnyGame:
+        return game_object(
+            game_id=self.game_ids[row],
+            game_status=self._header.value(row, 'GAME_STATUS_TEXT').strip(),
+            game_status_id=int(self.status_ids[row]),
+            teams=self.get_teams(row),
+            period=self._header.value(row, 'LIVE_PERIOD') or 0
+        )
+
+    @staticmethod
+    def _score(score: float):
+        """Keep integer scores as int for output"""
+        return score if np.isnan(score) else int(score)
@@ -0,0 +1,267 @@
+"""Local index of historical games used by strategies instead of requests
+to data providers
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Set, Tuple
+
+from nbadviser import config
+from nbadviser.adviser.columnar import GameDayTable
+from nbadviser.adviser.utils import Game, GameStatus, \
+    GameWithTopPerformanceInfo, Team, Teams
+
+_GAME_COLUMNS = ('game_id', 'status_text', 'status_id', 'period',
+                 'home_team_id', 'home_team_name', 'home_pts',
+                 'visitor_team_id', 'visitor_team_name', 'visitor_pts')
+
+
+class GameIndex:
+    """SQLite index of finished games dates
+
+    For every indexed games date there are rows of games (teams, final
+    scores and score gap) and top scorers of teams, indexed by games date,
+    score gap and points. Only finished games dates are intended to be
+    indexed, they are not going to change.
+    Connection is opened lazily on first use"""
+
+    filename = 'games_index.sqlite3'
+
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, self.filename)
+        self._directory = directory
+        self._connection = None
+        self._lock = threading.Lock()
+        self._indexed_dates: Set[str] = set()  # Known to be indexed
+
+    def add_games_date(self, games_date_str: str,
+                       table: GameDayTable) -> None:
+        """Add or replace all games of games date"""
+        games = table.make_games(Game, range(len(table)))
+        score_gaps = table.score_gaps()
+        game_rows = []
+        for order, game in enumerate(games.values()):
+            home, visitor = game.teams.home, game.teams.visitor
+            game_rows.append((
+                games_date_str, order, game.game_id, game.status,
+                game.status_id, game.period,
+                home.team_id, home.name, self._score(home.score),
+                visitor.team_id, visitor.name, self._score(visitor.score),
+                self._score(score_gaps[order])
+            ))
+
+        team_leaders = table.team_leaders
+        scorer_rows = [
+            (games_date_str, order,
+             team_leaders.value(order, 'GAME_ID'),
+             team_leaders.value(order, 'TEAM_ID'),
+             team_leaders.value(order, 'PTS_PLAYER_NAME'),
+             team_leaders.value(order, 'PTS'))
+            for order in range(len(team_leaders))
+        ]
+
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                for table_name in ('games', 'top_scorers', 'indexed_dates'):
+                    connection.execute(f'DELETE FROM {table_name} '
+                                       f'WHERE games_date = ?',
+                                       (games_date_str,))
+                connection.executemany(
+                    'INSERT INTO games (games_date, game_order, '
+                    + ', '.join(_GAME_COLUMNS) + ', score_gap) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    game_rows
+                )
+                connection.executemany(
+                    'INSERT INTO top_scorers (games_date, leader_order, '
+                    'game_id, team_id, player_name, pts) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    scorer_rows
+                )
+                connection.execute(
+                    'INSERT INTO indexed_dates (games_date, indexed_at) '
+                    'VALUES (?, ?)', (games_date_str, time.time())
+                )
+            self._indexed_dates.add(games_date_str)
+
+    def has_games_date(self, games_date_str: str) -> bool:
+        """Check that games date is indexed"""
+        if games_date_str in self._indexed_dates:
+            return True
+
+        query = 'SELECT 1 FROM indexed_dates WHERE games_date = ?'
+        with self._lock:
+            row = self._connect().execute(query,
+                                          (games_date_str,)).fetchone()
+            if row is not None:
+                self._indexed_dates.add(games_date_str)
+        return row is not None
+
+    def close_games(self, games_date_str: str, allowed_gap: int,
+                    top_games: int) -> List[Game]:
+        """Finished games with top_games smallest score gaps
+        (not more than allowed_gap) ordered by score gap"""
+        query = 'SELECT ' + ', '.join(_GAME_COLUMNS) + ' FROM games ' \
+                'WHERE games_date = ? AND status_id = ? AND score_gap <= ? ' \
+                'AND score_gap IN (' \
+                'SELECT DISTINCT score_gap FROM games ' \
+                'WHERE games_date = ? AND status_id = ? ' \
+                'AND score_gap IS NOT NULL ' \
+                'ORDER BY score_gap LIMIT ?) ' \
+                'ORDER BY score_gap, game_order'
+        status_id = GameStatus.FINAL.value
+        with self._lock:
+            rows = self._connect().execute(
+                query, (games_date_str, status_id, allowed_gap,
+                        games_date_str, status_id, top_games)
+            ).fetchall()
+        return [self._make_game(Game, row) for row in rows]
+
+    def top_performances(self, games_date_str: str, score_required: int
+                         ) -> List[GameWithTopPerformanceInfo]:
+        """Games where top scorer of any team scored at least
+        score_required points"""
+        query = 'SELECT ' + ', '.join(f'games.{column}' for column
+                                      in _GAME_COLUMNS) + \
+                ', top_scorers.player_name, top_scorers.pts ' \
+                'FROM top_scorers JOIN games ' \
+                'ON games.games_date = top_scorers.games_date ' \
+                'AND games.game_id = top_scorers.game_id ' \
+                'WHERE top_scorers.games_date = ? AND top_scorers.pts >= ? ' \
+                'ORDER BY top_scorers.leader_order'
+        with self._lock:
+            rows = self._connect().execute(
+                query, (games_date_str, score_required)
+            ).fetchall()
+
+        games: Dict[str, GameWithTopPerformanceInfo] = dict()
+        for row in rows:
+            game_row, (player_name, pts) = row[:-2], row[-2:]
+            game = games.get(game_row[0])
+            if game is None:
+                game = games[game_row[0]] = self._make_game(
+                    GameWithTopPerformanceInfo, game_row
+                )
+            game.fill_player_performance(PTS_PLAYER_NAME=player_name, PTS=pts)
+        return list(games.values())
+
+    def close_games_of_period(self, first_date_str: str,
+                              last_date_str: str, allowed_gap: int,
+                              limit: int) -> List[Tuple[str, Game]]:
+        """limit finished games of the period with the smallest score gaps
+        (not more than allowed_gap) and their games dates"""
+        query = 'SELECT games_date, ' + ', '.join(_GAME_COLUMNS) + \
+                ' FROM games WHERE games_date BETWEEN ? AND ? ' \
+                'AND status_id = ? AND score_gap <= ? ' \
+                'ORDER BY score_gap, games_date, game_order LIMIT ?'
+        with self._lock:
+            rows = self._connect().execute(
+                query, (first_date_str, last_date_str,
+                        GameStatus.FINAL.value, allowed_gap, limit)
+            ).fetchall()
+        return [(row[0], self._make_game(Game, row[1:])) for row in rows]
+
+    def top_performances_of_period(
+            self, first_date_str: str, last_date_str: str,
+            score_required: int, limit: int
+    ) -> List[Tuple[str, GameWithTopPerformanceInfo]]:
+        """limit games of the period with the most points scored by top
+        scorer of any team (at least score_required) and their games
+        dates"""
+        query = 'SELECT games.games_date, ' + \
+                ', '.join(f'games.{column}' for column in _GAME_COLUMNS) + \
+                ', top_scorers.player_name, top_scorers.pts ' \
+                'FROM top_scorers JOIN games ' \
+                'ON games.games_date = top_scorers.games_date ' \
+                'AND games.game_id = top_scorers.game_id ' \
+                'WHERE top_scorers.games_date BETWEEN ? AND ? ' \
+                'AND top_scorers.pts >= ? ' \
+                'ORDER BY top_scorers.pts DESC, top_scorers.games_date, ' \
+                'top_scorers.leader_order'
+        with self._lock:
+            rows = self._connect().execute(
+                query, (first_date_str, last_date_str, score_required)
+            ).fetchall()
+
+        games: Dict[Tuple[str, str], GameWithTopPerformanceInfo] = dict()
+        for row in rows:
+            games_date_str, game_row = row[0], row[1:-2]
+            player_name, pts = row[-2:]
+            key = (games_date_str, game_row[0])
+            game = games.get(key)
+            if game is None:
+                if len(games) == limit:
+                    continue
+                game = games[key] = self._make_game(
+                    GameWithTopPerformanceInfo, game_row
+                )
+            game.fill_player_performance(PTS_PLAYER_NAME=player_name, PTS=pts)
+        return [(games_date_str, game)
+                for (games_date_str, _), game in games.items()]
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open connection and create tables if needed"""
+        if self._connection is None:
+            os.makedirs(self._directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.executescript(
+                'CREATE TABLE IF NOT EXISTS games ('
+                'games_date TEXT NOT NULL, '
+                'game_order INTEGER NOT NULL, '
+                'game_id TEXT NOT NULL, '
+                'status_text TEXT, '
+                'status_id INTEGER, '
+                'period INTEGER, '
+                'home_team_id INTEGER, '
+                'home_team_name TEXT, '
+                'home_pts INTEGER, '
+                'visitor_team_id INTEGER, '
+                'visitor_team_name TEXT, '
+                'visitor_pts INTEGER, '
+                'score_gap INTEGER, '
+                'PRIMARY KEY (games_date, game_id));'
+                'CREATE INDEX IF NOT EXISTS games_score_gap '
+                'ON games (games_date, status_id, score_gap);'
+                'CREATE TABLE IF NOT EXISTS top_scorers ('
+                'games_date TEXT NOT NULL, '
+                'leader_order INTEGER NOT NULL, '
+                'game_id TEXT NOT NULL, '
+                'team_id INTEGER, '
+                'player_name TEXT, '
+                'pts INTEGER, '
+                'PRIMARY KEY (games_date, leader_order));'
+                'CREATE INDEX IF NOT EXISTS top_scorers_pts '
+                'ON top_scorers (games_date, pts);'
+                'CREATE TABLE IF NOT EXISTS indexed_dates ('
+                'games_date TEXT PRIMARY KEY, '
+                'indexed_at REAL NOT NULL);'
+            )
+            self._connection = connection
+        return self._connection
+
+    @staticmethod
+    def _make_game(game_object, row: tuple):
+        (game_id, status_text, status_id, period,
+         home_team_id, home_team_name, home_pts,
+         visitor_team_id, visitor_team_name, visitor_pts) = row
+        teams = Teams(
+            home=Team(team_id=home_team_id, name=home_team_name,
+                      score=float('nan') if home_pts is None else home_pts),
+            visitor=Team(team_id=visitor_team_id, name=visitor_team_name,
+                         score=float('nan') if visitor_pts is None
+                         else visitor_pts)
+        )
+        return game_object(game_id=game_id, game_status=status_text,
+                           game_status_id=status_id, teams=teams,
+                           period=period)
+
+    @staticmethod
+    def _score(score: float):
+        """Scores are kept as integers, unknown score as NULL"""
+        return None if score != score else int(score)
+
+
+game_index = GameIndex(directory=config.GAME_INDEX_DIR) \
+    if config.GAME_INDEX_DIR else None
@@ -0,0 +1,98 @@
+"""Limiting rate of requests to data providers
+"""
+import heapq
+import itertools
+import threading
+import time
+from enum import IntEnum
+from typing import List, Optional, Tuple
+
+from nbadviser.adviser.transport import TransportError
+from nbadviser.metrics import metrics
+
+
+class Priority(IntEnum):
+    """Priority of a request, the lower value goes first"""
+    INTERACTIVE = 0  # User waits for the current game day
+    BACKGROUND = 1  # Refreshing of the current game day, live games polling
+    HISTORICAL = 2  # Past games dates (periods, seasons, backfill)
+
+
+class RateLimitTimeout(TransportError):
+    """Request was not allowed during max wait time"""
+
+
+class PriorityRateLimiter:
+    """Token bucket shared by all threads with priority queue of waiting
+    requests
+
+    Tokens are added at rate per second up to burst. A request takes one
+    token, requests without a token wait in queue: the one with higher
+    priority (then the one waiting longer) gets the next token.
+    Queue depth and wait time by priority are exposed as metrics
+    (limiter_queue_depth, limiter_wait_seconds)
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._queue: List[Tuple[int, int]] = []  # (priority, order)
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+
+    def acquire(self, priority: Priority,
+                max_wait: Optional[float] = None) -> float:
+        """Wait for a token
+        :returns seconds of waiting
+        :raises RateLimitTimeout: if token is not given during max_wait"""
+        start_time = time.monotonic()
+        ticket = (int(priority), next(self._order))
+        with self._condition:
+            heapq.heappush(self._queue, ticket)
+            self._update_queue_depth()
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._queue[0] == ticket and self._tokens >= 1:
+                        self._tokens -= 1
+                        break
+
+                    timeout = None
+                    if self._queue[0] == ticket:
+                        timeout = (1 - self._tokens) / self._rate
+                    if max_wait is not None:
+                        remaining = start_time + max_wait - now
+                        if remaining <= 0:
+                            raise RateLimitTimeout(
+                                f'Нет разрешения на запрос за {max_wait} с'
+                            )
+                        timeout = remaining if timeout is None \
+                            else min(timeout, remaining)
+                    self._condition.wait(timeout)
+            finally:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._update_queue_depth()
+                # The next request in queue is the first one now
+                self._condition.notify_all()
+
+        waited = time.monotonic() - start_time
+        metrics.observe('limiter_wait_seconds', waited,
+                        priority=priority.name.lower())
+        return waited
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self._burst, self._tokens
+                           + (now - self._updated_at) * self._rate)
+        self._updated_at = now
+
+    def _update_queue_depth(self) -> None:
+        for priority in Priority:
+            metrics.set_gauge(
+                'limiter_queue_depth',
+                sum(1 for ticket in self._queue if ticket[0] == priority),
+                priority=priority.name.lower()
+            )
@@ -0,0 +1,81 @@
+"""Background refreshing of the current game day
+"""
+import datetime
+
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from nbadviser import config
+from nbadviser.adviser.adviser import Adviser, adviser
+from nbadviser.adviser.limiter import Priority
+from nbadviser.adviser.providers import ScoreboardProvider, \
+    scoreboard_provider
+from nbadviser.adviser.utils import get_date_etc_str
+from nbadviser.config import logger, ETC_TIMEZONE
+
+
+class Prewarmer:
+    """Refresh scoreboard of the current game day on a schedule and
+    precompute recommendations for it, so that user requests do not wait
+    for NBA API.
+
+    Refreshing is frequent (live_interval) while any game is live and
+    rare (idle_interval) otherwise. Precomputed recommendations are served
+    during two intervals, so one failed refresh does not stop serving them.
+    Recommendations of not finished game day are served not longer than
+    live_interval, as games can go live between rare refreshes
+    """
+
+    job_id = 'prewarm'
+
+    def __init__(self, adviser: Adviser, provider: ScoreboardProvider,
+                 live_interval: float, idle_interval: float):
+        self._adviser = adviser
+        self._provider = provider
+        self._live_interval = live_interval
+        self._idle_interval = idle_interval
+        self._interval = idle_interval
+        self._scheduler = BackgroundScheduler(timezone=ETC_TIMEZONE)
+
+    def start(self) -> None:
+        """Start scheduler with the first refresh right away"""
+        self._scheduler.add_job(
+            self.refresh, trigger='interval', seconds=self._interval,
+            id=self.job_id, coalesce=True, max_instances=1,
+            next_run_time=datetime.datetime.now(tz=ETC_TIMEZONE)
+        )
+        self._scheduler.start()
+
+    def shutdown(self) -> None:
+        self._scheduler.shutdown(wait=False)
+
+    def refresh(self) -> None:
+        """Refresh scoreboard and recommendations of the current game day
+        and adjust interval of refreshing"""
+        games_date_str = get_date_etc_str()
+        try:
+            scoreboard = self._provider.refresh(games_date_str,
+                                                priority=Priority.BACKGROUND)
+        except Exception as err:
+            logger.warning(f'Не удалось обновить игровой день '
+                           f'{games_date_str}: {err}')
+            return
+
+        interval = self._live_interval if scoreboard.has_live_games() \
+            else self._idle_interval
+        max_age = 2 * interval
+        if not self._provider.is_finished(games_date_str, scoreboard):
+            max_age = min(max_age, self._live_interval)
+        self._adviser.precompute(max_age=max_age, raw_data=scoreboard,
+                                 games_date=games_date_str)
+
+        if interval != self._interval:
+            self._interval = interval
+            if self._scheduler.running:
+                self._scheduler.reschedule_job(self.job_id,
+                                               trigger='interval',
+                                               seconds=interval)
+
+
+prewarmer = Prewarmer(adviser=adviser, provider=scoreboard_provider,
+                      live_interval=config.PREWARM_LIVE_INTERVAL,
+                      idle_interval=config.PREWARM_IDLE_INTERVAL)
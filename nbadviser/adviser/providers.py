@@ -0,0 +1,304 @@
+"""Data providers used by strategies
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from cachetools import LRUCache
+from nba_api.stats.endpoints._base import Endpoint
+from nba_api.stats.endpoints.scoreboardv2 import ScoreboardV2
+
+from nbadviser import config
+from nbadviser.adviser.cache import DataCache
+from nbadviser.adviser.columnar import GameDayTable
+from nbadviser.adviser.limiter import PriorityRateLimiter, Priority
+from nbadviser.adviser.singleflight import SingleFlight
+from nbadviser.adviser.store import ScoreboardStore, DataSets
+from nbadviser.adviser.transport import StatsTransport, TransportError, \
+    CircuitBreaker
+from nbadviser.adviser.utils import get_date_etc_str, GameStatus
+from nbadviser.config import logger
+from nbadviser.metrics import metrics
+
+
+class ScoreboardData:
+    """Data sets of ScoreboardV2 endpoint that are used by strategies.
+    Has the same interface of accessing data sets as ScoreboardV2
+    (e.g. scoreboard.game_header.get_dict())"""
+
+    data_set_names = ('GameHeader', 'LineScore', 'TeamLeaders')
+
+    def __init__(self, data_sets: DataSets):
+        self.data_sets = data_sets
+        self.game_header = Endpoint.DataSet(data=data_sets['GameHeader'])
+        self.line_score = Endpoint.DataSet(data=data_sets['LineScore'])
+        self.team_leaders = Endpoint.DataSet(data=data_sets['TeamLeaders'])
+        self.fetched_at: Optional[float] = None  # Time of request
+        self._fingerprint = None
+        self._table = None
+
+    @property
+    def table(self) -> GameDayTable:
+        """Columnar representation of games, built once and shared
+        by all strategies"""
+        if self._table is None:
+            with metrics.span('stage_seconds', stage='preprocess'):
+                self._table = GameDayTable(self)
+        return self._table
+
+    @property
+    def fingerprint(self) -> str:
+        """Digest of data sets content, changes when scoreboard changes"""
+        if self._fingerprint is None:
+            content = json.dumps(self.data_sets, sort_keys=True,
+                                 separators=(',', ':'))
+            self._fingerprint = hashlib.blake2b(content.encode(),
+                                                digest_size=16).hexdigest()
+        return self._fingerprint
+
+    def game_status_ids(self) -> List[int]:
+        """Statuses of all games of the day (see GameStatus)"""
+        _data = self.game_header.get_dict()
+        status_id_index = _data['headers'].index('GAME_STATUS_ID')
+        return [game_data_list[status_id_index]
+                for game_data_list in _data['data']]
+
+    def has_live_games(self) -> bool:
+        return GameStatus.LIVE.value in self.game_status_ids()
+
+    @classmethod
+    def from_endpoint(cls, scoreboard: ScoreboardV2) -> 'ScoreboardData':
+        """Keep only needed data sets of ScoreboardV2 endpoint"""
+        return cls({
+            'GameHeader': scoreboard.game_header.get_dict(),
+            'LineScore': scoreboard.line_score.get_dict(),
+            'TeamLeaders': scoreboard.team_leaders.get_dict(),
+        })
+
+
+class ScoreboardProvider:
+    """Get scoreboard by games date
+
+    Order of lookup:
+    - in-memory cache
+    - on-disk store (optional, only finished games dates)
+    - ScoreboardV2 endpoint
+    Concurrent cache misses of the same games date are coalesced into
+    one lookup in store and endpoint request
+
+    Endpoint is requested with transport (if not set - by nba_api itself).
+    If request fails (e.g. circuit breaker of transport is open), the last
+    fetched scoreboard of games date is served even if it is outdated
+
+    Requests to endpoint are limited by limiter (if set) with priority
+    given by caller, by default current game day is interactive and
+    past games dates are historical (see Priority)
+
+    If store is shared by worker processes (shared_max_age is set), not
+    finished games dates updated by any process not more than
+    shared_max_age seconds ago are also taken from store. Only one process
+    requests endpoint for a games date (holding its lease in store),
+    others wait for the result to appear in store
+    """
+
+    # Seconds between checks of store while another process fetches
+    shared_poll_interval = 0.1
+
+    def __init__(self, cache: DataCache,
+                 store: Optional[ScoreboardStore] = None,
+                 transport: Optional[StatsTransport] = None,
+                 limiter: Optional[PriorityRateLimiter] = None,
+                 limiter_max_wait: Optional[float] = None,
+                 stale_maxsize: int = config.SCOREBOARD_CACHE_MAXSIZE,
+                 shared_max_age: Optional[float] = None,
+                 lease_ttl: float = config.SCOREBOARD_LEASE_TTL):
+        self.cache = cache
+        self.store = store
+        self.transport = transport
+        self.limiter = limiter
+        self.shared_max_age = shared_max_age
+        self._lease_ttl = lease_ttl
+        self.limiter_max_wait = limiter_max_wait
+        self._single_flight = SingleFlight(
+            metric='scoreboard_coalesced_total'
+        )
+        # Last fetched scoreboards by games date, kept after expiration
+        self._stale = LRUCache(maxsize=stale_maxsize)
+        self._stale_lock = threading.Lock()
+
+    def get(self, games_date_str: str,
+            priority: Optional[Priority] = None) -> ScoreboardData:
+        """Get scoreboard of games date (string in a format YYYY-MM-DD)
+        :param priority: priority of request to endpoint if it is needed"""
+        scoreboard = self.cache.get(games_date_str)
+        if scoreboard is not None:
+            return scoreboard
+
+        return self._single_flight.do(
+            games_date_str, lambda: self._load(games_date_str, priority)
+        )
+
+    def refresh(self, games_date_str: str,
+                priority: Optional[Priority] = None) -> ScoreboardData:
+        """Request scoreboard from endpoint bypassing cache and store
+        and update them"""
+        return self._single_flight.do(
+            games_date_str, lambda: self._fetch(games_date_str, priority)
+        )
+
+    def stats(self) -> dict:
+        """Counters of cache and coalesced requests"""
+        stats = self.cache.stats()
+        stats['coalesced'] = self._single_flight.coalesced
+        return stats
+
+    def _load(self, games_date_str: str,
+              priority: Optional[Priority]) -> ScoreboardData:
+        """Get scoreboard from store or endpoint and put it in cache"""
+        if self.shared_max_age is not None and self.store is not None:
+            scoreboard = self._get_shared(games_date_str)
+            if scoreboard is not None:
+                return scoreboard
+        elif self.store is not None:
+            data_sets = self.store.get(games_date_str)
+            if data_sets is not None:
+                scoreboard = ScoreboardData(data_sets)
+                self.cache.set(games_date_str, scoreboard, pinned=True)
+                return scoreboard
+
+        try:
+            if self.shared_max_age is not None and self.store is not None:
+                return self._fetch_leased(games_date_str, priority)
+            return self._fetch(games_date_str, priority)
+        except TransportError as err:
+            with self._stale_lock:
+                scoreboard = self._stale.get(games_date_str)
+            if scoreboard is None:
+                raise
+            age = time.time() - scoreboard.fetched_at
+            metrics.inc('stale_served_total')
+            logger.warning(f'Игровой день {games_date_str} из кэша '
+                           f'(получен {age:.0f} с назад): {err}')
+            return scoreboard
+
+    def _get_shared(self, games_date_str: str) -> Optional[ScoreboardData]:
+        """Get scoreboard from shared store if it is fresh enough and put
+        it in cache"""
+        fresh = self.store.get_fresh(games_date_str,
+                                     max_age=self.shared_max_age)
+        if fresh is None:
+            return
+        data_sets, updated_at = fresh
+        scoreboard = ScoreboardData(data_sets)
+        scoreboard.fetched_at = updated_at
+        self.cache.set(games_date_str, scoreboard,
+                       pinned=self.is_finished(games_date_str, scoreboard))
+        return scoreboard
+
+    def _fetch_leased(self, games_date_str: str,
+                      priority: Optional[Priority]) -> ScoreboardData:
+        """Request scoreboard from endpoint holding lease of games date
+        in shared store or wait until the process holding it puts
+        scoreboard in store"""
+        owner = str(os.getpid())
+        while not self.store.acquire_lease(games_date_str, owner,
+                                           ttl=self._lease_ttl):
+            time.sleep(self.shared_poll_interval)
+            scoreboard = self._get_shared(games_date_str)
+            if scoreboard is not None:
+                metrics.inc('shared_fetch_waited_total')
+                return scoreboard
+
+        try:
+            # Could be fetched by another process before lease was taken
+            scoreboard = self._get_shared(games_date_str)
+            if scoreboard is not None:
+                return scoreboard
+            return self._fetch(games_date_str, priority)
+        finally:
+            self.store.release_lease(games_date_str, owner)
+
+    def _fetch(self, games_date_str: str,
+               priority: Optional[Priority]) -> ScoreboardData:
+        """Request scoreboard from endpoint and put it in cache and store"""
+        if self.limiter is not None:
+            if priority is None:
+                priority = Priority.INTERACTIVE \
+                    if games_date_str >= get_date_etc_str() \
+                    else Priority.HISTORICAL
+            self.limiter.acquire(priority, max_wait=self.limiter_max_wait)
+
+        with metrics.span('stage_seconds', stage='fetch'):
+            if self.transport is None:
+                endpoint = ScoreboardV2(game_date=games_date_str,
+                                        get_request=True)
+            else:
+                endpoint = self.transport.get_scoreboard(games_date_str)
+            scoreboard = ScoreboardData.from_endpoint(endpoint)
+        scoreboard.fetched_at = time.time()
+        with self._stale_lock:
+            self._stale[games_date_str] = scoreboard
+        finished = self.is_finished(games_date_str, scoreboard)
+        self.cache.set(games_date_str, scoreboard, pinned=finished)
+        if self.store is not None:
+            self.store.put(games_date_str, scoreboard.data_sets,
+                           finished=finished)
+        return scoreboard
+
+    def warm_up(self) -> int:
+        """Load finished games dates from store into cache
+        :returns number of loaded games dates"""
+        if self.store is None:
+            return 0
+
+        loaded = 0
+        for games_date_str, data_sets in self.store.iter_finished(
+                limit=config.SCOREBOARD_CACHE_PINNED_MAXSIZE):
+            self.cache.set(games_date_str, ScoreboardData(data_sets),
+                           pinned=True)
+            loaded += 1
+        logger.info(f'Загружено из хранилища игровых дней: {loaded}')
+        return loaded
+
+    @staticmethod
+    def is_finished(games_date_str: str, scoreboard: ScoreboardData) -> bool:
+        """Check that scoreboard is not going to change anymore:
+        games date is in the past and all games of the day are finished"""
+        games_date = datetime.strptime(games_date_str, '%Y-%m-%d').date()
+        current_date = datetime.strptime(get_date_etc_str(),
+                                         '%Y-%m-%d').date()
+        if games_date >= current_date:
+            return False
+
+        return all(status_id == GameStatus.FINAL.value
+                   for status_id in scoreboard.game_status_ids())
+
+
+scoreboard_provider = ScoreboardProvider(
+    cache=DataCache(maxsize=config.SCOREBOARD_CACHE_MAXSIZE,
+                    ttl=config.SCOREBOARD_CACHE_TTL,
+                    pinned_maxsize=config.SCOREBOARD_CACHE_PINNED_MAXSIZE,
+                    metric='scoreboard_cache_total'),
+    store=ScoreboardStore(directory=config.SCOREBOARD_STORE_DIR)
+    if config.SCOREBOARD_STORE_DIR else None,
+    transport=StatsTransport(
+        base_url=config.STATS_BASE_URL,
+        connect_timeout=config.STATS_CONNECT_TIMEOUT,
+        read_timeout=config.STATS_READ_TIMEOUT,
+        retries=config.STATS_RETRIES,
+        backoff_base=config.STATS_BACKOFF_BASE,
+        backoff_max=config.STATS_BACKOFF_MAX,
+        pool_size=config.STATS_POOL_SIZE,
+        breaker=CircuitBreaker(
+            failure_threshold=config.STATS_BREAKER_FAILURES,
+            reset_timeout=config.STATS_BREAKER_RESET_TIMEOUT
+        )
+    ),
+    limiter=PriorityRateLimiter(rate=config.STATS_RATE_LIMIT,
+                                burst=config.STATS_RATE_BURST),
+    limiter_max_wait=config.STATS_RATE_MAX_WAIT
+)
@@ -0,0 +1,62 @@
+"""Coalescing of identical concurrent calls
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from nbadviser.metrics import metrics
+
+
+class _Call:
+    """Call in progress"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Make sure that only one call with the same key is in flight.
+    The first caller executes the function, others with the same key wait
+    for its result (or exception) instead of executing it again.
+
+    coalesced - number of calls that got result of another call, counted
+    in metrics as well if metric is set
+    """
+
+    def __init__(self, metric: Optional[str] = None):
+        self._calls: Dict[Hashable, _Call] = dict()
+        self._lock = threading.Lock()
+        self._metric = metric
+        self.coalesced = 0
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """Execute func or wait for result of call in flight with
+        the same key"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                is_leader = True
+            else:
+                self.coalesced += 1
+                is_leader = False
+
+        if not is_leader:
+            if self._metric is not None:
+                metrics.inc(self._metric)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as err:
+            call.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
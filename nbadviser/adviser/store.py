@@ -0,0 +1,145 @@
+"""Persistent on-disk storage of raw data received from data providers
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Iterator, Optional, Tuple
+
+DataSets = Dict[str, dict]
+
+
+class ScoreboardStore:
+    """SQLite storage of scoreboard data sets by games date
+
+    Data sets are stored as zlib-compressed JSON together with a flag
+    whether games date is finished (scoreboard is not going to change).
+    Connection is opened lazily on first use
+
+    Database is in WAL mode, so it can be shared by worker processes:
+    readers do not block the writer. Leases (acquire_lease) let one
+    process fetch a games date while others wait for it in store"""
+
+    filename = 'scoreboards.sqlite3'
+
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, self.filename)
+        self._directory = directory
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def get(self, games_date_str: str,
+            finished_only: bool = True) -> Optional[DataSets]:
+        """Get data sets stored for games date or None
+        :param finished_only: return data only if games date is finished"""
+        query = 'SELECT data, finished FROM scoreboards WHERE games_date = ?'
+        with self._lock:
+            row = self._connect().execute(query, (games_date_str,)).fetchone()
+
+        if row is None:
+            return
+        data, finished = row
+        if finished_only and not finished:
+            return
+        return self._decode(data)
+
+    def put(self, games_date_str: str, data_sets: DataSets,
+            finished: bool) -> None:
+        """Add or replace data sets for games date"""
+        query = 'INSERT OR REPLACE INTO scoreboards ' \
+                '(games_date, finished, data, updated_at) VALUES (?, ?, ?, ?)'
+        with self._lock:
+            connection = self._connect()
+            connection.execute(query, (games_date_str, int(finished),
+                                       self._encode(data_sets), time.time()))
+            connection.commit()
+
+    def get_fresh(self, games_date_str: str,
+                  max_age: float) -> Optional[Tuple[DataSets, float]]:
+        """Get data sets of games date if it is finished or was updated
+        not more than max_age seconds ago
+        :returns data sets and time of update"""
+        query = 'SELECT data, finished, updated_at FROM scoreboards ' \
+                'WHERE games_date = ?'
+        with self._lock:
+            row = self._connect().execute(query, (games_date_str,)).fetchone()
+
+        if row is None:
+            return
+        data, finished, updated_at = row
+        if not finished and time.time() - updated_at > max_age:
+            return
+        return self._decode(data), updated_at
+
+    def acquire_lease(self, key: str, owner: str, ttl: float) -> bool:
+        """Take lease of key for ttl seconds if it is not held by another
+        owner (or expired)
+        :returns False if lease is held by another owner"""
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                cursor = connection.execute(
+                    'INSERT INTO leases (key, owner, expires_at) '
+                    'VALUES (?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+                    'owner = excluded.owner, expires_at = excluded.expires_at '
+                    'WHERE leases.owner = excluded.owner '
+                    'OR leases.expires_at < ?',
+                    (key, owner, now + ttl, now)
+                )
+                return cursor.rowcount == 1
+
+    def release_lease(self, key: str, owner: str) -> None:
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute(
+                    'DELETE FROM leases WHERE key = ? AND owner = ?',
+                    (key, owner)
+                )
+
+    def iter_finished(self, limit: int) -> Iterator[Tuple[str, DataSets]]:
+        """Iterate over last updated finished games dates and their data"""
+        query = 'SELECT games_date, data FROM scoreboards WHERE finished = 1 ' \
+                'ORDER BY updated_at DESC LIMIT ?'
+        with self._lock:
+            rows = self._connect().execute(query, (limit,)).fetchall()
+
+        for games_date_str, data in rows:
+            yield games_date_str, self._decode(data)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open connection and create table if needed"""
+        if self._connection is None:
+            os.makedirs(self._directory, exist_ok=True)
+            # Waits for locks of other processes up to timeout seconds
+            connection = sqlite3.connect(self.path, timeout=30,
+                                         check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS scoreboards ('
+                'games_date TEXT PRIMARY KEY, '
+                'finished INTEGER NOT NULL, '
+                'data BLOB NOT NULL, '
+                'updated_at REAL NOT NULL)'
+            )
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS leases ('
+                'key TEXT PRIMARY KEY, '
+                'owner TEXT NOT NULL, '
+                'expires_at REAL NOT NULL)'
+            )
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    @staticmethod
+    def _encode(data_sets: DataSets) -> bytes:
+        return zlib.compress(json.dumps(data_sets,
+                                        separators=(',', ':')).encode())
+
+    @staticmethod
+    def _decode(data: bytes) -> DataSets:
+        return json.loads(zlib.decompress(data))
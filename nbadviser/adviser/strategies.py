@@ -2,14 +2,21 @@
 """
 
 from abc import ABC, abstractmethod
-from collections import defaultdict
-from typing import Callable, Any, Dict, Type, TypeVar
+from typing import Callable, Any, Dict, List, Optional, Tuple, Type, \
+    TypeVar, TYPE_CHECKING
 
-from nba_api.stats.endpoints.scoreboardv2 import ScoreboardV2
+import numpy as np
 
+from nbadviser.adviser.index import game_index
 from nbadviser.adviser.utils import Recommendation, Game, get_date_etc_str, \
-    GameWithTopPerformanceInfo, Team, Teams, GameWithScoreInfo, GameStatus, \
-    AnyGame
+    GameWithTopPerformanceInfo, GameWithScoreInfo, GameStatus, AnyGame
+
+# Game recommended for a games date: (games date, game)
+DatedGame = Tuple[str, AnyGame]
+
+if TYPE_CHECKING:
+    # Provider (with nba_api) is imported on the first request of data
+    from nbadviser.adviser.providers import ScoreboardData
 
 # Easy initialization and registration of strategies
 strategies = {}
@@ -18,6 +25,7 @@ strategies = {}
 def register_strategy(strategy_class: Callable):
     """Register and initialize a strategy"""
     strategies[strategy_class.__name__] = strategy_class()
+    return strategy_class
 
 
 class StrategyBaseABC(ABC):
@@ -44,6 +52,19 @@ class StrategyBaseABC(ABC):
         """Get raw data from any provider"""
         raise NotImplementedError('You are calling method on ABC base class')
 
+    def rank_games(self, games: List[DatedGame],
+                   top_games: int) -> List[DatedGame]:
+        """Choose top_games best of games recommended by the strategy for
+        many games dates (in order of games dates). The first ones
+        by default"""
+        return games[:top_games]
+
+    def best_from_index(self, games_dates: List[str],
+                        top_games: int) -> Optional[List[DatedGame]]:
+        """The same as rank_games of recommendations of all games dates but
+        answered by the local index of games, None if it is not possible"""
+        return None
+
     @staticmethod
     def apply_parameters(**kwargs) -> dict:
         """Return dict of parameters to use in a strategy"""
@@ -56,76 +77,55 @@ class StrategyBaseABC(ABC):
             game_date_str = get_date_etc_str()
 
         params['games_date_str'] = game_date_str
+        params['raw_data'] = kwargs.get('raw_data')
         return params
 
 
 class ScoreboardDataMixin(StrategyBaseABC, ABC):
     """Class that implements getting raw data from ScoreboardV2
     nba_api endpoint and common preprocessing.
+
+    Strategies with uses_index answer queries of historical games dates
+    from the local index of games (see backfill) if the date is indexed
     """
+    uses_index = False
+
+    def answers_from_index(self, params: dict) -> bool:
+        """Check that strategy is executed using the local index of games
+        instead of scoreboard: raw data is not given and games date
+        is indexed"""
+        return self.uses_index and params.get('raw_data') is None \
+            and game_index is not None \
+            and game_index.has_games_date(params['games_date_str'])
+
+    def answers_period_from_index(self, games_dates: List[str]) -> bool:
+        """Check that all games dates of the period are indexed"""
+        return self.uses_index and bool(games_dates) \
+            and game_index is not None \
+            and all(game_index.has_games_date(games_date)
+                    for games_date in games_dates)
 
     @staticmethod
-    def get_raw_data(**kwargs) -> ScoreboardV2:
-        """Get data from ScoreboardV2 endpoint"""
+    def get_raw_data(**kwargs) -> 'ScoreboardData':
+        """Get data from ScoreboardV2 endpoint (via scoreboard_provider)
+        If scoreboard was already fetched for the same date (keyword argument
+        raw_data), it is reused instead of making a new request"""
+        raw_data = kwargs.get('raw_data')
+        if raw_data is not None:
+            return raw_data
+
+        from nbadviser.adviser.providers import scoreboard_provider
+
         game_date = kwargs.get('games_date_str')
-        scoreboard = ScoreboardV2(game_date=game_date,
-                                  get_request=True)
+        scoreboard = scoreboard_provider.get(game_date)
         return scoreboard
 
     def preprocess_data(self, game_object: Type[AnyGame],
-                        scoreboard: ScoreboardV2) -> Dict[str, AnyGame]:
-        """Create dict of all games instances for the day and fill with info
+                        scoreboard: 'ScoreboardData') -> Dict[str, AnyGame]:
+        """Create dict of all games instances for the day filled with info
         of team names and scores"""
-
-        all_games = self._collect_games(game_object=game_object,
-                                        scoreboard=scoreboard)
-        self._fill_name_and_score(all_games=all_games, scoreboard=scoreboard)
-
-        return all_games
-
-    @staticmethod
-    def _collect_games(game_object: Type[Game],
-                       scoreboard: ScoreboardV2) -> Dict[str, Game]:
-        """"""
-        all_games = {}
-        _data = scoreboard.game_header.get_dict()
-        headers = _data['headers']
-        for game_data_list in _data['data']:
-            game_data_dict = dict(zip(headers, game_data_list))
-
-            game_id = game_data_dict['GAME_ID']
-            game_status = game_data_dict['GAME_STATUS_TEXT'].strip()
-            game_status_id = game_data_dict['GAME_STATUS_ID']
-
-            home_team = Team(team_id=game_data_dict['HOME_TEAM_ID'])
-            visitor_team = Team(team_id=game_data_dict['VISITOR_TEAM_ID'])
-            playing_teams = Teams(home=home_team, visitor=visitor_team)
-
-            game = game_object(game_id=game_id, game_status=game_status,
-                               game_status_id=game_status_id,
-                               teams=playing_teams)
-            all_games[game.game_id] = game
-
-        return all_games
-
-    @staticmethod
-    def _fill_name_and_score(all_games: Dict[str, Game],
-                             scoreboard: ScoreboardV2) -> None:
-        """Fill game instances with team names and scores"""
-        team_scores = scoreboard.line_score.get_dict()
-        headers = team_scores['headers']
-        for one_team_score in team_scores['data']:
-            score_dict = dict(zip(headers, one_team_score))
-            game_id = score_dict['GAME_ID']
-            team_name = f"{score_dict['TEAM_CITY_NAME']} " \
-                        f"{score_dict['TEAM_NAME']}"
-            team_id = score_dict['TEAM_ID']
-            score = score_dict['PTS']
-
-            game = all_games.get(game_id)
-            team = game.teams.get_by_id(team_id=team_id)
-            team.name = team_name
-            team.score = score
+        table = scoreboard.table
+        return table.make_games(game_object, range(len(table)))
 
 
 @register_strategy
@@ -136,6 +136,7 @@ class CloseGameStrategy(ScoreboardDataMixin):
 
     allowed_gap = 6  # Min value of score gap for game to be recommended
     top_games = 2  # Top 2 closest by score games
+    uses_index = True
 
     def execute(self, **kwargs) -> Recommendation:
         """First, we create dict of games for that day and fill info about game
@@ -149,29 +150,46 @@ class CloseGameStrategy(ScoreboardDataMixin):
         params = self.apply_parameters(**kwargs)
         recommendation = Recommendation(title=self.title)
 
+        if self.answers_from_index(params):
+            recommendation.games = game_index.close_games(
+                params['games_date_str'], allowed_gap=self.allowed_gap,
+                top_games=self.top_games
+            )
+            return recommendation
+
         # Get raw information and prepare raw data
         scoreboard = self.get_raw_data(**params)
-        all_games = self.preprocess_data(Game, scoreboard)
+        table = scoreboard.table
 
-        # collect score gaps from all finished games of the day
-        score_gaps = defaultdict(list)
-        for game in all_games.values():
-            if game.status_id == GameStatus.FINAL.value:  # Only finished games
-                gap = game.score_gap
-                score_gaps[gap].append(game)
+        # score gaps of all finished games of the day
+        finished = table.status_mask(GameStatus.FINAL.value)
+        score_gaps = table.score_gaps()
 
         # choose top games
-        gaps = sorted(score_gaps.keys())[:self.top_games]
-        close_games = []
-        for gap in gaps:
-            if gap > self.allowed_gap:
-                continue
-            close_games.extend(score_gaps[gap])
+        gaps = np.unique(score_gaps[finished])[:self.top_games]
+        close_rows = []
+        for gap in gaps[gaps <= self.allowed_gap]:
+            close_rows.extend(np.flatnonzero(finished & (score_gaps == gap)))
 
-        recommendation.games = close_games
+        recommendation.games = list(table.make_games(Game,
+                                                     close_rows).values())
 
         return recommendation
 
+    def rank_games(self, games: List[DatedGame],
+                   top_games: int) -> List[DatedGame]:
+        """The closest by score games"""
+        return sorted(games, key=lambda item: item[1].score_gap)[:top_games]
+
+    def best_from_index(self, games_dates: List[str],
+                        top_games: int) -> Optional[List[DatedGame]]:
+        if not self.answers_period_from_index(games_dates):
+            return None
+        return game_index.close_games_of_period(
+            games_dates[0], games_dates[-1], allowed_gap=self.allowed_gap,
+            limit=top_games
+        )
+
 
 @register_strategy
 class TopIndividualPerformanceStrategy(ScoreboardDataMixin):
@@ -180,6 +198,7 @@ class TopIndividualPerformanceStrategy(ScoreboardDataMixin):
     title = 'Индивидуальные отжиги ⛹️'
 
     score_required = 37
+    uses_index = True
 
     def execute(self, **kwargs) -> Recommendation:
         """Add info of top performance and then choose
@@ -189,26 +208,50 @@ class TopIndividualPerformanceStrategy(ScoreboardDataMixin):
         recommendation = Recommendation(title=self.title,
                                         games=None)
 
-        games_with_top_performance = set()
+        if self.answers_from_index(params):
+            recommendation.games = game_index.top_performances(
+                params['games_date_str'], score_required=self.score_required
+            )
+            return recommendation
 
         # Get raw information and prepare raw_data
         scoreboard = self.get_raw_data(**params)
-        all_games = self.preprocess_data(GameWithTopPerformanceInfo,
-                                         scoreboard)
+        table = scoreboard.table
 
         # Team leaders
-        team_leaders = scoreboard.team_leaders.get_dict()
-        headers = team_leaders['headers']
-        for top_performer in team_leaders['data']:
-            top_performer_dict = dict(zip(headers, top_performer))
-            if top_performer_dict['PTS'] >= self.score_required:
-                game = all_games.get(top_performer_dict['GAME_ID'])
-                game.fill_player_performance(**top_performer_dict)
+        team_leaders = table.team_leaders
+        top_rows = np.flatnonzero(
+            team_leaders.numeric('PTS') >= self.score_required
+        )
+        game_rows = [table.row_by_game_id[team_leaders.value(row, 'GAME_ID')]
+                     for row in top_rows]
+        games_with_top_performance = table.make_games(
+            GameWithTopPerformanceInfo, game_rows
+        )
+        for row in top_rows:
+            game = games_with_top_performance[team_leaders.value(row,
+                                                                 'GAME_ID')]
+            game.fill_player_performance(
+                PTS_PLAYER_NAME=team_leaders.value(row, 'PTS_PLAYER_NAME'),
+                PTS=team_leaders.value(row, 'PTS')
+            )
+
+        recommendation.games = list(games_with_top_performance.values())
+        return recommendation
 
-                games_with_top_performance.add(game)
+    def rank_games(self, games: List[DatedGame],
+                   top_games: int) -> List[DatedGame]:
+        """Games with the most points scored by a player"""
+        return sorted(games, key=lambda item: -item[1].top_pts)[:top_games]
 
-        recommendation.games = list(games_with_top_performance)
-        return recommendation
+    def best_from_index(self, games_dates: List[str],
+                        top_games: int) -> Optional[List[DatedGame]]:
+        if not self.answers_period_from_index(games_dates):
+            return None
+        return game_index.top_performances_of_period(
+            games_dates[0], games_dates[-1],
+            score_required=self.score_required, limit=top_games
+        )
 
 
 # Strategy that intended to be called directly from Adviser
@@ -218,20 +261,18 @@ class LiveGamesStrategy(ScoreboardDataMixin):
     title = 'В прямом эфире 📺'
 
     def execute(self, **kwargs) -> Recommendation:
-        # Do not feed any params from kwargs initially
-        params = self.apply_parameters()
+        # Do not feed any params from kwargs initially except of
+        # already fetched raw data (has to be data for the current game day)
+        params = self.apply_parameters(raw_data=kwargs.get('raw_data'))
         recommendation = Recommendation(title=self.title)
 
         # Get raw information and prepare raw data
         scoreboard = self.get_raw_data(**params)
-        all_games = self.preprocess_data(GameWithScoreInfo, scoreboard)
-
-        live_games = []
-        for game in all_games.values():
-            if game.status_id == GameStatus.LIVE.value:
-                live_games.append(game)
+        table = scoreboard.table
+        live_rows = np.flatnonzero(table.status_mask(GameStatus.LIVE.value))
+        live_games = table.make_games(GameWithScoreInfo, live_rows)
 
-        recommendation.games = live_games
+        recommendation.games = list(live_games.values())
         return recommendation
 
 
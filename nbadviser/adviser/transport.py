@@ -0,0 +1,171 @@
+"""HTTP transport for requests to NBA stats API
+"""
+import random
+import threading
+import time
+from typing import Dict, Optional, TYPE_CHECKING
+
+import requests
+from nba_api.stats.library.http import NBAStatsResponse, STATS_HEADERS
+from requests.adapters import HTTPAdapter
+
+from nbadviser.config import logger
+from nbadviser.metrics import metrics
+
+if TYPE_CHECKING:
+    from nba_api.stats.endpoints.scoreboardv2 import ScoreboardV2
+
+# Statuses of responses that are worth retrying
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class TransportError(Exception):
+    """Request to stats API failed (after retries)"""
+
+
+class CircuitOpenError(TransportError):
+    """Requests are not made while circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Stops requests to a failing service for a while
+
+    After failure_threshold failures in a row the breaker is open:
+    requests are not allowed during reset_timeout seconds. Then one trial
+    request is allowed (half-open state): success closes the breaker,
+    failure opens it again"""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False  # Trial request of half-open state is made
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at >= self._reset_timeout:
+                return 'half-open'
+            return 'open'
+
+    def allow(self) -> bool:
+        """Check that request can be made now"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self._reset_timeout \
+                    or self._trial:
+                return False
+            self._trial = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self._failure_threshold:
+                if self._opened_at is None:
+                    logger.warning('Запросы к NBA API приостановлены '
+                                   f'на {self._reset_timeout} с')
+                self._opened_at = time.monotonic()
+                self._trial = False
+                metrics.inc('circuit_breaker_opened_total')
+
+
+class StatsTransport:
+    """Requests to stats API over a pool of keep-alive connections
+
+    Every request is limited by connect and read timeouts, failed requests
+    (network errors, timeouts, throttling and server errors) are retried
+    with jittered exponential backoff. Requests that failed after all
+    retries are counted by circuit breaker"""
+
+    def __init__(self, base_url: str, connect_timeout: float,
+                 read_timeout: float, retries: int, backoff_base: float,
+                 backoff_max: float, pool_size: int,
+                 breaker: CircuitBreaker,
+                 headers: Optional[Dict[str, str]] = None):
+        self.base_url = base_url.rstrip('/')
+        self.breaker = breaker
+        self._timeout = (connect_timeout, read_timeout)
+        self._retries = retries
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if headers is None:
+            # Host header is set by requests according to base_url
+            headers = {key: value for key, value in STATS_HEADERS.items()
+                       if key != 'Host'}
+        self.session.headers.update(headers)
+
+    def get_scoreboard(self, games_date_str: str) -> 'ScoreboardV2':
+        """ScoreboardV2 endpoint loaded with response for games date"""
+        # Importing of endpoints (all of them) is deferred until needed
+        from nba_api.stats.endpoints.scoreboardv2 import ScoreboardV2
+
+        endpoint = ScoreboardV2(game_date=games_date_str, get_request=False)
+        endpoint.nba_response = self.request(endpoint.endpoint,
+                                             endpoint.parameters)
+        endpoint.load_response()
+        return endpoint
+
+    def request(self, endpoint: str, parameters: dict) -> NBAStatsResponse:
+        """Request endpoint of stats API
+        :raises CircuitOpenError: if circuit breaker is open
+        :raises TransportError: if request failed after all retries"""
+        if not self.breaker.allow():
+            raise CircuitOpenError(f'{endpoint}: запросы к NBA API '
+                                   f'приостановлены')
+
+        url = f'{self.base_url}/{endpoint}'
+        # Stats API expects parameters in the same order as nba_api sends
+        params = sorted(parameters.items())
+        error = None
+        for attempt in range(self._retries + 1):
+            if attempt:
+                metrics.inc('stats_retries_total', endpoint=endpoint)
+                time.sleep(self._backoff(attempt - 1))
+            try:
+                response = self.session.get(url, params=params,
+                                            timeout=self._timeout)
+            except requests.RequestException as err:
+                error = err
+                continue
+
+            if response.status_code in RETRY_STATUSES:
+                error = TransportError(f'HTTP {response.status_code}')
+                continue
+            data = NBAStatsResponse(response=response.text,
+                                    status_code=response.status_code,
+                                    url=response.url)
+            if response.status_code != 200 or not data.valid_json():
+                # Request is not going to succeed on retry, but the service
+                # is available
+                self.breaker.record_success()
+                raise TransportError(f'{endpoint}: неверный ответ '
+                                     f'(HTTP {response.status_code})')
+            self.breaker.record_success()
+            return data
+
+        self.breaker.record_failure()
+        raise TransportError(f'{endpoint}: запрос не удался после '
+                             f'{self._retries + 1} попыток: {error}') \
+            from error
+
+    def _backoff(self, attempt: int) -> float:
+        """Seconds to wait before retry (full jitter)"""
+        return random.uniform(0, min(self._backoff_max,
+                                     self._backoff_base * 2 ** attempt))
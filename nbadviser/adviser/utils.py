@@ -1,11 +1,17 @@
 """Helping classes and functions for adviser and strategies"""
 import datetime
+import threading
 from abc import ABC, abstractmethod
-from dataclasses import dataclass, fields
+from dataclasses import dataclass
 from enum import Enum
-from typing import List, Optional, Union, TypeVar
+from typing import List, Optional, Union, TypeVar, Iterator, Hashable, \
+    Tuple
 
+from cachetools import LRUCache
+
+from nbadviser import config
 from nbadviser.config import ETC_TIMEZONE
+from nbadviser.metrics import metrics
 
 # Create a generic variable that can be 'Parent', or any subclass.
 AnyGame = TypeVar('AnyGame', bound='Game')
@@ -25,30 +31,85 @@ def get_date_etc_str() -> str:
     return str(est_yesterday.date())
 
 
-@dataclass
+def get_season_range(season: Optional[str] = None) -> \
+        Optional[Tuple[datetime.date, datetime.date]]:
+    """First and last possible dates of NBA season
+    :param season: string in a format YYYY-YY (e.g. 2021-22),
+     current season if not set
+    :returns None if format of season is wrong"""
+    if season is None:
+        current_date = datetime.datetime.strptime(get_date_etc_str(),
+                                                  '%Y-%m-%d').date()
+        start_year = current_date.year if current_date.month >= 10 \
+            else current_date.year - 1
+    else:
+        try:
+            start_year, end_year = (int(year) for year in season.split('-'))
+        except ValueError:
+            return
+        if (start_year + 1) % 100 != end_year:
+            return
+
+    # Season (including playoffs) is played from October to June
+    return datetime.date(start_year, 10, 1), \
+        datetime.date(start_year + 1, 6, 30)
+
+
+def iter_games_dates(first: datetime.date,
+                     last: datetime.date) -> Iterator[str]:
+    """Games dates strings of the period that are not later than
+    the current game day"""
+    current_date = datetime.datetime.strptime(get_date_etc_str(),
+                                              '%Y-%m-%d').date()
+    games_date = first
+    while games_date <= min(last, current_date):
+        yield str(games_date)
+        games_date += datetime.timedelta(days=1)
+
+
 class Team:
     """Class representing one team in a game"""
-    team_id: int
-    name: str = 'Undefined'
-    score: Union[int, float] = float('nan')
+    __slots__ = ('team_id', 'name', 'score')
+
+    def __init__(self, team_id: int, name: str = 'Undefined',
+                 score: Union[int, float] = float('nan')):
+        self.team_id = team_id
+        self.name = name
+        self.score = score
+
+    def __repr__(self):
+        return f'Team(team_id={self.team_id!r}, name={self.name!r}, ' \
+               f'score={self.score!r})'
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return (self.team_id, self.name, self.score) == \
+            (other.team_id, other.name, other.score)
 
 
-@dataclass
 class Teams:
     """Container for Team instances for easy access with dot notation"""
-    home: Team
-    visitor: Team
+    __slots__ = ('home', 'visitor')
+
+    def __init__(self, home: Team, visitor: Team):
+        self.home = home
+        self.visitor = visitor
+
+    def __repr__(self):
+        return f'Teams(home={self.home!r}, visitor={self.visitor!r})'
 
-    def get_by_id(self, team_id: int):
+    def get_by_id(self, team_id: int) -> Optional[Team]:
         """Access team instance by the team_id"""
-        for field in fields(self):
-            team_instance = getattr(self, field.name)
-            if team_instance.team_id == team_id:
-                return team_instance
+        if self.home.team_id == team_id:
+            return self.home
+        if self.visitor.team_id == team_id:
+            return self.visitor
 
 
 class GameABC(ABC):
     """Represents one game"""
+    __slots__ = ()
 
     @property
     @abstractmethod
@@ -59,15 +120,21 @@ class GameABC(ABC):
 
 class Game(GameABC):
     """Game object to use with data from ScoreboardV2 API endpoint
-    but also possible to use with other"""
+    but also possible to use with other
+
+    shareable - instances are not changed after creation, so the same
+    instance can be used by all strategies and requests"""
+    __slots__ = ('game_id', 'status', 'status_id', 'teams', 'period')
+    shareable = True
 
     def __init__(self, game_id: str, game_status: str,
                  game_status_id: int, teams: Teams = None,
-                 **kwargs):
+                 period: int = 0, **kwargs):
         self.game_id = game_id
         self.status = game_status
         self.status_id = game_status_id
         self.teams = teams
+        self.period = period  # Current (or last) period of a game
 
     def __repr__(self):
         return f'<Game>id={self.game_id}, game_status={self.status},' \
@@ -90,15 +157,19 @@ class GameStatus(Enum):
 
 class GameWithTopPerformanceInfo(Game):
     """Game object with additional info about top performance of players"""
+    __slots__ = ('top_performers', 'top_pts')
+    shareable = False  # Filled with top performers after creation
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.top_performers = []
+        self.top_pts = 0  # The most points of a top performer
 
     def fill_player_performance(self, **kwargs):
         player_name = kwargs.get('PTS_PLAYER_NAME')
         pts = kwargs.get('PTS')
         self.top_performers.append(f'{player_name} <b>{pts}</b> очк.')
+        self.top_pts = max(self.top_pts, pts)
 
     @property
     def description(self):
@@ -108,6 +179,7 @@ class GameWithTopPerformanceInfo(Game):
 
 class GameWithScoreInfo(Game):
     """Game object with info of score in description"""
+    __slots__ = ()
 
     @property
     def description(self):
@@ -124,16 +196,19 @@ class Recommendation:
 
     def to_html(self):
         """Format output as HTML"""
-        template = f'\n<b><u>{self.title}</u></b>\n'
+        return ''.join(self.iter_html())
+
+    def iter_html(self) -> Iterator[str]:
+        """Parts of HTML output"""
+        yield f'\n<b><u>{self.title}</u></b>\n'
 
         if not self.games:
-            template += 'В данной категории не нашлось игр\n'
-            return template
+            yield 'В данной категории не нашлось игр\n'
+            return
 
         for game in self.games:
-            template += f'{game.description}\n'
-
-        return template
+            yield game.description
+            yield '\n'
 
     def to_dict(self):
         pass
@@ -142,17 +217,53 @@ class Recommendation:
         pass
 
 
+@dataclass
+class PeriodRecommendation(Recommendation):
+    """Recommendation of games of many games dates, every game is shown
+    with its games date"""
+    games_dates: Optional[List[str]] = None  # Games date of every game
+
+    def iter_html(self) -> Iterator[str]:
+        yield f'\n<b><u>{self.title}</u></b>\n'
+
+        if not self.games:
+            yield 'В данной категории не нашлось игр\n'
+            return
+
+        for games_date, game in zip(self.games_dates, self.games):
+            yield f'{games_date}: {game.description}\n'
+
+
 class Recommendations:
-    """Class holding all recommendations"""
+    """Class holding all recommendations
+
+    raw_data - data fetched from providers while making recommendations
+    (by games date), can be reused to avoid repeated requests.
+
+    Rendered HTML is memoized by games date, titles of recommendations and
+    fingerprints of raw data, so it is rendered again only if underlying
+    data changes"""
+
+    _rendered = LRUCache(maxsize=config.RENDERED_HTML_CACHE_MAXSIZE)
+    _rendered_lock = threading.Lock()
 
     def __init__(self, recommendations: Optional[List[Recommendation]] = None,
-                 parameters: Optional[dict] = None):
+                 parameters: Optional[dict] = None,
+                 raw_data: Optional[dict] = None):
         self._contents = recommendations or list()
-        self._parameters = parameters or dict()
+        self._parameters = dict(parameters or {})
+        self.raw_data = raw_data if raw_data is not None else dict()
 
     def append(self, item: Recommendation):
         self._contents.append(item)
 
+    def __iter__(self) -> Iterator[Recommendation]:
+        return iter(self._contents)
+
+    def has_games(self) -> bool:
+        """Check that any recommendation has games"""
+        return any(recommendation.games for recommendation in self._contents)
+
     def to_html(self):
         specific_game_date = self._parameters.get('games_date')
         if specific_game_date:
@@ -160,15 +271,48 @@ class Recommendations:
         else:
             games_date = get_date_etc_str()
 
-        template = f'<i>Игровой день: {games_date}</i>\n'
+        with metrics.span('stage_seconds', stage='render'):
+            key = self._get_render_key(games_date)
+            if key is not None:
+                with self._rendered_lock:
+                    html = self._rendered.get(key)
+                if html is not None:
+                    return html
+
+            html = ''.join(self._iter_html(games_date))
+            if key is not None:
+                with self._rendered_lock:
+                    self._rendered[key] = html
+            return html
+
+    def _iter_html(self, games_date: str) -> Iterator[str]:
+        """Parts of HTML output"""
+        period = self._parameters.get('period')
+        if period is not None:
+            yield f'<i>Период: {period[0]} - {period[1]}</i>\n'
+        else:
+            yield f'<i>Игровой день: {games_date}</i>\n'
         if not self._contents:
-            template += 'Не удалось найти интересные игры'
-            return template
+            yield 'Не удалось найти интересные игры'
+            return
 
         for recommendation in self._contents:
-            template += recommendation.to_html()
-
-        return template
+            yield from recommendation.iter_html()
+
+    def _get_render_key(self, games_date: str) -> Optional[Hashable]:
+        """Key of memoized HTML or None if output can not be memoized
+        (raw data is unknown or does not have fingerprints)"""
+        if not self.raw_data:
+            return
+        fingerprints = []
+        for data_date, data in sorted(self.raw_data.items()):
+            fingerprint = getattr(data, 'fingerprint', None)
+            if fingerprint is None:
+                return
+            fingerprints.append((data_date, fingerprint))
+        titles = tuple(recommendation.title
+                       for recommendation in self._contents)
+        return games_date, titles, tuple(fingerprints)
 
 
 @dataclass
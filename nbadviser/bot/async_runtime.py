@@ -0,0 +1,74 @@
+"""Asyncio runtime for bot handlers
+
+python-telegram-bot dispatcher calls handlers synchronously in its threads.
+AsyncRuntime runs an event loop in a separate thread: wrapped coroutine
+handlers are scheduled on that loop and dispatcher thread is released
+immediately, so waiting for NBA API does not hold any thread.
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Coroutine
+
+from telegram import Update
+from telegram.ext import CallbackContext
+
+AsyncHandler = Callable[[Update, CallbackContext], Coroutine[Any, Any, None]]
+
+
+class AsyncRuntime:
+    """Event loop in a background thread with executor for blocking calls
+    (e.g. requests to Telegram Bot API)"""
+
+    def __init__(self, max_workers: int):
+        self.loop = asyncio.new_event_loop()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='async-io')
+        self.loop.set_default_executor(self._executor)
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name='async-runtime')
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+        self._executor.shutdown(wait=False)
+
+    def wrap(self, handler: AsyncHandler) -> Callable:
+        """Make a synchronous dispatcher callback from a coroutine handler.
+        Exceptions of the handler are forwarded to dispatcher error
+        handlers"""
+
+        @functools.wraps(handler)
+        def callback(update: Update, context: CallbackContext) -> None:
+            future = asyncio.run_coroutine_threadsafe(
+                handler(update, context), self.loop
+            )
+            future.add_done_callback(
+                functools.partial(self._on_done, update, context)
+            )
+
+        return callback
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    @staticmethod
+    def _on_done(update: Update, context: CallbackContext, future) -> None:
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            context.dispatcher.dispatch_error(update, error)
+
+
+async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """Run blocking function in default executor of the running loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None,
+                                      functools.partial(func, *args, **kwargs))
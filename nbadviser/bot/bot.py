@@ -1,24 +1,71 @@
 """Telegram bot entry point"""
 
+from typing import Callable, Optional
+
+from telegram import Bot
 from telegram.ext import Updater, CommandHandler, MessageHandler, Filters
 
+from nbadviser import config
 from nbadviser.bot import bot_handlers
+from nbadviser.bot.async_runtime import AsyncRuntime
 from nbadviser.bot.bot_handlers import error_handler
+from nbadviser.bot.outbox import outbox, error_digest
+from nbadviser.bot.request import InstrumentedRequest
+from nbadviser.bot.subscriptions import live_games_notifier
+from nbadviser.metrics import metrics
+
 
+def run(token: str, runtime: str = config.BOT_RUNTIME,
+        mode: str = config.BOT_MODE,
+        on_ready: Optional[Callable[[], None]] = None,
+        worker_index: Optional[int] = None):
+    """Initializing of tg bot
 
-def run(token: str):
-    """Initializing of tg bot"""
+    :param runtime: 'threads' - recommendations are handled by dispatcher
+     worker threads, 'asyncio' - by coroutines on a separate event loop
+    :param mode: 'polling' - updates are requested by long polling,
+     'webhook' - updates are received by local HTTP server and handled by
+     its pool of workers
+    :param on_ready: called when bot is ready to handle updates
+    :param worker_index: index of worker process started by supervisor:
+     updates are received by webhook on the port shared by all workers,
+     background jobs (live games polling) run only in the first worker
+    """
+    primary = not worker_index
+    if worker_index is not None:
+        mode = 'webhook'
 
-    updater = Updater(token=token)
+    # Pool of connections is as big as Updater would create itself
+    # (for the biggest pool of workers handling updates)
+    workers = config.WEBHOOK_WORKERS if mode == 'webhook' \
+        else config.BOT_WORKERS
+    request = InstrumentedRequest(con_pool_size=workers + 4)
+    updater = Updater(bot=Bot(token=token, request=request,
+                              base_url=config.BOT_API_BASE_URL),
+                      workers=config.BOT_WORKERS)
     dispatcher = updater.dispatcher
 
+    async_runtime = None
+    if runtime == 'asyncio':
+        async_runtime = AsyncRuntime(max_workers=config.BOT_WORKERS)
+        async_runtime.start()
+        recommendations_callback = async_runtime.wrap(
+            bot_handlers.get_recommendations_async
+        )
+        run_async = False  # Callback returns immediately
+    else:
+        # Recommendations are handled concurrently by dispatcher workers
+        # (or workers of webhook server)
+        recommendations_callback = bot_handlers.get_recommendations
+        run_async = mode != 'webhook'
+
     dispatcher.add_handler(CommandHandler('start', bot_handlers.start))
     dispatcher.add_handler(
         MessageHandler(Filters.regex(f'^{bot_handlers.TOP_GAMES_BUTTON}$'),
-                       bot_handlers.get_recommendations)
+                       recommendations_callback, run_async=run_async)
     )
     dispatcher.add_handler(
-        CommandHandler('top', bot_handlers.get_recommendations)
+        CommandHandler('top', recommendations_callback, run_async=run_async)
     )
     dispatcher.add_handler(
         MessageHandler(Filters.regex(f'^{bot_handlers.HELP_BUTTON}'),
@@ -27,7 +74,65 @@ def run(token: str):
     dispatcher.add_handler(
         CommandHandler('help', bot_handlers.help_handler)
     )
+    dispatcher.add_handler(
+        CommandHandler('subscribe', bot_handlers.subscribe)
+    )
+    dispatcher.add_handler(
+        CommandHandler('unsubscribe', bot_handlers.unsubscribe)
+    )
     dispatcher.add_error_handler(error_handler)
 
-    updater.start_polling()
-    updater.idle()
+    # One shared poller of live games for all subscribers
+    if primary:
+        updater.job_queue.run_repeating(
+            live_games_notifier.poll,
+            interval=config.SUBSCRIPTIONS_POLL_INTERVAL,
+            first=config.SUBSCRIPTIONS_POLL_INTERVAL
+        )
+    updater.job_queue.run_repeating(
+        metrics.log_summary, interval=config.METRICS_LOG_INTERVAL,
+        first=config.METRICS_LOG_INTERVAL
+    )
+
+    if mode == 'webhook':
+        run_webhook(updater, on_ready, reuse_port=worker_index is not None,
+                    set_webhook=primary)
+    else:
+        updater.start_polling()
+        if on_ready is not None:
+            on_ready()
+        updater.idle()
+
+    # Errors collected so far are sent before outbox is stopped
+    error_digest.flush()
+    outbox.stop()
+
+    if async_runtime is not None:
+        async_runtime.stop()
+
+
+def run_webhook(updater: Updater,
+                on_ready: Optional[Callable[[], None]] = None,
+                reuse_port: bool = False, set_webhook: bool = True) -> None:
+    """Receive updates by webhook until stop signal
+    :param set_webhook: register WEBHOOK_URL (if set) in Telegram"""
+    from nbadviser.bot.webhook import WebhookServer, wait_for_stop_signal
+
+    server = WebhookServer(dispatcher=updater.dispatcher,
+                           listen=config.WEBHOOK_LISTEN,
+                           port=config.WEBHOOK_PORT,
+                           url_path=config.WEBHOOK_PATH,
+                           workers=config.WEBHOOK_WORKERS,
+                           max_pending=config.WEBHOOK_MAX_PENDING,
+                           reuse_port=reuse_port)
+    server.start()
+    if set_webhook and config.WEBHOOK_URL:
+        updater.bot.set_webhook(url=config.WEBHOOK_URL)
+    updater.job_queue.start()
+    if on_ready is not None:
+        on_ready()
+
+    wait_for_stop_signal()
+
+    server.stop()
+    updater.job_queue.stop()
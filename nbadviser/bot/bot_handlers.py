@@ -1,14 +1,26 @@
 """Callback function for bot handlers"""
 
+import asyncio
+import functools
 import traceback
+from datetime import date
+from typing import Optional, Tuple
 
 from telegram import Update, ParseMode, ReplyKeyboardMarkup
 from telegram.ext import CallbackContext
 
-from nbadviser import adviser, config
-from nbadviser.adviser.adviser import Errors
-from nbadviser.bot.utils import check_date_format, log_access
+from nbadviser import config
+from nbadviser.adviser.adviser import Errors, Advise, adviser
+from nbadviser.adviser.utils import Recommendations, Recommendation, \
+    get_date_etc_str, get_season_range, iter_games_dates
+from nbadviser.bot.async_runtime import run_blocking
+from nbadviser.bot.outbox import outbox, error_digest
+from nbadviser.bot.streaming import MessageStream
+from nbadviser.bot.subscriptions import live_games_notifier
+from nbadviser.bot.utils import check_date_format, log_access, \
+    parse_date_range
 from nbadviser.config import logger, LINK_FULL_GAMES, LINK_STREAMS
+from nbadviser.metrics import metrics
 
 TOP_GAMES_BUTTON = "Топовые матчи игрового дня 🏀"
 HELP_BUTTON = "Помощь"
@@ -24,8 +36,8 @@ def start(update: Update, context: CallbackContext):
     message = 'Подберу интересные матчи прошедшего игрового дня, ' \
               'не раскрывая счета!\n' \
               'Нажми на кнопку ниже или введи команду /top'
-    update.message.reply_text(
-        message,
+    outbox.send(
+        update.effective_chat.id, update.message.reply_text, message,
         reply_markup=ReplyKeyboardMarkup(keyboard, one_time_keyboard=True,
                                          resize_keyboard=True)
     )
@@ -38,58 +50,332 @@ def help_handler(update: Update, context: CallbackContext):
     msg = '<b>NBAdviser</b> - бот, который поможет ' \
           'тебе выбрать интересную игру\n\n' \
           '<b>/top</b> - рекомендации за последний игровой день\n' \
-          '<b>/top 2022-01-12</b>  - за конкретный день\n\n' \
+          '<b>/top 2022-01-12</b>  - за конкретный день\n' \
+          f'<b>/top 2022-01-10..2022-01-16</b>  - за период ' \
+          f'(до {config.RANGE_MAX_DAYS} дней)\n' \
+          '<b>/top season</b>  - лучшие игры текущего сезона, ' \
+          '<b>/top season 2021-22</b> - конкретного сезона\n' \
+          '<b>/subscribe</b> - уведомления о напряженных концовках ' \
+          'в прямом эфире\n' \
+          '<b>/unsubscribe</b> - отписаться от уведомлений\n\n' \
           'Обратная связь: https://t.me/NickFerd'
 
-    update.message.reply_text(msg, parse_mode=ParseMode.HTML,
-                              disable_web_page_preview=True)
+    outbox.send(update.effective_chat.id, update.message.reply_text, msg,
+                parse_mode=ParseMode.HTML, disable_web_page_preview=True)
 
 
 @log_access
 def get_recommendations(update: Update, context: CallbackContext) -> None:
     """Handler for making recommendations"""
 
-    msg = update.message.reply_text(
-        f'Идет отбор игр...'
-    )
+    try:
+        season, period = parse_season(context), parse_period(context)
+    except ValueError as err:
+        outbox.send(update.effective_chat.id, update.message.reply_text,
+                    str(err))
+        return
+    if season is not None:
+        reply_best_of_period(update, context, *season)
+        return
+    if period is not None:
+        stream_period_recommendations(update, context, *period)
+        return
 
-    games_date = None
-    if context.args:
-        games_date_unchecked = context.args[0]  # Always look at first argument
-        if check_date_format(games_date_unchecked):
-            games_date = games_date_unchecked
+    games_date = parse_games_date(context)
+    if reply_with_last_recommendations(update, games_date):
+        return
 
-    # Set additional parameters
-    adviser.set_parameters(games_date=games_date)
+    chat_id = update.effective_chat.id
+    msg = outbox.send(chat_id, update.message.reply_text,
+                      f'Идет отбор игр...').result()
 
-    recommendations, errors = adviser.get_recommendations()
+    recommendations, errors = adviser.get_recommendations(
+        games_date=games_date
+    )
     handle_strategies_errors(context, errors)
 
-    additional_text = f'\n<i>Ссылка для просмотра полных матчей</i>:' \
-                      f'\n{LINK_FULL_GAMES}'
-    msg.edit_text(recommendations.to_html() + additional_text,
-                  parse_mode=ParseMode.HTML,
-                  disable_web_page_preview=True)
+    # Results are sent by outbox, worker thread is not waiting for them
+    outbox.send(chat_id, msg.edit_text,
+                format_recommendations(recommendations),
+                parse_mode=ParseMode.HTML, disable_web_page_preview=True)
 
     # Additionally check for live games if user required last game day
     # and send results (if any) in separate message
     if not games_date:
-        live_games_recommendation = adviser.get_live_games_or_none()
+        live_games_recommendation = adviser.get_live_games_or_none(
+            raw_data=recommendations.raw_data
+        )
+        if live_games_recommendation:
+            outbox.send(chat_id, update.message.reply_text,
+                        format_live_games(live_games_recommendation),
+                        parse_mode=ParseMode.HTML,
+                        disable_web_page_preview=True)
+
+
+@log_access
+async def get_recommendations_async(update: Update,
+                                    context: CallbackContext) -> None:
+    """Handler for making recommendations (asyncio runtime)
+    Strategies are awaited, requests to Bot API are sent by outbox"""
+
+    try:
+        season, period = parse_season(context), parse_period(context)
+    except ValueError as err:
+        outbox.send(update.effective_chat.id, update.message.reply_text,
+                    str(err))
+        return
+    if season is not None:
+        await run_blocking(reply_best_of_period, update, context, *season)
+        return
+    if period is not None:
+        await run_blocking(stream_period_recommendations, update, context,
+                           *period)
+        return
+
+    games_date = parse_games_date(context)
+    if await run_blocking(reply_with_last_recommendations, update,
+                          games_date):
+        return
+
+    chat_id = update.effective_chat.id
+    msg = await asyncio.wrap_future(
+        outbox.send(chat_id, update.message.reply_text, 'Идет отбор игр...')
+    )
+
+    recommendations, errors = await adviser.get_recommendations_async(
+        games_date=games_date
+    )
+    handle_strategies_errors(context, errors)
+
+    outbox.send(chat_id, msg.edit_text,
+                format_recommendations(recommendations),
+                parse_mode=ParseMode.HTML, disable_web_page_preview=True)
+
+    if not games_date:
+        live_games_recommendation = await adviser.get_live_games_or_none_async(
+            raw_data=recommendations.raw_data
+        )
+        if live_games_recommendation:
+            outbox.send(chat_id, update.message.reply_text,
+                        format_live_games(live_games_recommendation),
+                        parse_mode=ParseMode.HTML,
+                        disable_web_page_preview=True)
+
+
+def reply_with_last_recommendations(update: Update,
+                                    games_date: Optional[str]) -> bool:
+    """Reply right away with the last recommendations for games date
+    (if there are any), marked with their age if they are stale. Stale
+    recommendations are computed again in background and the reply for
+    the current game day is edited if they change. Live games of the
+    current game day are sent only from fresh data (after refresh if
+    recommendations are stale)
+    :returns False if there are no last recommendations"""
+    last = adviser.get_last_recommendations(games_date=games_date)
+    if last is None:
+        return False
+    (recommendations, _), age = last
+
+    chat_id = update.effective_chat.id
+    text = format_recommendations(recommendations)
+    stale = age >= config.RECOMMENDATIONS_STALE_AFTER
+    sent = outbox.send(chat_id, update.message.reply_text,
+                       format_recommendations(recommendations,
+                                              age if stale else None),
+                       parse_mode=ParseMode.HTML,
+                       disable_web_page_preview=True)
+
+    def send_live_games(raw_data: dict) -> None:
+        if games_date:
+            return
+        live_games_recommendation = adviser.get_live_games_or_none(
+            raw_data=raw_data
+        )
         if live_games_recommendation:
-            header = '<i>Может быть интересно:</i>\n'
-            footer = f'\n<i>Ссылка со стримами в хорошем качестве</i>:' \
-                     f'\n{LINK_STREAMS}'
-            message = header + live_games_recommendation.to_html() + footer
-            update.message.reply_text(message,
-                                      parse_mode=ParseMode.HTML,
-                                      disable_web_page_preview=True)
+            outbox.send(chat_id, update.message.reply_text,
+                        format_live_games(live_games_recommendation),
+                        parse_mode=ParseMode.HTML,
+                        disable_web_page_preview=True)
+
+    def edit_if_changed(advise: Advise) -> None:
+        new_text = format_recommendations(advise[0])
+        if new_text != text:
+            outbox.send(chat_id, sent.result().edit_text, new_text,
+                        parse_mode=ParseMode.HTML,
+                        disable_web_page_preview=True)
+        send_live_games(advise[0].raw_data)
+
+    if stale:
+        current_day = not games_date or games_date == get_date_etc_str()
+        adviser.revalidate(on_refresh=edit_if_changed if current_day
+                           else None, games_date=games_date)
+    else:
+        send_live_games(recommendations.raw_data)
+    return True
+
+
+@log_access
+def subscribe(update: Update, context: CallbackContext) -> None:
+    """Subscribe chat to alerts about close live games"""
+    if live_games_notifier.subscribe(update.effective_chat.id):
+        msg = 'Буду присылать уведомления о напряженных концовках ' \
+              'в прямом эфире. Отписаться: /unsubscribe'
+    else:
+        msg = 'Уведомления уже включены. Отписаться: /unsubscribe'
+    outbox.send(update.effective_chat.id, update.message.reply_text, msg)
+
+
+@log_access
+def unsubscribe(update: Update, context: CallbackContext) -> None:
+    """Unsubscribe chat from alerts about close live games"""
+    if live_games_notifier.unsubscribe(update.effective_chat.id):
+        msg = 'Уведомления отключены'
+    else:
+        msg = 'Уведомления не были включены. Подписаться: /subscribe'
+    outbox.send(update.effective_chat.id, update.message.reply_text, msg)
+
+
+def stream_period_recommendations(update: Update, context: CallbackContext,
+                                  first_date: date, last_date: date) -> None:
+    """Make recommendations for every games date of the period and stream
+    days with found games into progressively edited messages"""
+    games_dates = list(iter_games_dates(first_date, last_date))
+    send = functools.partial(outbox.send, update.effective_chat.id)
+    msg = send(
+        update.message.reply_text,
+        f'Идет отбор игр за период {first_date} - {last_date}...'
+    ).result()
+    # Stream is the biggest burst of messages to one chat
+    stream = MessageStream(msg, reply=update.message.reply_text,
+                           edit_interval=config.STREAM_EDIT_INTERVAL,
+                           send=send)
+
+    found = False
+    results = adviser.iter_recommendations(
+        games_dates, max_concurrency=config.RANGE_MAX_CONCURRENCY
+    )
+    for number, (games_date, (recommendations, errors)) in \
+            enumerate(results, start=1):
+        handle_strategies_errors(context, errors)
+        if recommendations.has_games():
+            found = True
+            stream.append(recommendations.to_html() + '\n')
+        stream.set_status(f'<i>Обработано дней: {number} '
+                          f'из {len(games_dates)}</i>')
+
+    if not found:
+        stream.append('Не удалось найти интересные игры\n')
+    stream.finish(f'\n<i>Ссылка для просмотра полных матчей</i>:'
+                  f'\n{LINK_FULL_GAMES}')
+
+
+def reply_best_of_period(update: Update, context: CallbackContext,
+                         first_date: date, last_date: date) -> None:
+    """Choose the best games of the period (e.g. season) by every
+    strategy, showing progress of processed games dates"""
+    send = functools.partial(outbox.send, update.effective_chat.id)
+    msg = send(
+        update.message.reply_text,
+        f'Идет отбор лучших игр за период {first_date} - {last_date}...'
+    ).result()
+    stream = MessageStream(msg, reply=update.message.reply_text,
+                           edit_interval=config.STREAM_EDIT_INTERVAL,
+                           send=send)
+
+    def show_progress(number: int, total: int) -> None:
+        stream.set_status(f'<i>Обработано дней: {number} из {total}</i>')
+
+    recommendations, errors = adviser.get_best_of_period(
+        first_date, last_date, top_games=config.SEASON_TOP_GAMES,
+        max_concurrency=config.RANGE_MAX_CONCURRENCY,
+        on_progress=show_progress
+    )
+    handle_strategies_errors(context, errors)
+    stream.append(recommendations.to_html() + '\n')
+    stream.finish(f'\n<i>Ссылка для просмотра полных матчей</i>:'
+                  f'\n{LINK_FULL_GAMES}')
+
+
+def parse_season(context: CallbackContext) -> Optional[Tuple[date, date]]:
+    """Get season from command arguments: season [YYYY-YY]
+    :returns first and last dates of season
+    :raises ValueError: with message to user if season is wrong"""
+    if not context.args or context.args[0] != 'season':
+        return
+
+    season = context.args[1] if len(context.args) > 1 else None
+    season_range = get_season_range(season)
+    if season_range is None:
+        raise ValueError(f'Неверный сезон {season}, '
+                         f'пример: /top season 2021-22')
+    return season_range
+
+
+def parse_period(context: CallbackContext) -> Optional[Tuple[date, date]]:
+    """Get period from command arguments: YYYY-MM-DD..YYYY-MM-DD
+    (not longer than RANGE_MAX_DAYS)
+    :returns first and last dates of period
+    :raises ValueError: with message to user if period is wrong"""
+    if not context.args or '..' not in context.args[0]:
+        return
+
+    date_range = parse_date_range(context.args[0])
+    if date_range is None:
+        raise ValueError('Неверный период, '
+                         'пример: /top 2022-01-10..2022-01-16')
+    first_date, last_date = date_range
+    if last_date < first_date:
+        raise ValueError('Начало периода позже его конца')
+    if (last_date - first_date).days >= config.RANGE_MAX_DAYS:
+        raise ValueError(f'Период должен быть не длиннее '
+                         f'{config.RANGE_MAX_DAYS} дней')
+    return date_range
+
+
+def parse_games_date(context: CallbackContext) -> Optional[str]:
+    """Get games date from command arguments if given in a proper format"""
+    if context.args:
+        games_date_unchecked = context.args[0]  # Always look at first argument
+        if check_date_format(games_date_unchecked):
+            return games_date_unchecked
+
+
+def format_recommendations(recommendations: Recommendations,
+                           age: Optional[float] = None) -> str:
+    """Message text with recommendations
+    :param age: seconds since data was fetched, shown if given"""
+    additional_text = f'\n<i>Ссылка для просмотра полных матчей</i>:' \
+                      f'\n{LINK_FULL_GAMES}'
+    if age is not None:
+        additional_text = f'<i>Данные получены {format_age(age)} назад, ' \
+                          f'обновляются</i>\n' + additional_text
+    return recommendations.to_html() + additional_text
+
+
+def format_age(age: float) -> str:
+    """Age in seconds, minutes or hours"""
+    if age < 60:
+        return f'{age:.0f} с'
+    if age < 3600:
+        return f'{age // 60:.0f} мин'
+    return f'{age // 3600:.0f} ч'
+
+
+def format_live_games(live_games_recommendation: Recommendation) -> str:
+    """Message text with live games"""
+    header = '<i>Может быть интересно:</i>\n'
+    footer = f'\n<i>Ссылка со стримами в хорошем качестве</i>:' \
+             f'\n{LINK_STREAMS}'
+    return header + live_games_recommendation.to_html() + footer
 
 
 def error_handler(update: Update, context: CallbackContext) -> None:
     """Handle errors, that happen outside of executing strategies"""
+    metrics.inc('errors_total', label='bot')
 
     # Message to client
-    update.message.reply_text("К сожалению, произошла ошибка.")
+    outbox.send(update.effective_chat.id, update.message.reply_text,
+                "К сожалению, произошла ошибка.")
 
     # Logging and alerting control chat
     tb = traceback.format_tb(context.error.__traceback__)
@@ -98,10 +384,9 @@ def error_handler(update: Update, context: CallbackContext) -> None:
     msg = f'<u>BOT ERROR</u>:\n' \
           f'Error: {context.error}\n'
 
-    # Send notification to control chat
+    # Notification to control chat is sent in the next digest
     if config.SEND_ON_ERROR:
-        context.bot.send_message(chat_id=config.CONTROL_CHAT_ID, text=msg,
-                                 parse_mode=ParseMode.HTML)
+        error_digest.add(context.bot, config.CONTROL_CHAT_ID, msg)
 
     # Add traceback and log
     msg += f"Traceback (most recent call last):\n" \
@@ -117,10 +402,9 @@ def handle_strategies_errors(context: CallbackContext,
         msg += f"Strategy: {error.label}\n" \
                f"Exception: {error.exception}\n"
 
-        # Send notification to control chat
+        # Notification to control chat is sent in the next digest
         if config.SEND_ON_ERROR:
-            context.bot.send_message(chat_id=config.CONTROL_CHAT_ID, text=msg,
-                                     parse_mode=ParseMode.HTML)
+            error_digest.add(context.bot, config.CONTROL_CHAT_ID, msg)
 
         # Add traceback and log
         msg += f"{error.traceback}"
@@ -0,0 +1,266 @@
+"""Outbound queue of requests to Telegram Bot API
+
+Telegram limits how often a bot can send messages: about one message per
+second to the same chat and about 30 messages per second overall. Outbox
+sends requests (messages, edits) in order of their arrival, respecting
+both limits, so a burst of messages does not end with RetryAfter errors.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from telegram import Bot, ParseMode
+from telegram.constants import MAX_MESSAGE_LENGTH
+from telegram.error import RetryAfter
+
+from nbadviser import config
+from nbadviser.config import logger
+from nbadviser.metrics import metrics
+
+
+class _TokenBucket:
+    """Not thread-safe token bucket (used under lock of Outbox)"""
+
+    def __init__(self, rate: float, burst: int):
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available"""
+        self._refill(now)
+        return max(0.0, (1 - self._tokens) / self._rate)
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self._tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self._tokens >= self._burst
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self._burst, self._tokens
+                           + (now - self._updated_at) * self._rate)
+        self._updated_at = now
+
+
+# (order, enqueue time, future, function, args, kwargs)
+_Request = Tuple[int, float, Future, Callable, tuple, dict]
+
+
+class _Chat:
+    """Requests waiting to be sent to one chat"""
+
+    def __init__(self, rate: float, burst: int):
+        self.requests: Deque[_Request] = deque()
+        self.bucket = _TokenBucket(rate, burst)
+        self.busy = False  # Request of the chat is being sent
+        self.paused_until = 0.0  # After RetryAfter error
+
+    def wait_time(self, now: float) -> float:
+        return max(self.paused_until - now, self.bucket.wait_time(now))
+
+
+class Outbox:
+    """Queue of requests to Bot API sent by a pool of workers
+
+    Requests of the same chat are sent one by one in order of arrival,
+    not more often than chat_rate per second (with bursts of chat_burst).
+    All requests are sent not more often than global_rate per second.
+    Requests failed with RetryAfter are sent again after pause
+    """
+
+    def __init__(self, global_rate: float, chat_rate: float,
+                 chat_burst: int, workers: int):
+        self._global_bucket = _TokenBucket(global_rate,
+                                           max(1, int(global_rate)))
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._workers = workers
+
+        self._chats: Dict[int, _Chat] = dict()
+        self._order = 0
+        self._condition = threading.Condition()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    def send(self, chat_id: int, func: Callable, /, *args,
+             **kwargs) -> Future:
+        """Add request to chat (e.g. update.message.reply_text) to queue
+        :returns future with result of the request"""
+        future = Future()
+        with self._condition:
+            self._start()
+            chat = self._chats.get(chat_id)
+            if chat is None:
+                chat = self._chats[chat_id] = _Chat(self._chat_rate,
+                                                    self._chat_burst)
+            self._order += 1
+            chat.requests.append((self._order, time.monotonic(), future,
+                                  func, args, kwargs))
+            self._update_queue_depth()
+            self._condition.notify_all()
+        return future
+
+    def stop(self) -> None:
+        """Send requests left in queue and stop"""
+        with self._condition:
+            if not self._running:
+                return
+            self._running = False
+            self._condition.notify_all()
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+
+    def _start(self) -> None:
+        """Start scheduling thread (under lock)"""
+        if self._running:
+            return
+        self._running = True
+        self._executor = ThreadPoolExecutor(max_workers=self._workers,
+                                            thread_name_prefix='outbox')
+        self._thread = threading.Thread(target=self._schedule, daemon=True,
+                                        name='outbox')
+        self._thread.start()
+
+    def _schedule(self) -> None:
+        """Pass requests to workers as soon as limits allow"""
+        with self._condition:
+            while self._running or any(chat.requests or chat.busy
+                                       for chat in self._chats.values()):
+                chat_id, timeout = self._next_chat()
+                if chat_id is None:
+                    self._condition.wait(timeout)
+                    continue
+
+                now = time.monotonic()
+                chat = self._chats[chat_id]
+                request = chat.requests.popleft()
+                chat.busy = True
+                chat.bucket.take(now)
+                self._global_bucket.take(now)
+                self._update_queue_depth()
+                metrics.observe('outbox_wait_seconds', now - request[1])
+                self._executor.submit(self._send, chat_id, request)
+
+    def _next_chat(self) -> Tuple[Optional[int], Optional[float]]:
+        """Chat with the oldest request that can be sent now (under lock)
+        :returns chat id or None and time to wait for the next request"""
+        now = time.monotonic()
+        global_wait = self._global_bucket.wait_time(now)
+        timeout = None
+        chosen_id, chosen_order = None, None
+        for chat_id, chat in list(self._chats.items()):
+            if chat.busy:
+                continue
+            if not chat.requests:
+                if chat.bucket.is_full(now) and chat.paused_until <= now:
+                    del self._chats[chat_id]  # Nothing to remember
+                continue
+            wait = max(global_wait, chat.wait_time(now))
+            if wait > 0:
+                timeout = wait if timeout is None else min(timeout, wait)
+                continue
+            order = chat.requests[0][0]
+            if chosen_order is None or order < chosen_order:
+                chosen_id, chosen_order = chat_id, order
+        return chosen_id, timeout
+
+    def _send(self, chat_id: int, request: _Request) -> None:
+        """Make request in worker thread"""
+        _, _, future, func, args, kwargs = request
+        retry_after = None
+        # Future of a request sent again after RetryAfter is running already
+        if future.running() or future.set_running_or_notify_cancel():
+            try:
+                future.set_result(func(*args, **kwargs))
+            except RetryAfter as err:
+                retry_after = err.retry_after
+            except Exception as err:
+                logger.warning(f'Не удалось отправить запрос в чат '
+                               f'{chat_id}: {err}')
+                future.set_exception(err)
+
+        with self._condition:
+            chat = self._chats.get(chat_id)
+            if chat is not None:
+                chat.busy = False
+                if retry_after is not None:
+                    chat.paused_until = time.monotonic() + retry_after
+                    chat.requests.appendleft(request)
+                    metrics.inc('outbox_retry_after_total')
+            self._update_queue_depth()
+            self._condition.notify_all()
+
+    def _update_queue_depth(self) -> None:
+        metrics.set_gauge('outbox_queue_depth',
+                          sum(len(chat.requests)
+                              for chat in self._chats.values()))
+
+
+class ErrorDigest:
+    """Error notifications to control chat collected during interval and
+    sent as one message (or a few if they are too long) via outbox"""
+
+    def __init__(self, outbox: Outbox, interval: float,
+                 max_length: int = MAX_MESSAGE_LENGTH):
+        self._outbox = outbox
+        self._interval = interval
+        self._max_length = max_length
+        self._errors: List[str] = []
+        self._bot: Optional[Bot] = None
+        self._chat_id = None
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+
+    def add(self, bot: Bot, chat_id, text: str) -> None:
+        """Add notification to the next digest, it is sent in interval
+        seconds after the first notification of digest"""
+        with self._lock:
+            self._bot, self._chat_id = bot, chat_id
+            self._errors.append(text)
+            if self._timer is None:
+                self._timer = threading.Timer(self._interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        """Send collected notifications now"""
+        with self._lock:
+            errors, self._errors = self._errors, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            bot, chat_id = self._bot, self._chat_id
+        if not errors:
+            return
+
+        header = f'<b>Ошибок: {len(errors)}</b>\n\n'
+        for text in self._split(header, errors):
+            self._outbox.send(chat_id, bot.send_message, chat_id=chat_id,
+                              text=text, parse_mode=ParseMode.HTML)
+
+    def _split(self, header: str, errors: List[str]) -> List[str]:
+        """Join notifications into messages not longer than max_length"""
+        messages = []
+        text = header
+        for error in errors:
+            error = error[:self._max_length - len(header) - 1] + '\n'
+            if len(text) + len(error) > self._max_length:
+                messages.append(text)
+                text = ''
+            text += error
+        messages.append(text)
+        return messages
+
+
+outbox = Outbox(global_rate=config.OUTBOX_GLOBAL_RATE,
+                chat_rate=config.OUTBOX_CHAT_RATE,
+                chat_burst=config.OUTBOX_CHAT_BURST,
+                workers=config.OUTBOX_WORKERS)
+error_digest = ErrorDigest(outbox, interval=config.ERROR_DIGEST_INTERVAL)
@@ -0,0 +1,18 @@
+"""Requests to Telegram Bot API"""
+from typing import Any, Dict
+
+from telegram.utils.request import Request
+
+from nbadviser.metrics import metrics
+
+
+class InstrumentedRequest(Request):
+    """Request measuring latency of every Bot API method
+    (except of long polling of updates)"""
+
+    def post(self, url: str, data: Dict[str, Any], timeout: float = None):
+        method = url.rsplit('/', 1)[-1]
+        if method == 'getUpdates':
+            return super().post(url, data, timeout=timeout)
+        with metrics.span('telegram_seconds', method=method):
+            return super().post(url, data, timeout=timeout)
@@ -0,0 +1,102 @@
+"""Streaming of long results into progressively edited telegram messages"""
+
+import time
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+from telegram import Message, ParseMode
+from telegram.constants import MAX_MESSAGE_LENGTH
+from telegram.error import BadRequest
+
+
+class MessageStream:
+    """Text streamed into telegram messages
+
+    The last sent message is edited as new parts of text are appended,
+    but not more often than edit_interval seconds. If text does not fit
+    into one message, the message is finished and the next one is sent.
+    Status line (e.g. progress) is shown at the end of the last message
+    until stream is finished
+
+    Requests to Bot API are made by send if it is given (e.g. outbox
+    respecting rate limits of the chat), otherwise directly
+    """
+
+    placeholder = '⏳'
+
+    def __init__(self, message: Message, reply: Callable[..., Message],
+                 edit_interval: float,
+                 max_length: int = MAX_MESSAGE_LENGTH,
+                 send: Optional[Callable[..., Future]] = None):
+        """
+        :param message: already sent message to edit
+        :param reply: function sending a new message
+         (e.g. update.message.reply_text)
+        :param send: called with function of request and its arguments,
+         returns future of the result (e.g. partial of Outbox.send)
+        """
+        self._message = message
+        self._reply = reply
+        self._send = send
+        self._edit_interval = edit_interval
+        self._max_length = max_length
+
+        self._text = ''
+        self._status = ''
+        self._shown_text = None
+        self._last_edit_time = 0.0
+
+    def append(self, text: str) -> None:
+        """Add part of text"""
+        if self._text and len(self._text) + len(text) + \
+                len(self._status) + 1 > self._max_length:
+            self._next_message()
+        self._text += text
+        self._edit()
+
+    def set_status(self, status: str) -> None:
+        """Set status line shown after text"""
+        self._status = status
+        self._edit()
+
+    def finish(self, footer: str = '') -> None:
+        """Show text without status line and with footer"""
+        self._status = ''
+        if self._text and len(self._text) + len(footer) > self._max_length:
+            self._next_message()
+        self._text += footer
+        self._edit(force=True)
+
+    def _next_message(self) -> None:
+        """Finish current message and send the next one"""
+        status, self._status = self._status, ''
+        self._edit(force=True)
+        self._status = status
+        self._message = self._call(self._reply, self.placeholder)
+        self._text = ''
+        self._shown_text = None
+
+    def _edit(self, force: bool = False) -> None:
+        """Edit current message if text changed and it is time to do it"""
+        now = time.monotonic()
+        if not force and now - self._last_edit_time < self._edit_interval:
+            return
+
+        text = '\n'.join(part for part in (self._text, self._status) if part)
+        if not text or text == self._shown_text:
+            return
+        try:
+            self._call(self._message.edit_text, text,
+                       parse_mode=ParseMode.HTML,
+                       disable_web_page_preview=True)
+        except BadRequest as err:
+            if 'not modified' not in str(err):
+                raise
+        self._shown_text = text
+        self._last_edit_time = now
+
+    def _call(self, func: Callable, *args, **kwargs):
+        """Make request to Bot API and wait for its result"""
+        if self._send is None:
+            return func(*args, **kwargs)
+        return self._send(func, *args, **kwargs).result()
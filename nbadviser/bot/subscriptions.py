@@ -0,0 +1,198 @@
+"""Subscriptions to push notifications about close live games"""
+
+import os
+import sqlite3
+import threading
+from concurrent.futures import Future
+from typing import List, Optional, Set
+
+from telegram import Bot, ParseMode
+from telegram.error import Unauthorized
+from telegram.ext import CallbackContext
+
+from nbadviser import config
+from nbadviser.adviser.limiter import Priority
+from nbadviser.adviser.providers import ScoreboardProvider, \
+    scoreboard_provider
+from nbadviser.adviser.strategies import CloseGameStrategy, LiveGamesStrategy
+from nbadviser.adviser.utils import get_date_etc_str, GameWithScoreInfo
+from nbadviser.bot.outbox import Outbox, outbox
+from nbadviser.config import logger, LINK_STREAMS
+
+
+class SubscribersStore:
+    """SQLite storage of subscribed chats, shared by worker processes
+    (WAL mode) and kept after restart"""
+
+    filename = 'subscribers.sqlite3'
+
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, self.filename)
+        self._directory = directory
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def add(self, chat_id: int) -> bool:
+        """:returns False if chat is already stored"""
+        return self._execute('INSERT OR IGNORE INTO subscribers (chat_id) '
+                             'VALUES (?)', chat_id)
+
+    def remove(self, chat_id: int) -> bool:
+        """:returns False if chat was not stored"""
+        return self._execute('DELETE FROM subscribers WHERE chat_id = ?',
+                             chat_id)
+
+    def all(self) -> List[int]:
+        with self._lock:
+            rows = self._connect().execute(
+                'SELECT chat_id FROM subscribers'
+            ).fetchall()
+        return [chat_id for chat_id, in rows]
+
+    def _execute(self, query: str, chat_id: int) -> bool:
+        """Execute query changing one chat
+        :returns True if a row was changed"""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                return connection.execute(query, (chat_id,)).rowcount == 1
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open connection and create table if needed"""
+        if self._connection is None:
+            os.makedirs(self._directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30,
+                                         check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS subscribers ('
+                               'chat_id INTEGER PRIMARY KEY)')
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+
+class LiveGamesNotifier:
+    """One shared poller of the current game day scoreboard that pushes
+    alerts about close live games to subscribed chats.
+
+    Game is close if it is in the last period or overtime (min_period)
+    and score gap is not more than allowed_gap of CloseGameStrategy.
+    States of games are compared with the previous poll: alert is sent
+    when a game becomes close, only once per game
+
+    Subscribers are kept in store if it is given (e.g. to be shared by
+    worker processes), otherwise in memory
+    """
+
+    def __init__(self, provider: ScoreboardProvider,
+                 outbox: Outbox = outbox,
+                 allowed_gap: int = CloseGameStrategy.allowed_gap,
+                 min_period: int = 4,
+                 store: Optional[SubscribersStore] = None):
+        self._provider = provider
+        self._outbox = outbox
+        self._store = store
+        self._strategy = LiveGamesStrategy()
+        self._allowed_gap = allowed_gap
+        self._min_period = min_period
+
+        self._subscribers: Set[int] = set()
+        self._games_date = None
+        self._close_games: Set[str] = set()  # Close at the previous poll
+        self._notified_games: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, chat_id: int) -> bool:
+        """Add chat to subscribers
+        :returns False if chat is already subscribed"""
+        if self._store is not None:
+            return self._store.add(chat_id)
+        with self._lock:
+            if chat_id in self._subscribers:
+                return False
+            self._subscribers.add(chat_id)
+            return True
+
+    def unsubscribe(self, chat_id: int) -> bool:
+        """Remove chat from subscribers
+        :returns False if chat was not subscribed"""
+        if self._store is not None:
+            return self._store.remove(chat_id)
+        with self._lock:
+            if chat_id not in self._subscribers:
+                return False
+            self._subscribers.discard(chat_id)
+            return True
+
+    def subscribers(self) -> List[int]:
+        if self._store is not None:
+            return self._store.all()
+        with self._lock:
+            return list(self._subscribers)
+
+    def poll(self, context: CallbackContext) -> None:
+        """Job callback: check live games and notify subscribers"""
+        if not self.subscribers():
+            return
+
+        games_date_str = get_date_etc_str()
+        try:
+            scoreboard = self._provider.get(games_date_str,
+                                            priority=Priority.BACKGROUND)
+            recommendation = self._strategy.execute(raw_data=scoreboard)
+        except Exception as err:
+            logger.warning(f'Не удалось проверить игры в прямом эфире: {err}')
+            return
+
+        for game in self.diff(games_date_str, recommendation.games):
+            self._notify(context.bot, game)
+
+    def diff(self, games_date_str: str,
+             live_games: List[GameWithScoreInfo]) -> List[GameWithScoreInfo]:
+        """Games that became close since the previous poll"""
+        with self._lock:
+            if games_date_str != self._games_date:
+                self._games_date = games_date_str
+                self._close_games = set()
+                self._notified_games = set()
+
+            close_games = [game for game in live_games if self.is_close(game)]
+            became_close = [
+                game for game in close_games
+                if game.game_id not in self._close_games
+                and game.game_id not in self._notified_games
+            ]
+            self._close_games = {game.game_id for game in close_games}
+            self._notified_games.update(game.game_id for game in became_close)
+            return became_close
+
+    def is_close(self, game: GameWithScoreInfo) -> bool:
+        return game.period >= self._min_period \
+            and game.score_gap <= self._allowed_gap
+
+    def _notify(self, bot: Bot, game: GameWithScoreInfo) -> List[Future]:
+        """Send alert about the game to all subscribers via outbox.
+        Chats that blocked the bot are unsubscribed"""
+        message = f'<b>{CloseGameStrategy.title}</b> в прямом эфире:\n' \
+                  f'{game.teams.visitor.name} - {game.teams.home.name} ' \
+                  f'({game.status})\n' \
+                  f'\n<i>Ссылка со стримами в хорошем качестве</i>:' \
+                  f'\n{LINK_STREAMS}'
+
+        def send(chat_id: int) -> None:
+            try:
+                bot.send_message(chat_id=chat_id, text=message,
+                                 parse_mode=ParseMode.HTML,
+                                 disable_web_page_preview=True)
+            except Unauthorized:
+                self.unsubscribe(chat_id)
+
+        return [self._outbox.send(chat_id, send, chat_id)
+                for chat_id in self.subscribers()]
+
+
+live_games_notifier = LiveGamesNotifier(
+    provider=scoreboard_provider,
+    store=SubscribersStore(directory=config.SCOREBOARD_STORE_DIR)
+    if config.SCOREBOARD_STORE_DIR else None
+)
@@ -1,11 +1,16 @@
 """Helping functions for bot"""
+import asyncio
+import json
+import random
 import time
-from datetime import datetime
+from datetime import datetime, date
 
 import functools
-from typing import Callable
+from typing import Callable, Optional, Tuple
 
+from nbadviser import config
 from nbadviser.config import logger
+from nbadviser.metrics import metrics
 
 
 def check_date_format(games_date: str):
@@ -18,24 +23,78 @@ def check_date_format(games_date: str):
         return True
 
 
+def parse_date_range(value: str) -> Optional[Tuple[date, date]]:
+    """Parse period in a format YYYY-MM-DD..YYYY-MM-DD
+    :returns first and last dates or None if format is wrong"""
+    first, separator, last = value.partition('..')
+    if not separator or not (check_date_format(first)
+                             and check_date_format(last)):
+        return
+    return datetime.strptime(first, '%Y-%m-%d').date(), \
+        datetime.strptime(last, '%Y-%m-%d').date()
+
+
 def log_access(handler: Callable):
     """Decorator for logging a bot handler call
     Intended to be used with python-telegram-bot handlers that take Update and
-    CallbackContext objects as positional arguments"""
+    CallbackContext objects as positional arguments.
+    Coroutine handlers are supported as well.
+    Execution time is observed in handler_seconds metric, access records
+    are sampled (see _log_handler_call)"""
+
+    if asyncio.iscoroutinefunction(handler):
+        @functools.wraps(handler)
+        async def async_wrapper(update, context):
+            """Wrapper for coroutine handler"""
+            start_time = time.time()
+            try:
+                await handler(update, context)
+            except Exception as err:
+                _log_handler_call(handler, update, time.time() - start_time,
+                                  error=err)
+                raise
+            _log_handler_call(handler, update, time.time() - start_time)
+
+        return async_wrapper
 
     @functools.wraps(handler)
     def wrapper(update, context):
         """Wrapper"""
-        user = f'full_name={update.message.from_user.full_name}, ' \
-               f'username={update.message.from_user.username}, ' \
-               f'id={update.message.from_user.id}'
-        command = f'{update.message.text}'
-
         start_time = time.time()
-        handler(update, context)
-        finish_time = time.time()
-        logger.info(f'User: {user}|Command: {command}|'
-                    f'Execution time: {finish_time-start_time:.3f}')
+        try:
+            handler(update, context)
+        except Exception as err:
+            _log_handler_call(handler, update, time.time() - start_time,
+                              error=err)
+            raise
+        _log_handler_call(handler, update, time.time() - start_time)
 
     return wrapper
 
+
+def _log_handler_call(handler: Callable, update, execution_time: float,
+                      error: Optional[Exception] = None):
+    """Observe execution time and log access record as JSON (in extra
+    'access'). Only ACCESS_LOG_SAMPLE_RATES share of records of a handler
+    is logged, except errors and slow calls"""
+    name = handler.__name__
+    metrics.observe('handler_seconds', execution_time, handler=name)
+    if error is None \
+            and execution_time < config.ACCESS_LOG_SLOW_THRESHOLD \
+            and random.random() >= config.ACCESS_LOG_SAMPLE_RATES.get(name, 1):
+        metrics.inc('access_log_sampled_out_total', handler=name)
+        return
+
+    from_user = update.message.from_user
+    record = dict(time=round(time.time(), 3), handler=name,
+                  user_id=from_user.id, username=from_user.username,
+                  full_name=from_user.full_name,
+                  command=update.message.text,
+                  seconds=round(execution_time, 3),
+                  error=None if error is None else repr(error))
+    logger.bind(access=json.dumps(record, ensure_ascii=False)).log(
+        'INFO' if error is None else 'ERROR',
+        f'User: id={from_user.id}, username={from_user.username}|'
+        f'Command: {update.message.text}|'
+        f'Execution time: {execution_time:.3f}'
+    )
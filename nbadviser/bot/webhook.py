@@ -0,0 +1,161 @@
+"""Receiving updates by webhook on a local tornado HTTP server
+
+Telegram sends every update as a POST request with Update JSON. Updates
+are processed by a pool of workers, the request is answered as soon as
+update is accepted. When too many updates are pending (waiting for a
+worker or being processed), new ones are rejected with 503 and Telegram
+delivers them again later, so a burst of updates does not pile up in
+memory.
+"""
+import asyncio
+import json
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import tornado.httpserver
+import tornado.ioloop
+import tornado.netutil
+import tornado.web
+from telegram import Update
+from telegram.ext import Dispatcher
+
+from nbadviser.config import logger
+from nbadviser.metrics import metrics
+
+
+class _UpdateHandler(tornado.web.RequestHandler):
+    """Accepts POST requests with updates"""
+
+    def initialize(self, server: 'WebhookServer') -> None:
+        self.server = server
+
+    def post(self) -> None:
+        try:
+            data = json.loads(self.request.body)
+            update = Update.de_json(data, self.server.dispatcher.bot)
+        except (ValueError, TypeError, KeyError) as err:
+            logger.warning(f'Webhook: неверное обновление: {err}')
+            self.send_error(400)
+            return
+
+        if not self.server.submit(update):
+            self.set_header('Retry-After', str(self.server.retry_after))
+            self.send_error(503)
+            return
+        self.set_status(200)
+
+    def get(self) -> None:
+        """Health check"""
+        self.write('ok')
+
+    def log_exception(self, typ, value, tb) -> None:
+        if not isinstance(value, tornado.web.HTTPError):
+            logger.error(f'Webhook: ошибка обработки запроса: {value}')
+
+
+class WebhookServer:
+    """HTTP server that passes updates posted to url_path to dispatcher
+
+    Updates are processed by dispatcher.process_update in a pool of
+    workers threads, not more than max_pending updates are accepted at
+    the same time (see module docstring). Server runs its own event loop
+    in a separate thread
+    """
+
+    def __init__(self, dispatcher: Dispatcher, listen: str, port: int,
+                 url_path: str, workers: int, max_pending: int,
+                 retry_after: int = 1, reuse_port: bool = False):
+        self.dispatcher = dispatcher
+        self.listen = listen
+        self.port = port
+        self.url_path = url_path.strip('/')
+        self.retry_after = retry_after
+        self._reuse_port = reuse_port
+        self._workers = workers
+        self._max_pending = max_pending
+
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._loop: Optional[tornado.ioloop.IOLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._started = threading.Event()
+
+    def start(self) -> None:
+        """Bind socket (port 0 - any free port, see port attribute) and
+        start serving in a daemon thread. With reuse_port many processes
+        can listen on the same port, connections are balanced by kernel"""
+        sockets = tornado.netutil.bind_sockets(self.port,
+                                               address=self.listen,
+                                               reuse_port=self._reuse_port)
+        self.port = sockets[0].getsockname()[1]
+        self._executor = ThreadPoolExecutor(max_workers=self._workers,
+                                            thread_name_prefix='webhook')
+        self._thread = threading.Thread(target=self._serve, args=(sockets,),
+                                        daemon=True, name='webhook-server')
+        self._thread.start()
+        self._started.wait()
+        logger.info(f'Webhook: прием обновлений на '
+                    f'http://{self.listen}:{self.port}/{self.url_path}')
+
+    def stop(self) -> None:
+        """Stop accepting updates and wait for pending ones"""
+        if self._loop is None:
+            return
+        self._loop.add_callback(self._loop.stop)
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+        self._loop = None
+
+    def submit(self, update: Update) -> bool:
+        """Pass update to workers
+        :returns False if there are too many pending updates"""
+        with self._lock:
+            if self._pending >= self._max_pending:
+                metrics.inc('webhook_rejected_total')
+                return False
+            self._pending += 1
+            metrics.set_gauge('webhook_pending', self._pending)
+        self._executor.submit(self._process, update)
+        return True
+
+    def _process(self, update: Update) -> None:
+        """Handle update by dispatcher handlers (errors are passed to
+        dispatcher error handlers by process_update)"""
+        try:
+            self.dispatcher.process_update(update)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                metrics.set_gauge('webhook_pending', self._pending)
+
+    def _serve(self, sockets: list) -> None:
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        self._loop = tornado.ioloop.IOLoop.current()
+        application = tornado.web.Application([
+            (rf'/{self.url_path}/?', _UpdateHandler, dict(server=self)),
+        ])
+        http_server = tornado.httpserver.HTTPServer(application)
+        http_server.add_sockets(sockets)
+        self._started.set()
+        self._loop.start()
+        http_server.stop()
+        self._loop.close(all_fds=True)
+
+
+def wait_for_stop_signal() -> None:
+    """Block until SIGINT, SIGTERM or SIGABRT is received
+    (as Updater.idle does for polling)"""
+    stop_event = threading.Event()
+
+    def handler(signum, frame):
+        logger.info(f'Получен сигнал {signum}, остановка')
+        stop_event.set()
+
+    for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGABRT):
+        signal.signal(signum, handler)
+    # Waiting with timeout lets the main thread handle signals
+    while not stop_event.wait(1):
+        pass
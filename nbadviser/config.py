@@ -7,21 +7,45 @@ import pytz
 from loguru import logger
 
 
-def configure_log_filename():
-    """Determine log filename and create a directory if needed"""
-    log_filename = 'nbadviser.log'
+def configure_log_filename(worker_index=None, name='nbadviser'):
+    """Determine log filename in LOG_DIR (directory is created by writer,
+    every worker process writes its own log file)"""
+    log_filename = f'{name}.log' if worker_index is None \
+        else f'{name}-{worker_index}.log'
+    return os.path.join(LOG_DIR, log_filename)
 
-    if platform.system() == 'Windows':
-        log_path = 'C:\\logs\\'
-        if not os.path.exists(log_path):
-            os.mkdir(log_path)
-    else:
-        log_path = '/var/log/nbadviser/'
-    return log_path + log_filename
+
+def configure_logging(worker_index=None) -> None:
+    """Add log file sinks (once). Called by entry points, not on import,
+    so importing modules (e.g. in tests) does not touch log files
+
+    Files are written by background threads (see nbadviser.logs), access
+    records of bot handlers go to a separate file as JSON lines"""
+    global LOG_FILENAME, ACCESS_LOG_FILENAME
+    if LOG_FILENAME is not None:
+        return
+    from nbadviser.logs import BatchWriter
+
+    LOG_FILENAME = configure_log_filename(worker_index)
+    ACCESS_LOG_FILENAME = configure_log_filename(worker_index,
+                                                 name='nbadviser-access')
+    logger.add(sink=BatchWriter(LOG_FILENAME, batch_size=LOG_BATCH_SIZE,
+                                max_delay=LOG_BATCH_DELAY),
+               level=LOG_LEVEL, colorize=False,
+               filter=lambda record: 'access' not in record['extra'])
+    logger.add(sink=BatchWriter(ACCESS_LOG_FILENAME,
+                                batch_size=LOG_BATCH_SIZE,
+                                max_delay=LOG_BATCH_DELAY),
+               level=LOG_LEVEL, colorize=False,
+               format='{extra[access]}',
+               filter=lambda record: 'access' in record['extra'])
 
 
 # Environment
 TOKEN = os.environ.get('NBADVISER_TOKEN')
+# Bot API server (token is appended), e.g. a local stand-in in load tests
+BOT_API_BASE_URL = os.environ.get('NBADVISER_BOT_API_BASE_URL',
+                                  'https://api.telegram.org/bot')
 try:
     CONTROL_CHAT_ID = os.environ['NBADVISER_CONTROL_CHAT_ID']
 except KeyError:
@@ -29,14 +53,140 @@ except KeyError:
 else:
     SEND_ON_ERROR = True
 
-# Logging
-LOG_FILENAME = configure_log_filename()
+# Logging (see configure_logging)
+LOG_DIR = os.environ.get(
+    'NBADVISER_LOG_DIR',
+    'C:\\logs' if platform.system() == 'Windows' else '/var/log/nbadviser'
+)
+LOG_FILENAME = None  # Set when log file sink is added
+ACCESS_LOG_FILENAME = None
 LOG_LEVEL = 'INFO'
-LOG_ROTATION = '1 month'
-logger.add(sink=LOG_FILENAME, level=LOG_LEVEL, rotation=LOG_ROTATION,
-           encoding='utf8')
+# Messages are written in batches of up to LOG_BATCH_SIZE collected for
+# not longer than LOG_BATCH_DELAY seconds (errors are written right away).
+# Files are rotated monthly
+LOG_BATCH_SIZE = 256
+LOG_BATCH_DELAY = 0.5  # seconds
+# Share of access records kept by handler name, e.g.
+# NBADVISER_ACCESS_LOG_SAMPLE_RATES=get_recommendations=0.1,start=0.5
+# (1 by default). Errors and requests handled longer than
+# ACCESS_LOG_SLOW_THRESHOLD seconds are always kept
+ACCESS_LOG_SAMPLE_RATES = {
+    name: float(rate) for name, _, rate in (
+        item.partition('=') for item in
+        os.environ.get('NBADVISER_ACCESS_LOG_SAMPLE_RATES', '').split(',')
+        if item
+    )
+}
+ACCESS_LOG_SLOW_THRESHOLD = 1.0
 
 ETC_TIMEZONE = pytz.timezone('US/Eastern')
 
+# Number of threads handling bot updates
+BOT_WORKERS = 16
+# Worker processes started by supervisor (command workers), every one
+# receives updates by webhook on the same port and shares scoreboards
+# through SCOREBOARD_STORE_DIR. Rate limits below are split between them
+WORKERS = int(os.environ.get('NBADVISER_WORKERS', 1))
+# Runtime of recommendation handlers: 'threads' or 'asyncio'
+BOT_RUNTIME = os.environ.get('NBADVISER_BOT_RUNTIME', 'threads')
+
+# Receiving of updates: 'polling' (getUpdates) or 'webhook' (local HTTP
+# server, Telegram posts updates to WEBHOOK_URL)
+BOT_MODE = os.environ.get('NBADVISER_BOT_MODE', 'polling')
+WEBHOOK_LISTEN = os.environ.get('NBADVISER_WEBHOOK_LISTEN', '127.0.0.1')
+WEBHOOK_PORT = int(os.environ.get('NBADVISER_WEBHOOK_PORT', 8443))
+WEBHOOK_PATH = os.environ.get('NBADVISER_WEBHOOK_PATH', 'telegram')
+# Public URL of the webhook (e.g. behind reverse proxy), registered in
+# Telegram on start. If not set, webhook has to be registered separately
+WEBHOOK_URL = os.environ.get('NBADVISER_WEBHOOK_URL')
+WEBHOOK_WORKERS = int(os.environ.get('NBADVISER_WEBHOOK_WORKERS',
+                                     BOT_WORKERS))
+# Updates waiting for a worker or being processed, next ones are rejected
+# and delivered by Telegram again later
+WEBHOOK_MAX_PENDING = int(os.environ.get('NBADVISER_WEBHOOK_MAX_PENDING',
+                                         100))
+
+# Recommendations for a period of games dates
+RANGE_MAX_DAYS = 31  # Longest period given as YYYY-MM-DD..YYYY-MM-DD
+RANGE_MAX_CONCURRENCY = 4  # Games dates processed in parallel
+STREAM_EDIT_INTERVAL = 1.5  # seconds between edits of streamed message
+SEASON_TOP_GAMES = 5  # Best games of a season chosen by every strategy
+
+# Outbound requests to Bot API (Telegram limits: about 1 message per
+# second to a chat, 30 messages per second overall)
+OUTBOX_GLOBAL_RATE = float(os.environ.get('NBADVISER_OUTBOX_GLOBAL_RATE',
+                                          30)) / WORKERS  # per second
+# Updates of one chat can be handled by any worker, so limits of a chat
+# are split between workers as well
+OUTBOX_CHAT_RATE = 1 / WORKERS  # requests per second to one chat
+# e.g. reply and its edits are sent without delay
+OUTBOX_CHAT_BURST = max(1, 3 // WORKERS)
+OUTBOX_WORKERS = 4  # Requests sent in parallel
+# Error notifications to control chat are sent as one digest per interval
+ERROR_DIGEST_INTERVAL = 60  # seconds
+
+# Polling of live games for subscribers of alerts
+SUBSCRIPTIONS_POLL_INTERVAL = 30  # seconds
+
+# Strategies execution (0 workers - execute one after another)
+STRATEGIES_MAX_WORKERS = 4
+STRATEGY_TIMEOUT = 20  # seconds from the start of execution
+
+# Last recommendations by games date are served right away with their age
+# (stale-while-revalidate) and computed again in background when older
+# than STALE_AFTER
+RECOMMENDATIONS_STALE_AFTER = 60  # seconds, as SCOREBOARD_CACHE_TTL
+RECOMMENDATIONS_STALE_MAX_AGE = 3600  # seconds, older ones are not served
+RECOMMENDATIONS_STALE_MAXSIZE = 64  # games dates
+
+# Rendered messages by games date, strategies and scoreboard
+RENDERED_HTML_CACHE_MAXSIZE = 256
+
+# Background refreshing of the current game day
+PREWARM_ENABLED = True
+PREWARM_LIVE_INTERVAL = 30  # seconds, while any game is live
+PREWARM_IDLE_INTERVAL = 600  # seconds, when no games are live
+
+# Scoreboard cache
+SCOREBOARD_CACHE_MAXSIZE = 16  # Dates that can still change (current day)
+SCOREBOARD_CACHE_TTL = 60  # seconds
+SCOREBOARD_CACHE_PINNED_MAXSIZE = 512  # Dates with all games finished
+# Directory of on-disk scoreboard store (optional, disabled if not set)
+SCOREBOARD_STORE_DIR = os.environ.get('NBADVISER_STORE_DIR')
+# Lease of a games date taken by the worker process fetching it (expires
+# if the process dies)
+SCOREBOARD_LEASE_TTL = 30  # seconds
+
+# Requests to NBA stats API
+STATS_BASE_URL = os.environ.get('NBADVISER_STATS_BASE_URL',
+                                'https://stats.nba.com/stats')
+STATS_CONNECT_TIMEOUT = 3.05  # seconds
+STATS_READ_TIMEOUT = 6  # seconds
+STATS_RETRIES = 1  # Worst case of all attempts fits in STRATEGY_TIMEOUT
+STATS_BACKOFF_BASE = 0.5  # seconds, doubled on every retry
+STATS_BACKOFF_MAX = 4  # seconds
+STATS_POOL_SIZE = 8  # Keep-alive connections
+# Requests are stopped for a while after failures in a row, cached data
+# is served even if it is outdated
+STATS_BREAKER_FAILURES = 5
+STATS_BREAKER_RESET_TIMEOUT = 30  # seconds
+# Rate of requests (interactive ones go ahead of background and historical)
+STATS_RATE_LIMIT = 2 / WORKERS  # requests per second
+STATS_RATE_BURST = 5
+STATS_RATE_MAX_WAIT = 10  # seconds in queue, then cached data is served
+
+# Directory of local index of historical games (optional, filled by
+# backfill command, disabled if not set)
+GAME_INDEX_DIR = os.environ.get('NBADVISER_INDEX_DIR', SCOREBOARD_STORE_DIR)
+BACKFILL_CONCURRENCY = 4  # Games dates requested in parallel
+BACKFILL_RATE = 2.0  # Requests to data provider per second
+
+# Metrics of stages latency: Prometheus endpoint (disabled if port is not
+# set) and periodic summary in log
+METRICS_HOST = os.environ.get('NBADVISER_METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.environ['NBADVISER_METRICS_PORT']) \
+    if os.environ.get('NBADVISER_METRICS_PORT') else None
+METRICS_LOG_INTERVAL = 600  # seconds
+
 LINK_FULL_GAMES = 'https://nbareplay.net/'
 LINK_STREAMS = 'http://6streams.tv/'
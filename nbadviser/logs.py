@@ -0,0 +1,113 @@
+"""Writing logs to files off the logging threads
+
+BatchWriter is a loguru sink: logging threads only put messages in a
+queue and a writer thread writes them to file in batches. A batch is
+written when batch_size messages are collected, max_delay seconds passed
+since its first message or a message of flush_level (ERROR) or above
+comes, so errors get to file right away.
+"""
+import os
+import queue
+import sys
+import threading
+import time
+from typing import List, Optional
+
+_STOP = object()
+
+
+class BatchWriter:
+    """Loguru sink writing messages to file by a writer thread (see
+    module docstring). File is rotated when month changes: the previous
+    one is renamed to <name>.<YYYY-MM><ext>"""
+
+    def __init__(self, path: str, batch_size: int = 256,
+                 max_delay: float = 0.5, flush_level: int = 40,
+                 encoding: str = 'utf8'):
+        self.name = path  # Shown by loguru as the sink name
+        self.encoding = encoding
+        self._batch_size = batch_size
+        self._max_delay = max_delay
+        self._flush_level = flush_level
+        self._queue = queue.SimpleQueue()
+        self._file = None
+        self._month: Optional[str] = None
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name='log-writer')
+        self._thread.start()
+
+    def write(self, message: str) -> None:
+        """Called by loguru in the logging thread"""
+        self._queue.put(message)
+
+    def stop(self) -> None:
+        """Write messages left in queue and close file
+        (called by loguru when sink is removed, e.g. at exit)"""
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self) -> None:
+        stopped = False
+        while not stopped:
+            batch, stopped = self._collect()
+            if batch:
+                self._write(batch)
+        if self._file is not None:
+            self._file.close()
+
+    def _collect(self):
+        """Wait for messages of the next batch
+        :returns messages and whether writer is stopped"""
+        batch: List[str] = []
+        message = self._queue.get()
+        deadline = time.monotonic() + self._max_delay
+        while message is not _STOP:
+            batch.append(message)
+            if len(batch) >= self._batch_size or \
+                    self._level(message) >= self._flush_level:
+                return batch, False
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                return batch, False
+            try:
+                message = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                return batch, False
+        return batch, True
+
+    def _write(self, batch: List[str]) -> None:
+        try:
+            self._open()
+            self._file.write(''.join(batch))
+            self._file.flush()
+        except OSError as err:
+            # There is no other place to report problems of log file
+            sys.stderr.write(f'Не удалось записать лог {self.name}: '
+                             f'{err}\n')
+
+    def _open(self) -> None:
+        """Open file, rotating it if it was written in another month"""
+        month = time.strftime('%Y-%m')
+        if self._file is not None and self._month == month:
+            return
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        if os.path.exists(self.name):
+            file_month = time.strftime('%Y-%m', time.localtime(
+                os.path.getmtime(self.name)
+            ))
+            if file_month != month:
+                base, ext = os.path.splitext(self.name)
+                os.replace(self.name, f'{base}.{file_month}{ext}')
+        directory = os.path.dirname(self.name)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.name, 'a', encoding=self.encoding)
+        self._month = month
+
+    @staticmethod
+    def _level(message) -> int:
+        record = getattr(message, 'record', None)
+        return record['level'].no if record is not None else 0
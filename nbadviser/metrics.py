@@ -0,0 +1,252 @@
+"""Latency histograms and counters of stages of handling requests
+
+Stages are measured with spans:
+
+    with metrics.span('stage_seconds', stage='fetch'):
+        ...
+
+Metrics are exposed in Prometheus text format by a local HTTP server
+(start_http_server) and summarized in logs (log_summary).
+"""
+import contextlib
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from nbadviser.config import logger
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# Upper bounds of histogram buckets in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Counts of observed values by buckets with their sum"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Estimation of quantile: upper bound of the bucket where it is
+        (the largest bucket bound for +Inf bucket)"""
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return self.buckets[-1]
+
+
+class Metrics:
+    """Thread-safe registry of histograms, counters and gauges by name
+    and labels"""
+
+    prefix = 'nbadviser_'
+
+    def __init__(self):
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = dict()
+        self._counters: Dict[str, Dict[Labels, int]] = dict()
+        self._gauges: Dict[str, Dict[Labels, float]] = dict()
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Add value (e.g. duration in seconds) to histogram"""
+        key = self._labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, dict())
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, name: str, value: int = 1, **labels: str) -> None:
+        """Increase counter"""
+        key = self._labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, dict())
+            series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels: str) -> None:
+        """Set current value (e.g. size of a queue)"""
+        key = self._labels(labels)
+        with self._lock:
+            self._gauges.setdefault(name, dict())[key] = value
+
+    @contextlib.contextmanager
+    def span(self, name: str, **labels: str) -> Iterator[None]:
+        """Measure duration of the block (even if it fails) in histogram"""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start_time, **labels)
+
+    def get_histogram(self, name: str, **labels: str) -> Optional[Histogram]:
+        with self._lock:
+            return self._histograms.get(name, {}).get(self._labels(labels))
+
+    def get_counter(self, name: str, **labels: str) -> int:
+        with self._lock:
+            return self._counters.get(name, {}).get(self._labels(labels), 0)
+
+    def get_gauge(self, name: str, **labels: str) -> Optional[float]:
+        with self._lock:
+            return self._gauges.get(name, {}).get(self._labels(labels))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._histograms = dict()
+            self._counters = dict()
+            self._gauges = dict()
+
+    def render_prometheus(self) -> str:
+        """Metrics in Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                full_name = self.prefix + name
+                lines.append(f'# TYPE {full_name} histogram')
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    bounds = [str(bound) for bound in histogram.buckets]
+                    for bound, count in zip(bounds + ['+Inf'],
+                                            histogram.counts):
+                        cumulative += count
+                        lines.append(
+                            f'{full_name}_bucket'
+                            f'{self._format(labels + (("le", bound),))} '
+                            f'{cumulative}'
+                        )
+                    lines.append(f'{full_name}_sum{self._format(labels)} '
+                                 f'{histogram.sum}')
+                    lines.append(f'{full_name}_count{self._format(labels)} '
+                                 f'{histogram.count}')
+            for metric_type, metrics_series in (('counter', self._counters),
+                                                 ('gauge', self._gauges)):
+                for name, series in sorted(metrics_series.items()):
+                    full_name = self.prefix + name
+                    lines.append(f'# TYPE {full_name} {metric_type}')
+                    for labels, value in sorted(series.items()):
+                        lines.append(f'{full_name}{self._format(labels)} '
+                                     f'{value}')
+        return '\n'.join(lines) + '\n'
+
+    def summary(self) -> List[str]:
+        """Short description of every series: count, average and
+        estimated p50 and p95 of histograms, values of counters and
+        gauges"""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                for labels, histogram in sorted(series.items()):
+                    if not histogram.count:
+                        continue
+                    average = histogram.sum / histogram.count
+                    lines.append(
+                        f'{name}{self._format(labels)}: '
+                        f'n={histogram.count} avg={average:.3f}s '
+                        f'p50<={histogram.quantile(0.5)}s '
+                        f'p95<={histogram.quantile(0.95)}s'
+                    )
+            for metrics_series in (self._counters, self._gauges):
+                for name, series in sorted(metrics_series.items()):
+                    for labels, value in sorted(series.items()):
+                        lines.append(f'{name}{self._format(labels)}: '
+                                     f'{value}')
+        return lines
+
+    def log_summary(self, *args) -> None:
+        """Log summary of metrics (can be used as a job callback)"""
+        lines = self.summary()
+        if lines:
+            logger.info('Метрики:\n' + '\n'.join(lines))
+
+    @staticmethod
+    def _labels(labels: Dict[str, str]) -> Labels:
+        return tuple(sorted((key, str(value))
+                            for key, value in labels.items()))
+
+    @staticmethod
+    def _format(labels: Labels) -> str:
+        if not labels:
+            return ''
+        return '{' + ','.join(
+            f'{key}="{value}"'.replace('\n', ' ') for key, value in labels
+        ) + '}'
+
+
+class StartupTimer:
+    """Durations of startup stages (e.g. import, config, ready), each one
+    counted from the end of the previous one, exposed as startup_seconds
+    gauge
+
+    start_time - time.perf_counter() value startup is counted from
+    (e.g. taken before imports), now by default"""
+
+    def __init__(self, registry: Metrics,
+                 start_time: Optional[float] = None):
+        self._registry = registry
+        if start_time is None:
+            start_time = time.perf_counter()
+        self._start_time = self._last_time = start_time
+        self.stages: List[Tuple[str, float]] = []
+
+    def mark(self, stage: str) -> float:
+        """End the current stage
+        :returns its duration in seconds"""
+        now = time.perf_counter()
+        duration = now - self._last_time
+        self._last_time = now
+        self.stages.append((stage, duration))
+        self._registry.set_gauge('startup_seconds', duration, stage=stage)
+        return duration
+
+    def report(self) -> None:
+        """Log durations of stages and total startup time"""
+        stages = ', '.join(f'{stage} {duration:.3f} с'
+                           for stage, duration in self.stages)
+        logger.info(f'Запуск за {self._last_time - self._start_time:.3f} с '
+                    f'({stages})')
+
+
+def start_http_server(registry: Metrics, host: str,
+                      port: int) -> ThreadingHTTPServer:
+    """Serve metrics on http://host:port/metrics in a daemon thread"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Scrapes are not logged
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True,
+                     name='metrics-server').start()
+    logger.info(f'Метрики доступны на http://{host}:{port}/metrics')
+    return server
+
+
+metrics = Metrics()
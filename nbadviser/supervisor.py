@@ -0,0 +1,163 @@
+"""Running the bot in several worker processes
+
+Supervisor starts worker processes (target is called with index of the
+worker) and starts again the ones that exit, until it is stopped by
+SIGINT or SIGTERM. Workers are spawned, not forked, so they do not
+inherit threads and connections of supervisor.
+
+Worker that exits sooner than min_uptime after start is started again
+with exponential backoff (restart_delay, doubled with every such exit up
+to max_restart_delay). After max_fast_failures of such exits in a row it
+is not started anymore, supervisor stops when no workers are left.
+"""
+import multiprocessing
+import signal
+import threading
+import time
+from typing import Callable, Dict, Set
+
+from nbadviser import config
+from nbadviser.config import logger
+from nbadviser.metrics import metrics, StartupTimer
+
+
+class Supervisor:
+    """Keeps workers number of processes running target"""
+
+    def __init__(self, target: Callable[[int], None], workers: int,
+                 check_interval: float = 1, stop_timeout: float = 10,
+                 min_uptime: float = 10, restart_delay: float = 1,
+                 max_restart_delay: float = 60, max_fast_failures: int = 5):
+        self._target = target
+        self._workers = workers
+        self._check_interval = check_interval
+        self._stop_timeout = stop_timeout
+        self._min_uptime = min_uptime
+        self._restart_delay = restart_delay
+        self._max_restart_delay = max_restart_delay
+        self._max_fast_failures = max_fast_failures
+        self._context = multiprocessing.get_context('spawn')
+        self._processes: Dict[int, multiprocessing.Process] = dict()
+        self._started_at: Dict[int, float] = dict()  # monotonic time
+        self._fast_failures: Dict[int, int] = dict()  # exits in a row
+        self._restart_at: Dict[int, float] = dict()  # exited workers
+        self.restarts = 0
+        self.failed: Set[int] = set()  # Workers not started anymore
+
+    @property
+    def pids(self) -> Dict[int, int]:
+        """Process ids by worker index"""
+        return {index: process.pid
+                for index, process in self._processes.items()}
+
+    def start(self) -> None:
+        for index in range(self._workers):
+            self._start_worker(index)
+        logger.info(f'Запущено рабочих процессов: {self._workers}')
+
+    @property
+    def has_workers(self) -> bool:
+        """Some workers are running or waiting for restart"""
+        return bool(self._processes or self._restart_at)
+
+    def check(self) -> int:
+        """Start again workers that exited (with backoff after fast exits)
+        :returns number of started workers"""
+        now = time.monotonic()
+        for index, process in list(self._processes.items()):
+            if process.is_alive():
+                continue
+            pid, exitcode = process.pid, process.exitcode
+            process.close()
+            del self._processes[index]
+
+            failures = 0
+            if now - self._started_at[index] < self._min_uptime:
+                failures = self._fast_failures.get(index, 0) + 1
+            self._fast_failures[index] = failures
+            if failures > self._max_fast_failures:
+                logger.error(f'Рабочий процесс {index} завершился сразу '
+                             f'после запуска {failures} раз подряд '
+                             f'(код {exitcode}), перезапуски прекращены')
+                self.failed.add(index)
+                continue
+
+            delay = self.get_restart_delay(failures)
+            logger.warning(f'Рабочий процесс {index} (pid {pid}) '
+                           f'завершился с кодом {exitcode}, '
+                           f'перезапуск через {delay:.0f} с')
+            self._restart_at[index] = now + delay
+
+        started = 0
+        for index, restart_at in list(self._restart_at.items()):
+            if restart_at <= now:
+                del self._restart_at[index]
+                self._start_worker(index)
+                started += 1
+        self.restarts += started
+        return started
+
+    def get_restart_delay(self, failures: int) -> float:
+        """Seconds before restart of worker that exited fast failures
+        times in a row"""
+        if failures == 0:
+            return 0
+        return min(self._restart_delay * 2 ** (failures - 1),
+                   self._max_restart_delay)
+
+    def stop(self) -> None:
+        """Ask workers to stop (SIGTERM) and kill those that do not stop
+        during stop_timeout"""
+        for process in self._processes.values():
+            if process.is_alive():
+                process.terminate()
+        for index, process in self._processes.items():
+            process.join(self._stop_timeout)
+            if process.is_alive():
+                logger.warning(f'Рабочий процесс {index} не остановился, '
+                               f'завершение')
+                process.kill()
+                process.join()
+        self._processes = dict()
+        self._restart_at = dict()
+
+    def run(self) -> bool:
+        """Run workers until SIGINT or SIGTERM
+        :returns False if supervisor stopped because all workers failed"""
+        stop_event = threading.Event()
+
+        def handler(signum, frame):
+            logger.info(f'Получен сигнал {signum}, остановка процессов')
+            stop_event.set()
+
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, handler)
+
+        self.start()
+        all_failed = False
+        while not stop_event.wait(self._check_interval):
+            self.check()
+            if not self.has_workers:
+                logger.error('Все рабочие процессы завершились с ошибкой')
+                all_failed = True
+                break
+        self.stop()
+        return not all_failed
+
+    def _start_worker(self, index: int) -> None:
+        process = self._context.Process(target=self._target, args=(index,),
+                                        name=f'nbadviser-worker-{index}',
+                                        daemon=False)
+        process.start()
+        self._processes[index] = process
+        self._started_at[index] = time.monotonic()
+
+
+def run_worker(worker_index: int) -> None:
+    """Entry point of worker process: the bot as started by
+    python -m nbadviser, but in webhook mode on the shared port"""
+    startup = StartupTimer(metrics)
+    config.configure_logging(worker_index)
+    # Spawned process imports entry point module by its name
+    from nbadviser.__main__ import run_bot
+    run_bot(startup, worker_index=worker_index)
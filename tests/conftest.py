@@ -0,0 +1,16 @@
+"""Common fixtures of tests"""
+import pytest
+
+from nbadviser.adviser import providers as providers_module
+
+
+@pytest.fixture
+def global_provider(monkeypatch):
+    """Global scoreboard provider with empty cache, requesting endpoint
+    by nba_api (without transport and limiter), so that tests replace
+    ScoreboardV2 with fake one"""
+    provider = providers_module.scoreboard_provider
+    monkeypatch.setattr(provider, 'transport', None)
+    monkeypatch.setattr(provider, 'limiter', None)
+    provider.cache.clear()
+    return provider
@@ -0,0 +1,106 @@
+"""Helping functions for tests: building ScoreboardV2-like data"""
+import os
+
+from nba_api.stats.endpoints._base import Endpoint
+from nba_api.stats.endpoints.scoreboardv2 import ScoreboardV2
+from nba_api.stats.library.http import NBAStatsResponse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+# Games dates with recorded responses of ScoreboardV2 endpoint
+RECORDED_GAMES_DATES = ('2022-01-10', '2022-01-11', '2022-01-12')
+
+GAME_HEADER_HEADERS = ScoreboardV2.expected_data['GameHeader']
+LINE_SCORE_HEADERS = ScoreboardV2.expected_data['LineScore']
+TEAM_LEADERS_HEADERS = ScoreboardV2.expected_data['TeamLeaders']
+
+
+def make_data_sets(games_date: str, games: list) -> dict:
+    """Make GameHeader, LineScore and TeamLeaders data sets
+
+    :param games_date: string in a format YYYY-MM-DD
+    :param games: list of tuples
+     (status_id, visitor_pts, home_pts, top_scorer_pts)
+    """
+    game_header, line_score, team_leaders = [], [], []
+    for number, (status_id, visitor_pts, home_pts, top_pts) in \
+            enumerate(games, start=1):
+        game_id = f'00221{number:05d}'
+        home_id, visitor_id = 1610612700 + 2 * number, 1610612701 + 2 * number
+        status_text = {2: '4th Qtr', 3: 'Final'}.get(status_id, '7:00 pm ET')
+
+        header = dict.fromkeys(GAME_HEADER_HEADERS)
+        header.update(GAME_DATE_EST=f'{games_date}T00:00:00',
+                      GAME_SEQUENCE=number, GAME_ID=game_id,
+                      GAME_STATUS_ID=status_id,
+                      GAME_STATUS_TEXT=status_text,
+                      HOME_TEAM_ID=home_id, VISITOR_TEAM_ID=visitor_id,
+                      LIVE_PERIOD=4 if status_id != 1 else 0)
+        game_header.append([header[key] for key in GAME_HEADER_HEADERS])
+
+        for team_id, pts in ((home_id, home_pts), (visitor_id, visitor_pts)):
+            score = dict.fromkeys(LINE_SCORE_HEADERS)
+            score.update(GAME_ID=game_id, TEAM_ID=team_id,
+                         TEAM_CITY_NAME=f'City{team_id}',
+                         TEAM_NAME=f'Team{team_id}', PTS=pts)
+            line_score.append([score[key] for key in LINE_SCORE_HEADERS])
+
+            leader = dict.fromkeys(TEAM_LEADERS_HEADERS)
+            leader.update(GAME_ID=game_id, TEAM_ID=team_id,
+                          PTS_PLAYER_NAME=f'Player{team_id}',
+                          PTS=top_pts if team_id == home_id else 10)
+            team_leaders.append([leader[key] for key in TEAM_LEADERS_HEADERS])
+
+    return {
+        'GameHeader': {'headers': GAME_HEADER_HEADERS, 'data': game_header},
+        'LineScore': {'headers': LINE_SCORE_HEADERS, 'data': line_score},
+        'TeamLeaders': {'headers': TEAM_LEADERS_HEADERS,
+                        'data': team_leaders},
+    }
+
+
+class FakeScoreboardV2:
+    """Stand-in for ScoreboardV2 endpoint that serves prepared data sets
+    by game date and counts requests"""
+
+    data_sets_by_date = {}
+    requests = []
+
+    def __init__(self, game_date: str, **kwargs):
+        self.requests.append(game_date)
+        data_sets = self.data_sets_by_date.get(game_date) or \
+            make_data_sets(game_date, [])
+        self.game_header = Endpoint.DataSet(data=data_sets['GameHeader'])
+        self.line_score = Endpoint.DataSet(data=data_sets['LineScore'])
+        self.team_leaders = Endpoint.DataSet(data=data_sets['TeamLeaders'])
+
+    @classmethod
+    def reset(cls, data_sets_by_date: dict):
+        cls.data_sets_by_date = data_sets_by_date
+        cls.requests = []
+
+
+def load_recorded_scoreboard(games_date: str) -> ScoreboardV2:
+    """ScoreboardV2 endpoint loaded from recorded response
+    (tests/fixtures/scoreboardv2_<games_date>.json) without a request"""
+    path = os.path.join(FIXTURES_DIR, f'scoreboardv2_{games_date}.json')
+    with open(path, encoding='utf8') as file:
+        response = file.read()
+
+    scoreboard = ScoreboardV2(game_date=games_date, get_request=False)
+    scoreboard.nba_response = NBAStatsResponse(
+        response=response, status_code=200,
+        url=f'https://stats.nba.com/stats/scoreboardv2?GameDate={games_date}'
+    )
+    scoreboard.load_response()
+    return scoreboard
+
+
+class RecordedScoreboardV2:
+    """Stand-in for ScoreboardV2 endpoint that serves recorded responses
+    by game date and counts requests"""
+
+    requests = []
+
+    def __new__(cls, game_date: str, **kwargs):
+        cls.requests.append(game_date)
+        return load_recorded_scoreboard(game_date)
@@ -0,0 +1,259 @@
+"""Tests for Adviser class from adviser/adviser.py"""
+import asyncio
+import threading
+import time
+from datetime import timedelta
+
+import pytest
+from freezegun import freeze_time
+
+from nbadviser.adviser import adviser as adviser_module
+from nbadviser.adviser import providers as providers_module
+from nbadviser.adviser import strategies as strategies_module
+from nbadviser.adviser.adviser import Adviser
+from nbadviser.adviser.strategies import strategies, StrategyBaseABC
+from nbadviser.adviser.utils import Recommendation
+from tests.helpers import FakeScoreboardV2, make_data_sets
+
+GAMES_DATE = '2022-01-12'
+
+
+@pytest.fixture
+def fake_scoreboard(monkeypatch, global_provider):
+    """Replace ScoreboardV2 endpoint with fake one"""
+    FakeScoreboardV2.reset({
+        GAMES_DATE: make_data_sets(GAMES_DATE, [(3, 100, 102, 40),
+                                                (3, 90, 120, 20)])
+    })
+    monkeypatch.setattr(providers_module, 'ScoreboardV2', FakeScoreboardV2)
+    return FakeScoreboardV2
+
+
+def test_scoreboard_fetched_once_per_request(fake_scoreboard):
+    """All registered strategies share one scoreboard request"""
+    adviser = Adviser(registered_strategies=strategies)
+
+    recommendations, errors = adviser.get_recommendations(
+        games_date=GAMES_DATE
+    )
+
+    assert not errors
+    assert fake_scoreboard.requests == [GAMES_DATE]
+    assert GAMES_DATE in recommendations.raw_data
+    assert 'Player' in recommendations.to_html()
+
+
+def test_live_games_reuse_fetched_scoreboard(fake_scoreboard, monkeypatch):
+    """Live games check reuses scoreboard of the current game day"""
+    monkeypatch.setattr(adviser_module, 'get_date_etc_str',
+                        lambda: GAMES_DATE)
+    monkeypatch.setattr(strategies_module, 'get_date_etc_str',
+                        lambda: GAMES_DATE)
+    adviser = Adviser(registered_strategies=strategies)
+
+    recommendations, _ = adviser.get_recommendations()
+    live_games = adviser.get_live_games_or_none(
+        raw_data=recommendations.raw_data
+    )
+
+    assert live_games is None  # no live games in prepared data
+    assert fake_scoreboard.requests == [GAMES_DATE]
+
+
+def test_finished_scoreboard_is_cached(fake_scoreboard):
+    """Scoreboard of a finished past game day is requested only once"""
+    adviser = Adviser(registered_strategies=strategies)
+    adviser.set_parameters(games_date=GAMES_DATE)
+
+    adviser.get_recommendations()
+    adviser.get_recommendations()
+
+    assert fake_scoreboard.requests == [GAMES_DATE]
+    assert providers_module.scoreboard_provider.cache.stats()['pinned_size'] == 1
+
+
+class SleepingStrategy(StrategyBaseABC):
+    """Strategy that sleeps given number of seconds"""
+    title = 'Sleeping'
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    def execute(self, **kwargs) -> Recommendation:
+        time.sleep(self.seconds)
+        return Recommendation(title=f'{self.title} {self.seconds}')
+
+    def get_raw_data(self, **kwargs):
+        pass
+
+
+class FailingStrategy(SleepingStrategy):
+    """Strategy that always fails"""
+
+    def execute(self, **kwargs) -> Recommendation:
+        raise ValueError('Strategy failed')
+
+
+def test_concurrent_execution_keeps_order_and_errors():
+    """Recommendations keep registration order, errors and timeouts
+    are collected per strategy"""
+    registered = {'Slow': SleepingStrategy(0.2),
+                  'Fast': SleepingStrategy(0),
+                  'Failing': FailingStrategy(0),
+                  'TooSlow': SleepingStrategy(2)}
+    adviser = Adviser(registered_strategies=registered, max_workers=4,
+                      strategy_timeout=0.5)
+
+    start_time = time.monotonic()
+    recommendations, errors = adviser.get_recommendations()
+
+    assert time.monotonic() - start_time < 1.5
+    assert [recommendation.title for recommendation
+            in recommendations._contents] == ['Sleeping 0.2', 'Sleeping 0']
+    assert [error.label for error in errors] == ['FailingStrategy',
+                                                 'SleepingStrategy']
+    assert isinstance(errors[0].exception, ValueError)
+
+
+def test_call_parameters_do_not_change_defaults(fake_scoreboard):
+    """Parameters of a call are used only in that call"""
+    adviser = Adviser(registered_strategies=strategies)
+    adviser.set_parameters(games_date='2022-01-11')
+
+    recommendations, _ = adviser.get_recommendations(games_date=GAMES_DATE)
+    adviser.get_recommendations()
+
+    assert fake_scoreboard.requests == [GAMES_DATE, '2022-01-11']
+    assert GAMES_DATE in recommendations.to_html()
+    assert adviser.del_parameter('games_date') == '2022-01-11'
+
+
+def test_async_execution_keeps_order_and_errors():
+    """Awaited strategies give the same result as concurrent execution"""
+    registered = {'Slow': SleepingStrategy(0.2),
+                  'Fast': SleepingStrategy(0),
+                  'Failing': FailingStrategy(0),
+                  'TooSlow': SleepingStrategy(2)}
+    adviser = Adviser(registered_strategies=registered, max_workers=4,
+                      strategy_timeout=0.5)
+
+    recommendations, errors = asyncio.run(adviser.get_recommendations_async())
+
+    assert [recommendation.title for recommendation
+            in recommendations._contents] == ['Sleeping 0.2', 'Sleeping 0']
+    assert [error.label for error in errors] == ['FailingStrategy',
+                                                 'SleepingStrategy']
+    assert 'ValueError' in errors[0].traceback
+
+
+def test_waiting_for_free_thread_is_not_a_timeout():
+    """Timeout of a strategy is counted from the start of its execution,
+    not from the time it was queued behind other strategies"""
+    registered = {'First': SleepingStrategy(0.2),
+                  'Second': SleepingStrategy(0.2)}
+    adviser = Adviser(registered_strategies=registered, max_workers=1,
+                      strategy_timeout=0.3)
+
+    _, errors = adviser.get_recommendations()
+    _, async_errors = asyncio.run(adviser.get_recommendations_async())
+
+    assert errors == []
+    assert async_errors == []
+
+
+def test_iter_recommendations_keeps_order_of_dates(fake_scoreboard):
+    """Results for many dates are yielded in order of dates"""
+    adviser = Adviser(registered_strategies=strategies)
+    games_dates = ['2022-01-10', '2022-01-11', GAMES_DATE]
+
+    results = list(adviser.iter_recommendations(games_dates,
+                                                 max_concurrency=2))
+
+    assert [games_date for games_date, _ in results] == games_dates
+    assert [recommendations.has_games() for _, (recommendations, _)
+            in results] == [False, False, True]
+    assert sorted(fake_scoreboard.requests) == games_dates
+
+
+class ThreadRecordingStrategy(SleepingStrategy):
+    """Strategy that records names of threads executing it"""
+
+    def __init__(self):
+        super().__init__(0)
+        self.threads = []
+
+    def execute(self, **kwargs) -> Recommendation:
+        self.threads.append(threading.current_thread().name)
+        return super().execute(**kwargs)
+
+
+def test_periods_do_not_take_strategies_pool():
+    """Strategies of games dates of a period are executed by threads of
+    the period, the pool of strategies is left to other requests"""
+    strategy = ThreadRecordingStrategy()
+    adviser = Adviser(registered_strategies={'Recording': strategy},
+                      max_workers=1)
+
+    list(adviser.iter_recommendations(['2022-01-10', '2022-01-11'],
+                                      max_concurrency=2))
+    adviser.get_recommendations(games_date='2022-01-12')
+
+    assert [name.split('_')[0] for name in strategy.threads] == \
+        ['games-date', 'games-date', 'strategy']
+
+
+def test_last_recommendations_are_revalidated(fake_scoreboard,
+                                              monkeypatch):
+    """The last recommendations are served with their age and computed
+    again in background when stale, recommendations with errors are not
+    kept"""
+    # Games date is the current game day, so its scoreboard can change
+    monkeypatch.setattr(providers_module, 'get_date_etc_str',
+                        lambda: GAMES_DATE)
+    adviser = Adviser(registered_strategies=strategies, stale_after=0.1)
+    assert adviser.get_last_recommendations(games_date=GAMES_DATE) is None
+
+    recommendations, _ = adviser.get_recommendations(games_date=GAMES_DATE)
+    (last, _), age = adviser.get_last_recommendations(games_date=GAMES_DATE)
+    assert last is recommendations
+    assert age < 0.1
+    assert not adviser.revalidate(games_date=GAMES_DATE)
+
+    time.sleep(0.1)
+    refreshed = []
+    assert adviser.revalidate(on_refresh=refreshed.append,
+                              games_date=GAMES_DATE)
+    deadline = time.monotonic() + 5
+    while not refreshed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    (new_recommendations, errors), = refreshed
+    assert not errors
+    assert new_recommendations.to_html() == recommendations.to_html()
+    (last, _), age = adviser.get_last_recommendations(games_date=GAMES_DATE)
+    assert last is new_recommendations
+
+    failing = Adviser(registered_strategies={'Failing': FailingStrategy(0)},
+                      stale_after=0.1)
+    failing.get_recommendations(games_date=GAMES_DATE)
+    assert failing.get_last_recommendations(games_date=GAMES_DATE) is None
+
+
+def test_finished_recommendations_are_never_stale(fake_scoreboard):
+    """Recommendations for a finished games date are served without age
+    and not computed again however old they are"""
+    adviser = Adviser(registered_strategies=strategies, stale_after=60,
+                      stale_max_age=3600)
+
+    with freeze_time('2022-03-01 12:00:00') as frozen_time:
+        recommendations, _ = adviser.get_recommendations(
+            games_date=GAMES_DATE
+        )
+        frozen_time.tick(timedelta(hours=2))
+
+        (last, _), age = adviser.get_last_recommendations(
+            games_date=GAMES_DATE
+        )
+        assert last is recommendations
+        assert age == 0
+        assert not adviser.revalidate(games_date=GAMES_DATE)
+    assert fake_scoreboard.requests == [GAMES_DATE]
@@ -0,0 +1,156 @@
+"""Tests for backfill of the local index of games (adviser/backfill.py,
+adviser/index.py) using recorded ScoreboardV2 responses"""
+from datetime import date
+
+import pytest
+
+import nbadviser.__main__ as main_module
+from nbadviser.adviser import providers as providers_module
+from nbadviser.adviser import strategies as strategies_module
+from nbadviser.adviser.adviser import Adviser
+from nbadviser.adviser.backfill import backfill
+from nbadviser.adviser.cache import DataCache
+from nbadviser.adviser.index import GameIndex
+from nbadviser.adviser.limiter import PriorityRateLimiter
+from nbadviser.adviser.providers import ScoreboardProvider
+from nbadviser.adviser.strategies import strategies
+from tests.helpers import RecordedScoreboardV2, RECORDED_GAMES_DATES, \
+    load_recorded_scoreboard
+
+
+@pytest.fixture
+def recorded_scoreboard(monkeypatch, global_provider):
+    """Serve recorded responses instead of requests to ScoreboardV2"""
+    RecordedScoreboardV2.requests = []
+    monkeypatch.setattr(providers_module, 'ScoreboardV2',
+                        RecordedScoreboardV2)
+    monkeypatch.setattr(providers_module, 'get_date_etc_str',
+                        lambda: '2022-01-20')
+    return RecordedScoreboardV2
+
+
+def make_provider() -> ScoreboardProvider:
+    return ScoreboardProvider(
+        cache=DataCache(maxsize=2, ttl=60, pinned_maxsize=8)
+    )
+
+
+def test_backfill_is_resumable(recorded_scoreboard, tmp_path):
+    """Indexed games dates are not requested again"""
+    counters = backfill(RECORDED_GAMES_DATES[:2], provider=make_provider(),
+                        index=GameIndex(directory=str(tmp_path)),
+                        concurrency=2)
+    assert counters == dict(indexed=2, skipped=0, not_finished=0, failed=0)
+
+    # Interrupted backfill is run again with a new index instance
+    counters = backfill(RECORDED_GAMES_DATES, provider=make_provider(),
+                        index=GameIndex(directory=str(tmp_path)),
+                        concurrency=2)
+    assert counters == dict(indexed=1, skipped=2, not_finished=0, failed=0)
+    assert sorted(recorded_scoreboard.requests) == list(RECORDED_GAMES_DATES)
+
+
+def test_not_finished_date_is_not_indexed(recorded_scoreboard, tmp_path,
+                                          monkeypatch):
+    """Games date that is not finished yet is left for the next run"""
+    monkeypatch.setattr(providers_module, 'get_date_etc_str',
+                        lambda: '2022-01-12')
+    index = GameIndex(directory=str(tmp_path))
+
+    counters = backfill(RECORDED_GAMES_DATES, provider=make_provider(),
+                        index=index, concurrency=1)
+
+    assert counters == dict(indexed=2, skipped=0, not_finished=1, failed=0)
+    assert not index.has_games_date('2022-01-12')
+
+
+@pytest.mark.parametrize('games_date', RECORDED_GAMES_DATES)
+def test_index_answers_as_scoreboard(recorded_scoreboard, tmp_path,
+                                     monkeypatch, games_date):
+    """Strategies give the same recommendations from index as from
+    scoreboard data"""
+    scoreboard = providers_module.ScoreboardData.from_endpoint(
+        load_recorded_scoreboard(games_date)
+    )
+    index = GameIndex(directory=str(tmp_path))
+    index.add_games_date(games_date, scoreboard.table)
+
+    expected = {name: strategy.execute(raw_data=scoreboard,
+                                       games_date=games_date).to_html()
+                for name, strategy in strategies.items()}
+
+    monkeypatch.setattr(strategies_module, 'game_index', index)
+    recommendations, errors = Adviser(
+        registered_strategies=strategies
+    ).get_recommendations(games_date=games_date)
+
+    assert not errors
+    assert recommendations.to_html() == \
+        f'<i>Игровой день: {games_date}</i>\n' + ''.join(expected.values())
+    assert recorded_scoreboard.requests == []
+
+
+def test_best_of_period_from_index_as_from_scoreboards(
+        recorded_scoreboard, tmp_path, monkeypatch):
+    """Best games of a period are the same whether ranked from
+    recommendations of every games date or queried from the index"""
+    adviser = Adviser(registered_strategies=strategies)
+    first_date, last_date = date(2022, 1, 10), date(2022, 1, 12)
+    progress = []
+    monkeypatch.setattr(strategies_module, 'game_index', None)
+    expected, errors = adviser.get_best_of_period(
+        first_date, last_date, top_games=3, max_concurrency=2,
+        on_progress=lambda number, total: progress.append((number, total))
+    )
+    assert not errors
+    assert progress == [(1, 3), (2, 3), (3, 3)]
+    assert all(recommendation.games for recommendation in expected)
+
+    index = GameIndex(directory=str(tmp_path))
+    backfill(RECORDED_GAMES_DATES, provider=make_provider(), index=index,
+             concurrency=1)
+    recorded_scoreboard.requests = []
+    monkeypatch.setattr(strategies_module, 'game_index', index)
+    recommendations, errors = adviser.get_best_of_period(
+        first_date, last_date, top_games=3, max_concurrency=2
+    )
+
+    assert not errors
+    assert recommendations.to_html() == expected.to_html()
+    assert recommendations.to_html().startswith(
+        '<i>Период: 2022-01-10 - 2022-01-12</i>\n'
+    )
+    assert recorded_scoreboard.requests == []
+
+
+def test_cli_backfill_of_season(tmp_path, monkeypatch):
+    """Backfill command requests season dates with rate limited by
+    limiter of provider"""
+    provider = providers_module.scoreboard_provider
+    monkeypatch.setattr(provider, 'limiter', None)
+    monkeypatch.setattr(provider, 'limiter_max_wait', 10)
+    # Log files must not be touched by tests
+    logging_calls = []
+    monkeypatch.setattr(main_module.config, 'configure_logging',
+                        lambda *args: logging_calls.append(args))
+    calls = []
+    monkeypatch.setattr(main_module, 'backfill',
+                        lambda games_dates, **kwargs:
+                        calls.append((list(games_dates), kwargs)))
+    monkeypatch.setattr(main_module, 'iter_games_dates',
+                        lambda first, last: iter([str(first), str(last)]))
+
+    main_module.main(['backfill', '--season', '2021-22',
+                      '--index-dir', str(tmp_path), '--rate', '5'])
+
+    (games_dates, kwargs), = calls
+    assert games_dates == [str(date(2021, 10, 1)), str(date(2022, 6, 30))]
+    assert kwargs['index'].path.startswith(str(tmp_path))
+    assert kwargs['provider'] is provider
+    assert isinstance(provider.limiter, PriorityRateLimiter)
+    assert provider.limiter_max_wait is None
+    assert logging_calls == []
+
+    with pytest.raises(SystemExit):
+        main_module.main(['backfill', '--season', '2021-23',
+                          '--index-dir', str(tmp_path)])
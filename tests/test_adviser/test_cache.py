@@ -0,0 +1,65 @@
+"""Tests for DataCache from adviser/cache.py"""
+import time
+
+from nbadviser.adviser.cache import DataCache
+from nbadviser.metrics import metrics
+
+
+def test_cache_counters():
+    """Check hits and misses counting"""
+    cache = DataCache(maxsize=2, ttl=60, pinned_maxsize=2)
+    assert cache.get('2022-01-12') is None
+
+    cache.set('2022-01-12', 'scoreboard')
+    assert cache.get('2022-01-12') == 'scoreboard'
+
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['recent_size'] == 1
+
+
+def test_cache_counters_in_metrics():
+    """Hits, misses and evictions are counted in metrics by result"""
+    cache = DataCache(maxsize=1, ttl=60, pinned_maxsize=1,
+                      metric='test_cache_total')
+    cache.get('2022-01-11')
+    cache.set('2022-01-11', 'live')
+    cache.get('2022-01-11')
+    cache.set('2022-01-12', 'live')
+
+    assert [metrics.get_counter('test_cache_total', result=result)
+            for result in ('hit', 'miss', 'eviction')] == [1, 1, 1]
+
+
+def test_cache_eviction():
+    """Items are evicted when the cache is full, pinned items are kept
+    separately from recent ones"""
+    cache = DataCache(maxsize=1, ttl=60, pinned_maxsize=1)
+    cache.set('2022-01-10', 'final', pinned=True)
+    cache.set('2022-01-11', 'live')
+    cache.set('2022-01-12', 'live')
+
+    assert cache.get('2022-01-10') == 'final'
+    assert cache.get('2022-01-11') is None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_cache_pinning_replaces_recent_item():
+    """Item pinned after games are finished is not kept twice"""
+    cache = DataCache(maxsize=2, ttl=60, pinned_maxsize=2)
+    cache.set('2022-01-12', 'live')
+    cache.set('2022-01-12', 'final', pinned=True)
+
+    stats = cache.stats()
+    assert cache.get('2022-01-12') == 'final'
+    assert stats['recent_size'] == 0
+    assert stats['pinned_size'] == 1
+
+
+def test_cache_expiration():
+    """Recent items expire after ttl"""
+    cache = DataCache(maxsize=2, ttl=0, pinned_maxsize=2)
+    cache.set('2022-01-12', 'live')
+    time.sleep(0.01)
+    assert cache.get('2022-01-12') is None
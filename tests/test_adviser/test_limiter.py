@@ -0,0 +1,79 @@
+"""Tests for rate limiter of requests (adviser/limiter.py)"""
+import threading
+import time
+
+import pytest
+
+from nbadviser.adviser import providers as providers_module
+from nbadviser.adviser.cache import DataCache
+from nbadviser.adviser.limiter import PriorityRateLimiter, Priority, \
+    RateLimitTimeout
+from nbadviser.adviser.providers import ScoreboardProvider
+from nbadviser.metrics import metrics
+from tests.helpers import FakeScoreboardV2
+
+
+def test_higher_priority_goes_first():
+    """Waiting request of higher priority gets the next token first"""
+    limiter = PriorityRateLimiter(rate=20, burst=1)
+    limiter.acquire(Priority.INTERACTIVE)  # Bucket is empty now
+    order = []
+
+    def acquire(priority):
+        limiter.acquire(priority)
+        order.append(priority)
+
+    threads = []
+    for priority in (Priority.HISTORICAL, Priority.BACKGROUND,
+                     Priority.INTERACTIVE):
+        thread = threading.Thread(target=acquire, args=(priority,))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.005)  # Enqueued in this order
+    for thread in threads:
+        thread.join()
+
+    assert order == [Priority.INTERACTIVE, Priority.BACKGROUND,
+                     Priority.HISTORICAL]
+
+
+def test_max_wait():
+    """Request not allowed during max_wait fails and leaves queue"""
+    limiter = PriorityRateLimiter(rate=0.1, burst=1)
+    assert limiter.acquire(Priority.HISTORICAL) < 0.01
+
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire(Priority.HISTORICAL, max_wait=0.05)
+    assert metrics.get_gauge('limiter_queue_depth',
+                             priority='historical') == 0
+    assert metrics.get_histogram('limiter_wait_seconds',
+                                 priority='historical').count >= 1
+
+
+class RecordingLimiter:
+    def __init__(self):
+        self.priorities = []
+
+    def acquire(self, priority, max_wait=None):
+        self.priorities.append(priority)
+        return 0.0
+
+
+def test_priority_of_provider_requests(monkeypatch):
+    """Current game day is interactive, past dates are historical"""
+    FakeScoreboardV2.reset({})
+    monkeypatch.setattr(providers_module, 'ScoreboardV2', FakeScoreboardV2)
+    monkeypatch.setattr(providers_module, 'get_date_etc_str',
+                        lambda: '2022-01-12')
+    limiter = RecordingLimiter()
+    provider = ScoreboardProvider(
+        cache=DataCache(maxsize=2, ttl=60, pinned_maxsize=2),
+        limiter=limiter
+    )
+
+    provider.get('2022-01-12')
+    provider.get('2022-01-05')
+    provider.refresh('2022-01-12', priority=Priority.BACKGROUND)
+
+    assert limiter.priorities == [Priority.INTERACTIVE, Priority.HISTORICAL,
+                                  Priority.BACKGROUND]
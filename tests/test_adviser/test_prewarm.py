@@ -0,0 +1,89 @@
+"""Tests for background refreshing from adviser/prewarm.py"""
+
+import pytest
+
+from nbadviser.adviser import prewarm as prewarm_module
+from nbadviser.adviser import providers as providers_module
+from nbadviser.adviser.adviser import Adviser
+from nbadviser.adviser.cache import DataCache
+from nbadviser.adviser.prewarm import Prewarmer
+from nbadviser.adviser.providers import ScoreboardProvider
+from nbadviser.adviser.strategies import strategies
+from tests.helpers import FakeScoreboardV2, make_data_sets
+
+GAMES_DATE = '2022-01-12'
+
+
+@pytest.fixture
+def prewarmer(monkeypatch, global_provider):
+    """Prewarmer with fake ScoreboardV2 endpoint and own provider
+    (strategies are given scoreboard fetched by it)"""
+    monkeypatch.setattr(providers_module, 'ScoreboardV2', FakeScoreboardV2)
+    # Global provider is not expected to be used, but it must not serve
+    # scoreboards cached by other tests or make real requests
+    monkeypatch.setattr(prewarm_module, 'get_date_etc_str',
+                        lambda: GAMES_DATE)
+    provider = ScoreboardProvider(
+        cache=DataCache(maxsize=2, ttl=60, pinned_maxsize=2)
+    )
+    return Prewarmer(adviser=Adviser(registered_strategies=strategies),
+                     provider=provider, live_interval=30, idle_interval=600)
+
+
+def test_refresh_interval_depends_on_live_games(prewarmer):
+    """Refreshing is frequent only while games are live"""
+    FakeScoreboardV2.reset({
+        GAMES_DATE: make_data_sets(GAMES_DATE, [(2, 50, 52, 20)])
+    })
+    prewarmer.refresh()
+    assert prewarmer._interval == 30
+    # Strategies use scoreboard refreshed by provider of prewarmer
+    assert FakeScoreboardV2.requests == [GAMES_DATE]
+
+    FakeScoreboardV2.reset({
+        GAMES_DATE: make_data_sets(GAMES_DATE, [(3, 100, 102, 20)])
+    })
+    prewarmer.refresh()
+    assert prewarmer._interval == 600
+    assert FakeScoreboardV2.requests == [GAMES_DATE]
+
+
+def test_precomputed_recommendations_are_served(prewarmer):
+    """User requests of the refreshed date do not execute strategies"""
+    FakeScoreboardV2.reset({
+        GAMES_DATE: make_data_sets(GAMES_DATE, [(3, 100, 102, 40)])
+    })
+    prewarmer.refresh()
+    precomputed, _ = prewarmer._adviser.get_recommendations(
+        games_date=GAMES_DATE
+    )
+    FakeScoreboardV2.reset({})
+
+    recommendations, errors = prewarmer._adviser.get_recommendations(
+        games_date=GAMES_DATE
+    )
+
+    assert recommendations is precomputed
+    assert not errors
+    assert FakeScoreboardV2.requests == []
+
+
+@pytest.mark.parametrize('status, max_age', [(1, 30), (2, 30), (3, 1200)])
+def test_not_finished_day_is_precomputed_for_live_interval(
+        prewarmer, monkeypatch, status, max_age):
+    """Games can go live before the next rare refresh, so recommendations
+    of not finished day are not served longer than live interval"""
+    FakeScoreboardV2.reset({
+        GAMES_DATE: make_data_sets(GAMES_DATE, [(status, 100, 102, 20)])
+    })
+    max_ages = []
+    precompute = prewarmer._adviser.precompute
+    monkeypatch.setattr(
+        prewarmer._adviser, 'precompute',
+        lambda **kwargs: max_ages.append(kwargs['max_age'])
+        or precompute(**kwargs)
+    )
+
+    prewarmer.refresh()
+
+    assert max_ages == [max_age]
@@ -0,0 +1,93 @@
+"""Tests for data providers from adviser/providers.py"""
+
+from nbadviser.adviser import providers as providers_module
+from nbadviser.adviser.cache import DataCache
+from nbadviser.adviser.providers import ScoreboardProvider
+from nbadviser.adviser.store import ScoreboardStore
+from tests.helpers import FakeScoreboardV2, make_data_sets
+
+FINISHED_DATE = '2022-01-12'
+LIVE_DATE = '2022-01-13'
+
+
+def make_provider(directory) -> ScoreboardProvider:
+    return ScoreboardProvider(
+        cache=DataCache(maxsize=2, ttl=60, pinned_maxsize=2),
+        store=ScoreboardStore(directory=str(directory))
+    )
+
+
+def test_finished_date_served_from_store(tmp_path, monkeypatch):
+    """Finished games date is requested once and then read from store
+    even after restart (new provider instance)"""
+    FakeScoreboardV2.reset({
+        FINISHED_DATE: make_data_sets(FINISHED_DATE, [(3, 100, 102, 40)]),
+        LIVE_DATE: make_data_sets(LIVE_DATE, [(2, 50, 52, 20)]),
+    })
+    monkeypatch.setattr(providers_module, 'ScoreboardV2', FakeScoreboardV2)
+    monkeypatch.setattr(providers_module, 'get_date_etc_str',
+                        lambda: LIVE_DATE)
+
+    provider = make_provider(tmp_path)
+    provider.get(FINISHED_DATE)
+    provider.get(LIVE_DATE)
+
+    restarted_provider = make_provider(tmp_path)
+    assert restarted_provider.warm_up() == 1
+    scoreboard = restarted_provider.get(FINISHED_DATE)
+    restarted_provider.get(LIVE_DATE)
+
+    assert FakeScoreboardV2.requests == [FINISHED_DATE, LIVE_DATE, LIVE_DATE]
+    assert scoreboard.game_header.get_dict() == \
+        FakeScoreboardV2.data_sets_by_date[FINISHED_DATE]['GameHeader']
+
+
+def test_store_keeps_unfinished_dates_separately(tmp_path):
+    """Not finished games dates are stored but not served by default"""
+    store = ScoreboardStore(directory=str(tmp_path))
+    data_sets = make_data_sets(LIVE_DATE, [(2, 50, 52, 20)])
+    store.put(LIVE_DATE, data_sets, finished=False)
+
+    assert store.get(LIVE_DATE) is None
+    assert store.get(LIVE_DATE, finished_only=False) == data_sets
+    assert list(store.iter_finished(limit=10)) == []
+
+
+def test_shared_store_fetches_live_date_once(tmp_path, monkeypatch):
+    """Providers of worker processes sharing store take not finished
+    games date fetched by another one from store while it is fresh"""
+    FakeScoreboardV2.reset({
+        LIVE_DATE: make_data_sets(LIVE_DATE, [(2, 50, 52, 20)]),
+    })
+    monkeypatch.setattr(providers_module, 'ScoreboardV2', FakeScoreboardV2)
+    monkeypatch.setattr(providers_module, 'get_date_etc_str',
+                        lambda: LIVE_DATE)
+
+    first, second = make_provider(tmp_path), make_provider(tmp_path)
+    first.shared_max_age = second.shared_max_age = 60
+    first.get(LIVE_DATE)
+    scoreboard = second.get(LIVE_DATE)
+
+    assert FakeScoreboardV2.requests == [LIVE_DATE]
+    assert scoreboard.game_header.get_dict() == \
+        FakeScoreboardV2.data_sets_by_date[LIVE_DATE]['GameHeader']
+
+    second.shared_max_age = 0
+    second.cache.clear()
+    second.get(LIVE_DATE)
+    assert FakeScoreboardV2.requests == [LIVE_DATE, LIVE_DATE]
+
+
+def test_store_leases(tmp_path):
+    """Lease is held by one owner until it is released or expired"""
+    store = ScoreboardStore(directory=str(tmp_path))
+    other_store = ScoreboardStore(directory=str(tmp_path))
+
+    assert store.acquire_lease(LIVE_DATE, '1', ttl=30)
+    assert store.acquire_lease(LIVE_DATE, '1', ttl=30)
+    assert not other_store.acquire_lease(LIVE_DATE, '2', ttl=30)
+
+    store.release_lease(LIVE_DATE, '1')
+    assert other_store.acquire_lease(LIVE_DATE, '2', ttl=-1)
+    # Expired lease is taken by another owner
+    assert store.acquire_lease(LIVE_DATE, '1', ttl=30)
@@ -0,0 +1,52 @@
+"""Tests for SingleFlight from adviser/singleflight.py"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from nbadviser.adviser.singleflight import SingleFlight
+from nbadviser.metrics import metrics
+
+
+def test_concurrent_calls_are_coalesced():
+    """Function is called once for concurrent calls with the same key"""
+    single_flight = SingleFlight(metric='test_coalesced_total')
+    calls = []
+
+    def fetch():
+        calls.append(threading.get_ident())
+        time.sleep(0.2)
+        return 'scoreboard'
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        futures = [executor.submit(single_flight.do, '2022-01-12', fetch)
+                   for _ in range(5)]
+        results = [future.result() for future in futures]
+
+    assert results == ['scoreboard'] * 5
+    assert len(calls) == 1
+    assert single_flight.coalesced == 4
+    assert metrics.get_counter('test_coalesced_total') == 4
+
+
+def test_exception_is_shared_and_key_released():
+    """Waiting callers get exception of the call, next call is executed"""
+    single_flight = SingleFlight()
+    started = threading.Event()
+
+    def failing_fetch():
+        started.set()
+        time.sleep(0.2)
+        raise ConnectionError('NBA API is unavailable')
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(single_flight.do, 'key', failing_fetch)
+        started.wait()
+        follower = executor.submit(single_flight.do, 'key', failing_fetch)
+        for future in (leader, follower):
+            with pytest.raises(ConnectionError):
+                future.result()
+
+    assert single_flight.coalesced == 1
+    assert single_flight.do('key', lambda: 'ok') == 'ok'
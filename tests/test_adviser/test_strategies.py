@@ -0,0 +1,71 @@
+"""Tests for strategies from adviser/strategies.py"""
+
+from nbadviser.adviser.providers import ScoreboardData
+from nbadviser.adviser.strategies import CloseGameStrategy, \
+    TopIndividualPerformanceStrategy, LiveGamesStrategy
+from tests.helpers import make_data_sets
+
+GAMES_DATE = '2022-01-12'
+
+
+def make_scoreboard(games: list) -> ScoreboardData:
+    return ScoreboardData(make_data_sets(GAMES_DATE, games))
+
+
+def test_close_game_strategy():
+    """Two closest finished games with gap not more than allowed"""
+    scoreboard = make_scoreboard([(3, 100, 110, 20),  # gap 10
+                                  (3, 100, 103, 20),  # gap 3
+                                  (2, 100, 100, 20),  # live
+                                  (3, 99, 100, 20),  # gap 1
+                                  (3, 95, 100, 20)])  # gap 5
+
+    recommendation = CloseGameStrategy().execute(raw_data=scoreboard)
+
+    assert [game.score_gap for game in recommendation.games] == [1, 3]
+    assert recommendation.games[0].teams.home.score == 100
+
+
+def test_top_individual_performance_strategy():
+    """Games with players scored enough points, games not started yet
+    (no points) are skipped"""
+    scoreboard = make_scoreboard([(3, 100, 110, 45),
+                                  (3, 100, 103, 20),
+                                  (1, None, None, None)])
+
+    recommendation = TopIndividualPerformanceStrategy().execute(
+        raw_data=scoreboard
+    )
+
+    assert len(recommendation.games) == 1
+    assert recommendation.games[0].top_performers == \
+        ['Player1610612702 <b>45</b> очк.']
+
+
+def test_live_games_strategy():
+    """Only live games with names and scores"""
+    scoreboard = make_scoreboard([(3, 100, 110, 45), (2, 50, 52, 20)])
+
+    recommendation = LiveGamesStrategy().execute(raw_data=scoreboard)
+
+    assert len(recommendation.games) == 1
+    assert recommendation.games[0].description == \
+        'City1610612705 Team1610612705 - City1610612704 Team1610612704 ' \
+        '(50-52, 4th Qtr)'
+
+
+def test_games_are_shared_between_strategies():
+    """Read-only games and teams are created once per scoreboard"""
+    scoreboard = make_scoreboard([(3, 100, 101, 45), (2, 50, 52, 20)])
+
+    close_games = CloseGameStrategy().execute(raw_data=scoreboard).games
+    same_close_games = CloseGameStrategy().execute(raw_data=scoreboard).games
+    top_games = TopIndividualPerformanceStrategy().execute(
+        raw_data=scoreboard
+    ).games
+
+    assert close_games[0] is same_close_games[0]
+    assert top_games[0] is not close_games[0]
+    assert top_games[0].teams is close_games[0].teams
+    assert scoreboard.table.get_team(1610612702) is close_games[0].teams.home
+    assert not hasattr(close_games[0], '__dict__')
@@ -0,0 +1,123 @@
+"""Tests for transport of requests to stats API (adviser/transport.py)"""
+import time
+
+import pytest
+import requests
+
+from nbadviser.adviser import providers as providers_module
+from nbadviser.adviser.cache import DataCache
+from nbadviser.adviser.providers import ScoreboardProvider
+from nbadviser.adviser.transport import StatsTransport, CircuitBreaker, \
+    CircuitOpenError, TransportError
+from tests.helpers import FIXTURES_DIR
+
+GAMES_DATE = '2022-01-12'
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, text: str = ''):
+        self.status_code = status_code
+        self.text = text
+        self.url = 'https://stats.nba.com/stats/scoreboardv2'
+
+
+class FakeSession:
+    """Requests session returning prepared responses (or raising prepared
+    exceptions) one by one"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def get(self, url, params, timeout):
+        self.calls.append((url, params, timeout))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def recorded_response() -> FakeResponse:
+    with open(f'{FIXTURES_DIR}/scoreboardv2_{GAMES_DATE}.json',
+              encoding='utf8') as file:
+        return FakeResponse(200, file.read())
+
+
+def make_transport(*responses, failures: int = 2,
+                   reset_timeout: float = 60) -> StatsTransport:
+    transport = StatsTransport(
+        base_url='https://stats.nba.com/stats/', connect_timeout=1,
+        read_timeout=2, retries=1, backoff_base=0, backoff_max=0,
+        pool_size=2, breaker=CircuitBreaker(failure_threshold=failures,
+                                            reset_timeout=reset_timeout)
+    )
+    transport.session = FakeSession(*responses)
+    return transport
+
+
+def test_failed_request_is_retried():
+    """Timeouts and 5xx responses are retried, then request fails"""
+    transport = make_transport(requests.ConnectTimeout(), FakeResponse(503),
+                               recorded_response())
+
+    with pytest.raises(TransportError):
+        transport.get_scoreboard(GAMES_DATE)
+    scoreboard = transport.get_scoreboard(GAMES_DATE)
+
+    assert len(scoreboard.game_header.get_dict()['data']) == 10
+    url, params, timeout = transport.session.calls[0]
+    assert url == 'https://stats.nba.com/stats/scoreboardv2'
+    assert params == sorted(params)
+    assert ('GameDate', GAMES_DATE) in params
+    assert timeout == (1, 2)
+    assert transport.breaker.state == 'closed'
+
+
+def test_not_retried_response():
+    """Client errors (4xx) are not retried"""
+    transport = make_transport(FakeResponse(400, 'Bad request'))
+
+    with pytest.raises(TransportError):
+        transport.get_scoreboard(GAMES_DATE)
+    assert len(transport.session.calls) == 1
+
+
+def test_circuit_breaker():
+    """Breaker opens after failures and closes after a successful probe"""
+    transport = make_transport(*[FakeResponse(500)] * 4,
+                               recorded_response(), reset_timeout=0.05)
+
+    for _ in range(2):
+        with pytest.raises(TransportError):
+            transport.get_scoreboard(GAMES_DATE)
+    assert transport.breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        transport.get_scoreboard(GAMES_DATE)
+    assert len(transport.session.calls) == 4  # Two failures with retries
+
+    time.sleep(0.06)
+    assert transport.breaker.state == 'half-open'
+    transport.get_scoreboard(GAMES_DATE)
+    assert transport.breaker.state == 'closed'
+
+
+def test_stale_scoreboard_served_when_breaker_is_open(monkeypatch):
+    """Last fetched scoreboard is served while requests fail"""
+    monkeypatch.setattr(providers_module, 'get_date_etc_str',
+                        lambda: GAMES_DATE)
+    transport = make_transport(recorded_response(), *[FakeResponse(502)] * 4)
+    provider = ScoreboardProvider(
+        cache=DataCache(maxsize=2, ttl=0.01, pinned_maxsize=2),
+        transport=transport
+    )
+
+    scoreboard = provider.get(GAMES_DATE)
+    time.sleep(0.02)  # Current game day expired in cache
+
+    for _ in range(3):  # Failed requests, then breaker is open
+        assert provider.get(GAMES_DATE) is scoreboard
+    assert transport.breaker.state == 'open'
+    assert len(transport.session.calls) == 5
+
+    with pytest.raises(CircuitOpenError):
+        provider.get('2022-01-11')  # Never fetched, nothing to serve
@@ -2,7 +2,8 @@
 
 from freezegun import freeze_time
 
-from nbadviser.adviser.utils import Team, Teams, get_date_etc_str
+from nbadviser.adviser.utils import Team, Teams, get_date_etc_str, Game, \
+    Recommendation, Recommendations
 
 
 def test_teams_access_by_id():
@@ -26,3 +27,59 @@ def test_get_date_est_str():
         ref = '2022-03-28'
         res = get_date_etc_str()
         assert res == ref
+
+
+class FakeRawData:
+    """Raw data with fingerprint"""
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+
+
+def make_game(game_id: str, visitor_name: str, home_name: str) -> Game:
+    teams = Teams(home=Team(team_id=1, name=home_name),
+                  visitor=Team(team_id=2, name=visitor_name))
+    return Game(game_id=game_id, game_status='Final', game_status_id=3,
+                teams=teams)
+
+
+def test_recommendations_to_html():
+    """Check output format of recommendations"""
+    recommendation = Recommendation(
+        title='Close games', games=[make_game('1', 'Bulls', 'Lakers')]
+    )
+    empty_recommendation = Recommendation(title='Top performance')
+    recommendations = Recommendations(
+        recommendations=[recommendation, empty_recommendation],
+        parameters={'games_date': '2022-01-12'}
+    )
+
+    assert recommendations.to_html() == \
+        '<i>Игровой день: 2022-01-12</i>\n' \
+        '\n<b><u>Close games</u></b>\nBulls - Lakers\n' \
+        '\n<b><u>Top performance</u></b>\nВ данной категории не нашлось игр\n'
+
+
+def test_recommendations_html_is_memoized_by_raw_data():
+    """Rendered HTML is reused until fingerprint of raw data changes"""
+    games = [make_game('1', 'Bulls', 'Lakers')]
+    parameters = {'games_date': '2022-01-13'}
+    raw_data = {'2022-01-13': FakeRawData('first')}
+    first = Recommendations(
+        recommendations=[Recommendation(title='Close games', games=games)],
+        parameters=parameters, raw_data=raw_data
+    )
+    html = first.to_html()
+
+    games[0].teams.home.name = 'Celtics'
+    same_data = Recommendations(
+        recommendations=[Recommendation(title='Close games', games=games)],
+        parameters=parameters, raw_data=raw_data
+    )
+    changed_data = Recommendations(
+        recommendations=[Recommendation(title='Close games', games=games)],
+        parameters=parameters, raw_data={'2022-01-13': FakeRawData('second')}
+    )
+
+    assert same_data.to_html() is html
+    assert 'Celtics' in changed_data.to_html()
@@ -0,0 +1,29 @@
+"""Tests for load test of the bot (benchmarks/load.py)"""
+from benchmarks.load import run_load, compare
+
+
+def test_bot_replies_under_load(tmp_path):
+    """Requests of users are answered by the bot run against stand-ins of
+    Bot API and stats API (logging to the given directory)"""
+    results = run_load(users=3, duration=1.5, warmup=0.5, think_time=0.1,
+                       stats_latency=0.01, days=3, timeout=10,
+                       env={'NBADVISER_LOG_DIR': str(tmp_path)})
+
+    assert results['results']['completed'] > 0
+    assert results['results']['error_rate'] == 0
+    assert results['results']['p50_ms'] <= results['results']['p99_ms']
+    assert results['results']['bot_api_requests']['sendMessage'] > 0
+    assert (tmp_path / 'nbadviser.log').exists()
+
+
+def test_regressions_are_found():
+    """Lower throughput, higher latency and error rate are regressions"""
+    baseline = {'results': {'throughput_rps': 10, 'p95_ms': 100,
+                            'error_rate': 0}}
+    same = {'results': {'throughput_rps': 9, 'p95_ms': 110,
+                        'error_rate': 0}}
+    worse = {'results': {'throughput_rps': 5, 'p95_ms': 200,
+                         'error_rate': 0.1}}
+
+    assert compare(same, baseline, threshold=1.25) == []
+    assert len(compare(worse, baseline, threshold=1.25)) == 3
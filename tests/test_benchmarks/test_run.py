@@ -0,0 +1,47 @@
+"""Tests for offline benchmarks (benchmarks/)"""
+from datetime import date
+
+from nba_api.stats.endpoints.scoreboardv2 import ScoreboardV2
+
+from benchmarks.recorded import make_payloads, replay, MAX_GAMES
+from benchmarks.run import run_benchmarks, compare
+
+
+def test_synthetic_games_dates_are_valid():
+    """Every team plays once a day, responses are parsed by nba_api"""
+    payloads = make_payloads(date(2022, 2, 1), days=2,
+                             games_counts=[MAX_GAMES, 1])
+
+    with replay(payloads) as server:
+        scoreboard = ScoreboardV2(game_date='2022-02-01')
+        one_game_scoreboard = ScoreboardV2(game_date='2022-02-02')
+
+    header = scoreboard.game_header.get_dict()
+    home_ids = [row[header['headers'].index('HOME_TEAM_ID')]
+                for row in header['data']]
+    visitor_ids = [row[header['headers'].index('VISITOR_TEAM_ID')]
+                   for row in header['data']]
+    assert len(set(home_ids + visitor_ids)) == 2 * MAX_GAMES
+    line_score_ids = {row[3] for row
+                      in scoreboard.line_score.get_dict()['data']}
+    assert line_score_ids == set(home_ids + visitor_ids)
+    assert len(one_game_scoreboard.game_header.get_dict()['data']) == 1
+    assert server.requests == 2
+
+
+def test_results_are_comparable():
+    """Results have medians by case and slower ones are reported by compare"""
+    results = run_benchmarks(games_counts=[1, 15], repeat=1, max_workers=0,
+                             max_concurrency=2)
+
+    names = {(item['name'], item['games']) for item in results['results']}
+    assert ('get_recommendations.cold', 15) in names
+    assert ('execute.CloseGameStrategy', 1) in names
+    assert ('to_html.cold', 15) in names
+    assert all(item['median_ms'] > 0 for item in results['results'])
+
+    assert compare(results, results, threshold=1.25) == []
+    baseline = {'results': [dict(item, median_ms=item['median_ms'] / 2)
+                            for item in results['results']]}
+    assert len(compare(results, baseline, threshold=1.25)) == \
+        len(results['results'])
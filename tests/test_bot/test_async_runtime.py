@@ -0,0 +1,31 @@
+"""Tests for asyncio runtime from bot/async_runtime.py"""
+import threading
+import time
+from unittest.mock import Mock
+
+from nbadviser.bot.async_runtime import AsyncRuntime, run_blocking
+
+
+def test_wrapped_handler_runs_on_event_loop():
+    """Callback returns immediately, handler is executed on runtime loop
+    and errors are forwarded to dispatcher"""
+    runtime = AsyncRuntime(max_workers=2)
+    runtime.start()
+    error = ValueError('Handler failed')
+
+    async def handler(update, context):
+        await run_blocking(time.sleep, 0.2)
+        raise error
+
+    finished = threading.Event()
+    context = Mock()
+    context.dispatcher.dispatch_error.side_effect = \
+        lambda *args: finished.set()
+
+    start_time = time.monotonic()
+    runtime.wrap(handler)('update', context)
+    assert time.monotonic() - start_time < 0.1
+
+    assert finished.wait(1)
+    context.dispatcher.dispatch_error.assert_called_with('update', error)
+    runtime.stop()
@@ -0,0 +1,98 @@
+"""Tests for handlers helpers from bot/bot_handlers.py"""
+from concurrent.futures import Future
+from datetime import date
+from unittest.mock import Mock
+
+import pytest
+
+from nbadviser import config
+from nbadviser.adviser.utils import Recommendation, Recommendations
+from nbadviser.bot import bot_handlers as handlers_module
+from nbadviser.bot.bot_handlers import parse_period, parse_season, \
+    reply_with_last_recommendations
+
+
+def make_context(*args) -> Mock:
+    return Mock(args=list(args))
+
+
+def test_parse_period():
+    """Period is parsed only from YYYY-MM-DD..YYYY-MM-DD argument"""
+    assert parse_period(make_context('2022-01-10..2022-01-16')) == \
+        (date(2022, 1, 10), date(2022, 1, 16))
+    assert parse_period(make_context('2022-01-10')) is None
+    assert parse_period(make_context()) is None
+
+
+@pytest.mark.parametrize('value', ['2022-01-10..2022-13-16',
+                                   '2022-01-16..2022-01-10',
+                                   '2022-01-01..2022-03-01'])
+def test_wrong_period_is_rejected(value):
+    """Wrong, reversed and too long periods are errors to reply with"""
+    with pytest.raises(ValueError):
+        parse_period(make_context(value))
+
+
+def test_parse_season():
+    """Season is parsed from season [YYYY-YY] arguments"""
+    assert parse_season(make_context('season', '2021-22')) == \
+        (date(2021, 10, 1), date(2022, 6, 30))
+    assert parse_season(make_context('2022-01-10')) is None
+
+    with pytest.raises(ValueError):
+        parse_season(make_context('season', '2021-23'))
+
+
+class DirectOutbox:
+    """Outbox sending requests right away"""
+
+    @staticmethod
+    def send(chat_id, func, *args, **kwargs) -> Future:
+        future = Future()
+        future.set_result(func(*args, **kwargs))
+        return future
+
+
+@pytest.mark.parametrize('stale', [False, True])
+def test_live_games_are_sent_from_fresh_data(monkeypatch, stale):
+    """Live games are not sent from stale recommendations, but after
+    they are refreshed"""
+    advise = (Recommendations(), [])
+    age = config.RECOMMENDATIONS_STALE_AFTER + 1 if stale else 0
+    adviser = Mock()
+    adviser.get_last_recommendations.return_value = (advise, age)
+    adviser.get_live_games_or_none.return_value = Recommendation(
+        title='Live'
+    )
+    monkeypatch.setattr(handlers_module, 'adviser', adviser)
+    monkeypatch.setattr(handlers_module, 'outbox', DirectOutbox())
+    update = Mock()
+
+    assert reply_with_last_recommendations(update, games_date=None)
+
+    if stale:
+        assert update.message.reply_text.call_count == 1
+        adviser.get_live_games_or_none.assert_not_called()
+        adviser.revalidate.call_args.kwargs['on_refresh'](advise)
+    assert update.message.reply_text.call_count == 2
+    adviser.get_live_games_or_none.assert_called_once()
+
+
+@pytest.mark.parametrize('handler', ['start', 'help_handler', 'subscribe',
+                                     'unsubscribe'])
+def test_replies_are_sent_by_outbox(monkeypatch, handler):
+    """Replies of handlers are sent by outbox, that keeps rate limits"""
+    outbox = Mock()
+    monkeypatch.setattr(handlers_module, 'outbox', outbox)
+    monkeypatch.setattr(handlers_module, 'live_games_notifier', Mock())
+    update = Mock()
+    update.effective_chat.id = 1
+    update.message.text = '/start'
+    update.message.from_user.configure_mock(id=1, username='user',
+                                            full_name='User')
+
+    getattr(handlers_module, handler)(update, Mock())
+
+    update.message.reply_text.assert_not_called()
+    (chat_id, func, *_), _ = outbox.send.call_args
+    assert (chat_id, func) == (1, update.message.reply_text)
@@ -0,0 +1,96 @@
+"""Tests for outbound queue of requests from bot/outbox.py"""
+import threading
+import time
+from unittest.mock import Mock
+
+from telegram.error import RetryAfter
+
+from nbadviser.bot.outbox import ErrorDigest, Outbox
+
+
+def test_requests_to_chat_are_sent_in_order_within_rate():
+    """Requests to one chat are sent one by one not more often than chat
+    rate, other chats are not blocked by them"""
+    outbox = Outbox(global_rate=100, chat_rate=10, chat_burst=1, workers=4)
+    sent = []
+    lock = threading.Lock()
+
+    def send(chat_id, text):
+        with lock:
+            sent.append((chat_id, text, time.monotonic()))
+        return text
+
+    futures = [outbox.send(1, send, 1, f'message {number}')
+               for number in range(3)]
+    other_future = outbox.send(2, send, 2, 'other chat')
+    assert [future.result(timeout=5) for future in futures] == \
+           ['message 0', 'message 1', 'message 2']
+    assert other_future.result(timeout=5) == 'other chat'
+    outbox.stop()
+
+    chat_sent = [item for item in sent if item[0] == 1]
+    assert [item[1] for item in chat_sent] == \
+           ['message 0', 'message 1', 'message 2']
+    # 0.1 s between requests to the same chat (with a margin for timers)
+    assert chat_sent[2][2] - chat_sent[0][2] >= 0.18
+    # The other chat did not wait for the queue of the first one
+    other_time = [item[2] for item in sent if item[0] == 2][0]
+    assert other_time < chat_sent[2][2]
+
+
+def test_request_is_sent_again_after_retry_after():
+    """Request failed with RetryAfter is sent again after the pause"""
+    outbox = Outbox(global_rate=100, chat_rate=100, chat_burst=1, workers=1)
+    func = Mock(side_effect=[RetryAfter(0.1), 'sent'])
+
+    start_time = time.monotonic()
+    assert outbox.send(1, func).result(timeout=5) == 'sent'
+    assert time.monotonic() - start_time >= 0.1
+    assert func.call_count == 2
+    outbox.stop()
+
+
+def test_failed_request_sets_exception():
+    """Other errors of request are set to its future"""
+    outbox = Outbox(global_rate=100, chat_rate=100, chat_burst=1, workers=1)
+    future = outbox.send(1, Mock(side_effect=ValueError('error')))
+    assert isinstance(future.exception(timeout=5), ValueError)
+    outbox.stop()
+
+
+def test_error_digest_joins_notifications():
+    """Notifications are sent as one message per digest, split if they do
+    not fit into one message"""
+    outbox = Outbox(global_rate=100, chat_rate=100, chat_burst=5, workers=1)
+    digest = ErrorDigest(outbox, interval=60, max_length=100)
+    bot = Mock()
+
+    for number in range(3):
+        digest.add(bot, 'control', f'error {number}')
+    digest.flush()
+    digest.flush()  # Nothing to send
+    outbox.stop()
+    bot.send_message.assert_called_once()
+    assert bot.send_message.call_args[1]['text'] == \
+           '<b>Ошибок: 3</b>\n\nerror 0\nerror 1\nerror 2\n'
+
+    bot = Mock()
+    for number in range(3):
+        digest.add(bot, 'control', f'{number}' * 60)
+    digest.flush()
+    outbox.stop()
+    texts = [call[1]['text'] for call in bot.send_message.call_args_list]
+    assert len(texts) == 3
+    assert all(len(text) <= 100 for text in texts)
+    assert ''.join(texts).count('\n') == 5
+
+
+def test_error_digest_is_sent_after_interval():
+    """Digest is flushed by timer without new notifications"""
+    outbox = Outbox(global_rate=100, chat_rate=100, chat_burst=5, workers=1)
+    digest = ErrorDigest(outbox, interval=0.1)
+    bot = Mock()
+    digest.add(bot, 'control', 'error')
+    time.sleep(0.5)
+    outbox.stop()
+    bot.send_message.assert_called_once()
@@ -0,0 +1,63 @@
+"""Tests for streaming of messages from bot/streaming.py"""
+from unittest.mock import Mock
+
+from nbadviser.bot.outbox import Outbox
+from nbadviser.bot.streaming import MessageStream
+
+
+def test_stream_is_split_into_messages():
+    """Text not fitting into one message is continued in the next one,
+    status is shown only until stream is finished"""
+    first_message, second_message = Mock(), Mock()
+    reply = Mock(return_value=second_message)
+    stream = MessageStream(first_message, reply=reply, edit_interval=0,
+                           max_length=20)
+
+    stream.append('day 1\n')
+    stream.set_status('1/2')
+    first_message.edit_text.assert_called_with('day 1\n\n1/2',
+                                               parse_mode='HTML',
+                                               disable_web_page_preview=True)
+
+    stream.append('day 2 long text\n')
+    stream.finish('end')
+
+    assert first_message.edit_text.call_args[0][0] == 'day 1\n'
+    assert second_message.edit_text.call_args[0][0] == 'day 2 long text\nend'
+    reply.assert_called_once_with(MessageStream.placeholder)
+
+
+def test_stream_edits_are_throttled():
+    """Message is not edited more often than edit interval"""
+    message = Mock()
+    stream = MessageStream(message, reply=Mock(), edit_interval=60)
+
+    stream.append('day 1\n')
+    stream.append('day 2\n')
+    stream.finish()
+
+    assert message.edit_text.call_count == 2
+    assert message.edit_text.call_args[0][0] == 'day 1\nday 2\n'
+
+
+def test_stream_requests_are_sent_by_outbox():
+    """Replies and edits of stream are made by send (e.g. outbox)"""
+    first_message, second_message = Mock(), Mock()
+    reply = Mock(return_value=second_message)
+    outbox = Outbox(global_rate=30, chat_rate=100, chat_burst=10, workers=1)
+    sent = []
+
+    def send(func, *args, **kwargs):
+        sent.append(func)
+        return outbox.send(1, func, *args, **kwargs)
+
+    stream = MessageStream(first_message, reply=reply, edit_interval=0,
+                           max_length=20, send=send)
+    stream.append('day 1\n')
+    stream.append('day 2 long text\n')
+    stream.finish()
+    outbox.stop()
+
+    assert sent == [first_message.edit_text, reply,
+                    second_message.edit_text]
+    assert second_message.edit_text.call_args[0][0] == 'day 2 long text\n'
@@ -0,0 +1,79 @@
+"""Tests for live games subscriptions from bot/subscriptions.py"""
+from concurrent.futures import wait
+from unittest.mock import Mock
+
+from telegram.error import Unauthorized
+
+from nbadviser.adviser.utils import GameWithScoreInfo, Team, Teams
+from nbadviser.bot.outbox import Outbox
+from nbadviser.bot.subscriptions import LiveGamesNotifier, SubscribersStore
+
+GAMES_DATE = '2022-01-12'
+
+
+def make_live_game(game_id: str, period: int, visitor_pts: int,
+                   home_pts: int) -> GameWithScoreInfo:
+    teams = Teams(home=Team(team_id=1, name='Lakers', score=home_pts),
+                  visitor=Team(team_id=2, name='Bulls', score=visitor_pts))
+    return GameWithScoreInfo(game_id=game_id, game_status='4th Qtr',
+                             game_status_id=2, teams=teams, period=period)
+
+
+def test_diff_alerts_once_when_game_becomes_close():
+    """Alert is given when a game in the last period becomes close"""
+    notifier = LiveGamesNotifier(provider=Mock(), allowed_gap=6)
+
+    first_poll = [make_live_game('1', 3, 80, 81),
+                  make_live_game('2', 4, 90, 100)]
+    assert notifier.diff(GAMES_DATE, first_poll) == []
+
+    second_poll = [make_live_game('1', 4, 95, 97),
+                   make_live_game('2', 4, 98, 100)]
+    became_close = notifier.diff(GAMES_DATE, second_poll)
+    assert [game.game_id for game in became_close] == ['1', '2']
+
+    third_poll = [make_live_game('1', 4, 95, 105),
+                  make_live_game('2', 4, 100, 100)]
+    fourth_poll = [make_live_game('1', 4, 105, 105)]
+    assert notifier.diff(GAMES_DATE, third_poll) == []
+    assert notifier.diff(GAMES_DATE, fourth_poll) == []
+
+
+def test_blocked_chats_are_unsubscribed():
+    """Chats that blocked the bot do not get alerts anymore"""
+    outbox = Outbox(global_rate=30, chat_rate=1, chat_burst=1, workers=2)
+    notifier = LiveGamesNotifier(provider=Mock(), outbox=outbox,
+                                 allowed_gap=6)
+    notifier.subscribe(1)
+    notifier.subscribe(2)
+
+    def send_message(chat_id, **kwargs):
+        if chat_id == 2:
+            raise Unauthorized('Forbidden: bot was blocked by the user')
+
+    bot = Mock()
+    bot.send_message.side_effect = send_message
+
+    wait(notifier._notify(bot, make_live_game('1', 4, 95, 97)))
+    outbox.stop()
+
+    assert bot.send_message.call_count == 2
+    assert not notifier.unsubscribe(2)
+    assert notifier.unsubscribe(1)
+
+
+def test_subscribers_are_shared_by_store(tmp_path):
+    """Notifiers with the same store (e.g. in worker processes) see the
+    same subscribers"""
+    notifier = LiveGamesNotifier(
+        provider=Mock(), store=SubscribersStore(directory=str(tmp_path))
+    )
+    other_notifier = LiveGamesNotifier(
+        provider=Mock(), store=SubscribersStore(directory=str(tmp_path))
+    )
+
+    assert notifier.subscribe(1)
+    assert not other_notifier.subscribe(1)
+    assert other_notifier.subscribers() == [1]
+    assert other_notifier.unsubscribe(1)
+    assert notifier.subscribers() == []
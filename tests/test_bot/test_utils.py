@@ -0,0 +1,78 @@
+"""Tests for helping functions from bot/utils.py"""
+import json
+import time
+from datetime import date
+from unittest.mock import Mock
+
+import pytest
+from freezegun import freeze_time
+
+from nbadviser import config
+from nbadviser.adviser.utils import get_season_range, iter_games_dates
+from nbadviser.bot.utils import parse_date_range, log_access
+from nbadviser.config import logger
+
+
+def test_parse_date_range():
+    """Check parsing of period YYYY-MM-DD..YYYY-MM-DD"""
+    assert parse_date_range('2022-01-10..2022-01-16') == \
+        (date(2022, 1, 10), date(2022, 1, 16))
+    assert parse_date_range('2022-01-10') is None
+    assert parse_date_range('2022-01-10..2022-13-16') is None
+
+
+def test_get_season_range():
+    """Check first and last dates of seasons"""
+    assert get_season_range('2021-22') == (date(2021, 10, 1),
+                                           date(2022, 6, 30))
+    assert get_season_range('1999-00') == (date(1999, 10, 1),
+                                           date(2000, 6, 30))
+    assert get_season_range('2021-23') is None
+    assert get_season_range('season') is None
+
+    with freeze_time('2022-03-28 18:00:00', tz_offset=4):
+        assert get_season_range() == (date(2021, 10, 1), date(2022, 6, 30))
+
+
+def test_iter_games_dates_stops_at_current_game_day():
+    """Future dates of period are skipped"""
+    with freeze_time('2022-03-28 18:00:00', tz_offset=4):
+        games_dates = list(iter_games_dates(date(2022, 3, 25),
+                                            date(2022, 3, 30)))
+    assert games_dates == ['2022-03-25', '2022-03-26', '2022-03-27']
+
+
+def test_access_log_sampling(monkeypatch):
+    """Sampled out calls are not logged, errors and slow calls are"""
+    monkeypatch.setattr(config, 'ACCESS_LOG_SAMPLE_RATES', {'handler': 0})
+    monkeypatch.setattr(config, 'ACCESS_LOG_SLOW_THRESHOLD', 0.05)
+    records = []
+    sink_id = logger.add(records.append, level='INFO',
+                         filter=lambda record: 'access' in record['extra'])
+
+    def handler(update, context):
+        if context == 'slow':
+            time.sleep(0.06)
+        elif context == 'error':
+            raise ValueError('error')
+
+    update = Mock()
+    update.message.text = '/top'
+    update.message.from_user.configure_mock(id=1, username='user',
+                                            full_name='User')
+    wrapped = log_access(handler)
+    try:
+        wrapped(update, None)
+        wrapped(update, 'slow')
+        with pytest.raises(ValueError):
+            wrapped(update, 'error')
+    finally:
+        logger.remove(sink_id)
+
+    accesses = [json.loads(message.record['extra']['access'])
+                for message in records]
+    assert [access['error'] for access in accesses] == \
+        [None, "ValueError('error')"]
+    assert accesses[0]['seconds'] >= 0.05
+    assert accesses[0]['command'] == '/top'
+    assert records[1].record['level'].name == 'ERROR'
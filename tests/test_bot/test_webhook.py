@@ -0,0 +1,75 @@
+"""Tests for receiving updates by webhook from bot/webhook.py"""
+import threading
+from queue import Queue
+
+import pytest
+import requests
+from telegram import Bot
+from telegram.ext import Dispatcher, MessageHandler, Filters
+
+from nbadviser.bot.webhook import WebhookServer
+
+
+def make_update(update_id: int, text: str) -> dict:
+    """Update JSON as posted by Telegram"""
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 1641945600,
+            'chat': {'id': 1, 'type': 'private'},
+            'from': {'id': 1, 'is_bot': False, 'first_name': 'User'},
+            'text': text,
+        },
+    }
+
+
+@pytest.fixture
+def webhook():
+    """Webhook server on a free port with one worker and two pending
+    updates at most, handler waits for release event"""
+    handled = []
+    release = threading.Event()
+
+    def callback(update, context):
+        release.wait(5)
+        handled.append(update.message.text)
+
+    dispatcher = Dispatcher(Bot(token='123456:TEST'), Queue(), workers=1)
+    dispatcher.add_handler(MessageHandler(Filters.text, callback))
+    server = WebhookServer(dispatcher=dispatcher, listen='127.0.0.1',
+                           port=0, url_path='/telegram', workers=1,
+                           max_pending=2)
+    server.start()
+    yield server, handled, release
+    release.set()
+    server.stop()
+
+
+def test_posted_updates_are_handled(webhook):
+    """Posted updates are handled, malformed ones are rejected"""
+    server, handled, release = webhook
+    url = f'http://127.0.0.1:{server.port}/telegram'
+    release.set()
+
+    response = requests.post(url, json=make_update(1, '/top'))
+    assert response.status_code == 200
+    assert requests.post(url, data='not json').status_code == 400
+    assert requests.get(url).text == 'ok'
+
+    server.stop()  # Waits for pending updates
+    assert handled == ['/top']
+
+
+def test_updates_are_rejected_when_too_many_pending(webhook):
+    """Updates over max_pending get 503, accepted ones are handled"""
+    server, handled, release = webhook
+    url = f'http://127.0.0.1:{server.port}/telegram'
+
+    statuses = [requests.post(url, json=make_update(number, f'{number}'))
+                .status_code for number in range(3)]
+    assert statuses == [200, 200, 503]
+
+    release.set()
+    server.stop()
+    assert handled == ['0', '1']
@@ -0,0 +1,62 @@
+"""Tests for writing log files from logs.py"""
+import os
+import time
+
+from loguru import logger
+
+from nbadviser import config
+from nbadviser.logs import BatchWriter
+
+
+def test_batch_writer(tmp_path):
+    """Messages are written in batches, errors are written right away"""
+    path = str(tmp_path / 'nbadviser.log')
+    writer = BatchWriter(path, batch_size=100, max_delay=60)
+    sink_id = logger.add(writer, format='{level} {message}')
+    try:
+        logger.info('first')
+        logger.info('second')
+        time.sleep(0.2)
+        assert not os.path.exists(path)
+
+        logger.error('error')
+        for _ in range(50):
+            if os.path.exists(path):
+                break
+            time.sleep(0.05)
+        with open(path, encoding='utf8') as file:
+            assert file.read() == 'INFO first\nINFO second\nERROR error\n'
+
+        logger.info('last')
+    finally:
+        logger.remove(sink_id)
+
+    with open(path, encoding='utf8') as file:
+        assert file.read().splitlines()[-1] == 'INFO last'
+
+
+def test_batch_writer_rotates_file_of_previous_month(tmp_path):
+    """File written in another month is renamed before writing"""
+    path = str(tmp_path / 'nbadviser.log')
+    with open(path, 'w', encoding='utf8') as file:
+        file.write('old\n')
+    month_ago = time.time() - 40 * 24 * 3600
+    os.utime(path, (month_ago, month_ago))
+
+    writer = BatchWriter(path)
+    writer.write('new\n')
+    writer.stop()
+
+    rotated = str(tmp_path / f'nbadviser.'
+                  f'{time.strftime("%Y-%m", time.localtime(month_ago))}.log')
+    with open(rotated, encoding='utf8') as file:
+        assert file.read() == 'old\n'
+    with open(path, encoding='utf8') as file:
+        assert file.read() == 'new\n'
+
+
+def test_log_files_are_in_log_dir(tmp_path, monkeypatch):
+    """Log directory is set by NBADVISER_LOG_DIR (LOG_DIR)"""
+    monkeypatch.setattr(config, 'LOG_DIR', str(tmp_path))
+    assert config.configure_log_filename(1, name='nbadviser-access') == \
+        os.path.join(str(tmp_path), 'nbadviser-access-1.log')
@@ -0,0 +1,154 @@
+"""Tests for latency metrics (metrics.py)"""
+import subprocess
+import sys
+import time
+import urllib.request
+
+import pytest
+from telegram.utils.request import Request
+
+from nbadviser.adviser.adviser import Adviser
+from nbadviser.adviser.strategies import StrategyBaseABC
+from nbadviser.adviser.utils import Recommendation
+from nbadviser.bot.request import InstrumentedRequest
+from nbadviser.metrics import Metrics, metrics, start_http_server, \
+    StartupTimer
+
+
+class FailingStrategy(StrategyBaseABC):
+    title = 'Failing'
+
+    def execute(self, **kwargs) -> Recommendation:
+        raise ValueError('failed')
+
+    def get_raw_data(self, **kwargs):
+        pass
+
+
+class EmptyStrategy(FailingStrategy):
+    title = 'Empty'
+
+    def execute(self, **kwargs) -> Recommendation:
+        return Recommendation(title=self.title)
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics():
+    metrics.clear()
+    yield
+    metrics.clear()
+
+
+def test_span_is_measured_on_failure():
+    """Span of a failed stage is observed as well"""
+    registry = Metrics()
+    with pytest.raises(ValueError):
+        with registry.span('stage_seconds', stage='fetch'):
+            raise ValueError
+
+    histogram = registry.get_histogram('stage_seconds', stage='fetch')
+    assert histogram.count == 1
+    assert histogram.quantile(0.5) == histogram.buckets[0]
+
+
+def test_prometheus_format():
+    """Histograms and counters are rendered in Prometheus format"""
+    registry = Metrics()
+    registry.observe('strategy_seconds', 0.2, strategy='CloseGameStrategy')
+    registry.observe('strategy_seconds', 50, strategy='CloseGameStrategy')
+    registry.inc('errors_total', label='bot')
+
+    text = registry.render_prometheus()
+
+    assert '# TYPE nbadviser_strategy_seconds histogram' in text
+    assert 'nbadviser_strategy_seconds_bucket' \
+           '{strategy="CloseGameStrategy",le="0.1"} 0' in text
+    assert 'nbadviser_strategy_seconds_bucket' \
+           '{strategy="CloseGameStrategy",le="0.25"} 1' in text
+    assert 'nbadviser_strategy_seconds_bucket' \
+           '{strategy="CloseGameStrategy",le="+Inf"} 2' in text
+    assert 'nbadviser_strategy_seconds_count' \
+           '{strategy="CloseGameStrategy"} 2' in text
+    assert 'nbadviser_errors_total{label="bot"} 1' in text
+
+
+def test_strategies_are_measured_and_errors_counted():
+    """Every strategy execution is timed, failures are counted by label"""
+    adviser = Adviser(registered_strategies={
+        'FailingStrategy': FailingStrategy(),
+        'EmptyStrategy': EmptyStrategy(),
+    })
+
+    _, errors = adviser.get_recommendations(games_date='2022-01-12')
+
+    assert [error.label for error in errors] == ['FailingStrategy']
+    assert metrics.get_counter('errors_total', label='FailingStrategy') == 1
+    for name in ('FailingStrategy', 'EmptyStrategy'):
+        assert metrics.get_histogram('strategy_seconds',
+                                     strategy=name).count == 1
+
+
+def test_telegram_methods_are_measured(monkeypatch):
+    """Bot API methods are timed, except of long polling getUpdates"""
+    monkeypatch.setattr(Request, 'post',
+                        lambda self, url, data, timeout=None: True)
+    request = InstrumentedRequest()
+
+    request.post('https://api.telegram.org/botTOKEN/sendMessage', {})
+    request.post('https://api.telegram.org/botTOKEN/getUpdates', {})
+
+    assert metrics.get_histogram('telegram_seconds',
+                                 method='sendMessage').count == 1
+    assert metrics.get_histogram('telegram_seconds',
+                                 method='getUpdates') is None
+
+
+def test_http_endpoint():
+    """Metrics are served on /metrics"""
+    registry = Metrics()
+    registry.inc('errors_total', label='bot')
+    server = start_http_server(registry, host='127.0.0.1', port=0)
+    try:
+        url = f'http://127.0.0.1:{server.server_port}/metrics'
+        with urllib.request.urlopen(url) as response:
+            body = response.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert 'nbadviser_errors_total{label="bot"} 1' in body
+
+
+def test_startup_timer():
+    """Durations of stages are kept, exposed as gauges and reported"""
+    registry = Metrics()
+    startup = StartupTimer(registry)
+    import_time = startup.mark('import')
+    startup.mark('ready')
+    startup.report()
+
+    assert [stage for stage, _ in startup.stages] == ['import', 'ready']
+    assert registry.get_gauge('startup_seconds', stage='import') == \
+           import_time
+
+
+def test_startup_is_counted_from_start_time():
+    """Time before the timer is created (e.g. imports) is counted in the
+    first stage"""
+    registry = Metrics()
+    startup = StartupTimer(registry, start_time=time.perf_counter() - 5)
+
+    assert startup.mark('import') >= 5
+
+
+def test_heavy_modules_are_not_imported_eagerly():
+    """Importing strategies or backfill does not import nba_api endpoints
+    and telegram, config does not add log file sink"""
+    code = ('import sys\n'
+            'import nbadviser.adviser.strategies\n'
+            'import nbadviser.adviser.backfill\n'
+            'from nbadviser import config\n'
+            'assert "nba_api.stats.endpoints" not in sys.modules\n'
+            'assert "telegram" not in sys.modules\n'
+            'assert config.LOG_FILENAME is None\n')
+    subprocess.run([sys.executable, '-c', code], check=True)
@@ -0,0 +1,79 @@
+"""Tests for worker processes supervisor from supervisor.py"""
+import os
+import time
+
+from nbadviser.supervisor import Supervisor
+
+
+def exit_soon(worker_index: int) -> None:
+    """Worker target that exits (crashes) right away"""
+    os._exit(1)
+
+
+def sleep_long(worker_index: int) -> None:
+    """Worker target that runs until terminated"""
+    time.sleep(60)
+
+
+def wait_for_exit(supervisor: Supervisor) -> None:
+    for _ in range(100):
+        if not any(process.is_alive()
+                   for process in supervisor._processes.values()):
+            return
+        time.sleep(0.1)
+
+
+def test_exited_workers_are_started_again():
+    """Worker that exited is started again under the same index"""
+    supervisor = Supervisor(target=exit_soon, workers=2, stop_timeout=5,
+                            restart_delay=0)
+    supervisor.start()
+    first_pids = supervisor.pids
+    wait_for_exit(supervisor)
+
+    assert supervisor.check() == 2
+    assert supervisor.restarts == 2
+    assert set(supervisor.pids) == {0, 1}
+    assert supervisor.pids != first_pids
+    supervisor.stop()
+
+
+def test_fast_exits_are_restarted_with_backoff():
+    """Worker exited right after start waits longer with every exit"""
+    supervisor = Supervisor(target=exit_soon, workers=1, stop_timeout=5,
+                            restart_delay=1, max_restart_delay=5)
+    assert [supervisor.get_restart_delay(failures)
+            for failures in range(6)] == [0, 1, 2, 4, 5, 5]
+
+    supervisor.start()
+    wait_for_exit(supervisor)
+    assert supervisor.check() == 0
+    assert supervisor.pids == {}
+    assert supervisor.has_workers
+    supervisor.stop()
+
+
+def test_workers_failing_fast_are_not_restarted():
+    """Worker is given up after max_fast_failures fast exits in a row"""
+    supervisor = Supervisor(target=exit_soon, workers=1, stop_timeout=5,
+                            restart_delay=0, max_fast_failures=1)
+    supervisor.start()
+    wait_for_exit(supervisor)
+    assert supervisor.check() == 1
+
+    wait_for_exit(supervisor)
+    assert supervisor.check() == 0
+    assert supervisor.failed == {0}
+    assert not supervisor.has_workers
+
+
+def test_stop_terminates_workers():
+    """Workers are terminated and forgotten on stop"""
+    supervisor = Supervisor(target=sleep_long, workers=2, stop_timeout=5)
+    supervisor.start()
+    processes = list(supervisor._processes.values())
+
+    assert supervisor.check() == 0
+    supervisor.stop()
+    assert not any(process.is_alive() for process in processes)
+    assert supervisor.pids == {}